@@ -1,10 +1,11 @@
 # fixed_embeddings.py - Recreate ALL embeddings properly
 import asyncio
-import asyncpg
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
 
+from db_client import DatabaseClient
+
 load_dotenv()
 
 async def recreate_all_embeddings():
@@ -20,14 +21,10 @@ async def recreate_all_embeddings():
     genai.configure(api_key=api_key)
     
     # Connect to database
-    conn = await asyncpg.connect(
-        host='db.dcmnzvjftmdbywrjkust.supabase.co',
-        port=5432,
-        user='postgres',
-        password=os.getenv("DATABASE_PASSWORD"),
-        database='postgres',
-        ssl='require'
-    )
+    conn = DatabaseClient()
+    if not await conn.connect():
+        print("❌ Database connection failed")
+        return
     
     try:
         # Get ALL chunks
@@ -42,6 +39,7 @@ async def recreate_all_embeddings():
             batch = chunks[i:i+50]
             print(f"\n📦 Processing batch {i//50 + 1}/{(len(chunks)+49)//50}...")
             
+            updates = []
             for chunk in batch:
                 try:
                     # Generate proper embedding
@@ -51,26 +49,23 @@ async def recreate_all_embeddings():
                         task_type="retrieval_document"
                     )
                     
-                    embedding = result["embedding"]
-                    embedding_str = "[" + ",".join(str(x) for x in embedding) + "]"
-                    
-                    # Update database
-                    await conn.execute("""
-                        UPDATE ncert_chunks 
-                        SET embedding = $1::vector 
-                        WHERE id = $2
-                    """, embedding_str, chunk['id'])
-                    
-                    updated += 1
-                    
-                    if updated % 10 == 0:
-                        print(f"  ✓ Updated {updated} embeddings...")
+                    updates.append((result["embedding"], chunk['id']))
                         
                 except Exception as e:
                     failed += 1
                     if failed <= 3:  # Show first 3 errors
                         print(f"  ✗ Error with chunk {chunk['id']}: {str(e)[:50]}")
                     continue
+            
+            # Write the whole batch with one prepared statement
+            if updates:
+                await conn.executemany("""
+                    UPDATE ncert_chunks 
+                    SET embedding = $1 
+                    WHERE id = $2
+                """, updates)
+                updated += len(updates)
+                print(f"  ✓ Updated {updated} embeddings...")
         
         print(f"\n✅ COMPLETED!")
         print(f"   Successfully updated: {updated}")
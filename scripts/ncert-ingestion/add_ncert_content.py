@@ -4,7 +4,6 @@ Production-ready with error handling, logging, and batch processing.
 """
 
 import asyncio
-import asyncpg
 import google.generativeai as genai
 import os
 import logging
@@ -13,6 +12,9 @@ from datetime import datetime
 from typing import List, Dict
 import hashlib
 
+import corpus_stats
+from db_client import DatabaseClient
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -168,41 +170,11 @@ NCERT_CONTENT = [
     }
 ]
 
-class DatabaseManager:
-    """Handles database operations."""
-    
-    def __init__(self):
-        self.connection = None
-        
-    async def connect(self) -> bool:
-        """Establish database connection."""
-        try:
-            self.connection = await asyncpg.connect(
-                host='db.dcmnzvjftmdbywrjkust.supabase.co',
-                port=5432,
-                user='postgres',
-                password=os.getenv("DATABASE_PASSWORD"),
-                database='postgres',
-                ssl='require',
-                timeout=30
-            )
-            logger.info("Database connection established")
-            return True
-        except Exception as e:
-            logger.error(f"Database connection failed: {str(e)}")
-            return False
-    
-    async def close(self):
-        """Close database connection."""
-        if self.connection:
-            await self.connection.close()
-            logger.info("Database connection closed")
-
 class ContentInserter:
     """Handles content insertion with embeddings."""
     
-    def __init__(self, db_manager: DatabaseManager):
-        self.db = db_manager
+    def __init__(self, db: DatabaseClient):
+        self.db = db
         
     def generate_content_hash(self, content: str) -> str:
         """Generate hash for content to check duplicates."""
@@ -219,21 +191,23 @@ class ContentInserter:
             )
             
             embedding = embedding_result["embedding"]
-            embedding_str = "[" + ",".join(str(x) for x in embedding) + "]"
             
-            # Insert into database
-            await self.db.connection.execute("""
-                INSERT INTO ncert_chunks 
-                (class_grade, subject, chapter, content, embedding, created_at)
-                VALUES ($1, $2, $3, $4, $5::vector, $6)
-            """, 
-            content_item["class_grade"], 
-            content_item["subject"], 
-            content_item["chapter"], 
-            content_item["content"], 
-            embedding_str,
-            datetime.now()
-            )
+            # Insert into database together with its corpus_stats delta
+            async with self.db.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute("""
+                        INSERT INTO ncert_chunks 
+                        (class_grade, subject, chapter, content, embedding, created_at)
+                        VALUES ($1, $2, $3, $4, $5, $6)
+                    """, 
+                    content_item["class_grade"], 
+                    content_item["subject"], 
+                    content_item["chapter"], 
+                    content_item["content"], 
+                    embedding,
+                    datetime.now()
+                    )
+                    await corpus_stats.apply_deltas(conn, corpus_stats.deltas_from_chunks([content_item]))
             
             return True
             
@@ -246,7 +220,7 @@ class ContentInserter:
         try:
             content_hash = self.generate_content_hash(content_item["content"])
             
-            exists = await self.db.connection.fetchval("""
+            exists = await self.db.fetchval("""
                 SELECT EXISTS(
                     SELECT 1 FROM ncert_chunks 
                     WHERE class_grade = $1 
@@ -288,12 +262,15 @@ async def add_content_to_db():
         logger.error(f"Failed to configure Gemini API: {str(e)}")
         return
     
-    # Initialize database manager
-    db = DatabaseManager()
+    # Initialize pooled database client
+    db = DatabaseClient()
     
     if not await db.connect():
         return
     
+    async with db.acquire() as conn:
+        await corpus_stats.ensure_schema(conn)
+    
     # Initialize content inserter
     inserter = ContentInserter(db)
     
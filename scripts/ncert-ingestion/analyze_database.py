@@ -4,13 +4,15 @@ Production-ready with detailed insights and reporting.
 """
 
 import asyncio
-import asyncpg
 import os
 import logging
 from pathlib import Path
 from typing import Dict, List, Any
 from datetime import datetime, timedelta
 
+import corpus_stats
+from db_client import DatabaseClient
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -39,48 +41,29 @@ class DatabaseAnalyzer:
     """Analyzes database content and structure."""
     
     def __init__(self):
-        self.connection = None
+        self.db = DatabaseClient()
     
     async def connect(self) -> bool:
-        """Establish database connection."""
-        try:
-            self.connection = await asyncpg.connect(
-                host='db.dcmnzvjftmdbywrjkust.supabase.co',
-                port=5432,
-                user='postgres',
-                password=os.getenv('DATABASE_PASSWORD'),
-                database='postgres',
-                ssl='require',
-                timeout=30
-            )
-            logger.info("Connected to database for analysis")
-            return True
-        except Exception as e:
-            logger.error(f"Database connection failed: {str(e)}")
-            return False
+        """Establish database connection pool."""
+        return await self.db.connect()
     
     async def close(self):
-        """Close database connection."""
-        if self.connection:
-            await self.connection.close()
-            logger.info("Database connection closed")
+        """Close database connection pool."""
+        await self.db.close()
     
     async def get_basic_stats(self) -> Dict[str, Any]:
-        """Get basic database statistics."""
+        """Get basic database statistics from the maintained corpus_stats table."""
         try:
-            stats = await self.connection.fetchrow("""
-                SELECT 
-                    COUNT(*) as total_records,
-                    COUNT(DISTINCT chapter) as unique_chapters,
-                    COUNT(DISTINCT subject) as unique_subjects,
-                    COUNT(DISTINCT class_grade) as unique_classes,
-                    MIN(created_at) as oldest_record,
-                    MAX(created_at) as newest_record,
-                    AVG(LENGTH(content)) as avg_content_length,
-                    SUM(LENGTH(content)) as total_content_size
-                FROM ncert_chunks
-            """)
-            return dict(stats) if stats else {}
+            stats = await corpus_stats.read_stats(self.db)
+            return {
+                "total_records": stats["total_chunks"],
+                "unique_chapters": stats["unique_chapters"],
+                "unique_subjects": stats["unique_subjects"],
+                "unique_classes": stats["unique_classes"],
+                "avg_content_length": stats["avg_content_length"],
+                "total_content_size": stats["total_content_chars"],
+                "freshness": stats["freshness"],
+            }
         except Exception as e:
             logger.error(f"Error fetching basic stats: {str(e)}")
             return {}
@@ -88,7 +71,7 @@ class DatabaseAnalyzer:
     async def get_chapter_distribution(self, limit: int = 20) -> List[Dict]:
         """Get chapter distribution."""
         try:
-            return await self.connection.fetch("""
+            return await self.db.fetch("""
                 SELECT 
                     chapter,
                     COUNT(*) as record_count,
@@ -109,13 +92,14 @@ class DatabaseAnalyzer:
     async def get_class_subject_distribution(self) -> List[Dict]:
         """Get distribution by class and subject."""
         try:
-            return await self.connection.fetch("""
+            return await self.db.fetch("""
                 SELECT 
                     class_grade,
                     subject,
-                    COUNT(*) as record_count,
+                    SUM(chunk_count) as record_count,
                     COUNT(DISTINCT chapter) as chapter_count
-                FROM ncert_chunks 
+                FROM corpus_stats 
+                WHERE chunk_count > 0
                 GROUP BY class_grade, subject 
                 ORDER BY class_grade, subject
             """)
@@ -126,7 +110,7 @@ class DatabaseAnalyzer:
     async def search_content(self, search_term: str, limit: int = 5) -> List[Dict]:
         """Search for specific content."""
         try:
-            return await self.connection.fetch("""
+            return await self.db.fetch("""
                 SELECT 
                     chapter,
                     subject,
@@ -145,7 +129,7 @@ class DatabaseAnalyzer:
     async def get_content_quality_metrics(self) -> Dict[str, Any]:
         """Get content quality metrics."""
         try:
-            metrics = await self.connection.fetchrow("""
+            metrics = await self.db.fetchrow("""
                 SELECT 
                     -- Size distribution
                     COUNT(CASE WHEN LENGTH(content) < 100 THEN 1 END) as tiny_chunks,
@@ -171,7 +155,7 @@ class DatabaseAnalyzer:
     async def get_recent_activity(self, days: int = 7) -> List[Dict]:
         """Get recent database activity."""
         try:
-            return await self.connection.fetch("""
+            return await self.db.fetch("""
                 SELECT 
                     DATE(created_at) as date,
                     COUNT(*) as chunks_added,
@@ -203,9 +187,26 @@ async def analyze_database():
         return
     
     try:
+        # Independent queries run concurrently over the pool
+        search_terms = ['photosynthesis', 'chemical', 'electric', 'motion']
+        (
+            basic_stats,
+            chapters,
+            distributions,
+            quality_metrics,
+            recent_activity,
+            *search_results
+        ) = await asyncio.gather(
+            analyzer.get_basic_stats(),
+            analyzer.get_chapter_distribution(20),
+            analyzer.get_class_subject_distribution(),
+            analyzer.get_content_quality_metrics(),
+            analyzer.get_recent_activity(7),
+            *(analyzer.search_content(term, 3) for term in search_terms)
+        )
+        
         # 1. Basic Statistics
         logger.info("\n📊 BASIC STATISTICS:")
-        basic_stats = await analyzer.get_basic_stats()
         
         if basic_stats:
             logger.info(f"  Total records: {basic_stats.get('total_records', 0):,}")
@@ -215,14 +216,12 @@ async def analyze_database():
             logger.info(f"  Average content length: {basic_stats.get('avg_content_length', 0):.0f} chars")
             logger.info(f"  Total content size: {basic_stats.get('total_content_size', 0):,} chars")
             
-            if basic_stats.get('oldest_record'):
-                oldest = basic_stats['oldest_record']
-                newest = basic_stats['newest_record']
-                logger.info(f"  Data range: {oldest.strftime('%Y-%m-%d')} to {newest.strftime('%Y-%m-%d')}")
+            freshness = basic_stats.get('freshness', {})
+            logger.info(f"  Stats last changed: {freshness.get('last_change_at')}")
+            logger.info(f"  Stats reconciled: {freshness.get('reconciled_at')}")
         
         # 2. Chapter Distribution
         logger.info("\n📚 CHAPTER DISTRIBUTION (Top 20):")
-        chapters = await analyzer.get_chapter_distribution(20)
         
         for i, chapter in enumerate(chapters, 1):
             logger.info(f"  {i:2}. {chapter['chapter'][:45]:45} - {chapter['record_count']:4} records")
@@ -232,7 +231,6 @@ async def analyze_database():
         
         # 3. Class/Subject Distribution
         logger.info("\n🎓 CLASS & SUBJECT DISTRIBUTION:")
-        distributions = await analyzer.get_class_subject_distribution()
         
         for dist in distributions:
             logger.info(f"  {dist['class_grade']} - {dist['subject']}:")
@@ -240,7 +238,6 @@ async def analyze_database():
         
         # 4. Content Quality Analysis
         logger.info("\n✅ CONTENT QUALITY METRICS:")
-        quality_metrics = await analyzer.get_content_quality_metrics()
         
         if quality_metrics:
             total = basic_stats.get('total_records', 0)
@@ -262,11 +259,9 @@ async def analyze_database():
         
         # 5. Search Examples
         logger.info("\n🔍 CONTENT SEARCH EXAMPLES:")
-        search_terms = ['photosynthesis', 'chemical', 'electric', 'motion']
         
-        for term in search_terms:
+        for term, results in zip(search_terms, search_results):
             logger.info(f"\n  Searching for '{term}':")
-            results = await analyzer.search_content(term, 3)
             
             if results:
                 for result in results:
@@ -277,7 +272,6 @@ async def analyze_database():
         
         # 6. Recent Activity
         logger.info("\n📈 RECENT ACTIVITY (Last 7 days):")
-        recent_activity = await analyzer.get_recent_activity(7)
         
         if recent_activity:
             for activity in recent_activity:
@@ -0,0 +1,132 @@
+"""
+Paper Formatter Benchmark - Streaming formatter vs `+=` string building.
+
+Formats synthetic papers (MCQ/short/long mix, answer key and explanations
+on) with the previous format_test_content approach - one `test_content +=`
+per line over f-string templates - and with paper_formatter, and reports
+full-paper time plus time to the first streamed chunk.
+
+CPython usually resizes a uniquely referenced string in place on `+=`, so
+`+=` itself is not quadratic here. Draining iter_paper_text() costs about
+as much as the legacy code (a generator round trip per block); the gains
+are time to first byte, which no longer grows with paper size, and
+format_paper_text(), which skips the generator and joins one list
+(~1.4x on 100 questions, ~1.6x on 500).
+
+Usage:
+    python bench_formatter.py                      # 100-question papers
+    python bench_formatter.py --questions 500 --repeat 200
+"""
+
+import argparse
+import time
+from datetime import datetime
+
+from paper_formatter import format_paper_text, iter_paper_text
+
+
+def make_paper(questions: int) -> dict:
+    types = [("mcq", 1), ("short", 2), ("long", 5)]
+    items = []
+    for n in range(questions):
+        qtype, marks = types[n * len(types) // questions]
+        items.append({
+            "id": f"Q{n + 1}",
+            "type": qtype,
+            "question": f"Explain how the refractive index of medium {n} affects the path of light. " * 2,
+            "options": [f"Option {c} for question {n}" for c in "ABCD"] if qtype == "mcq" else None,
+            "correctAnswer": f"Model answer {n}: light bends towards the normal in a denser medium.",
+            "explanation": f"Because the speed of light decreases in medium {n}.",
+            "marks": marks,
+            "difficulty": "medium",
+            "cognitiveLevel": "understand",
+            "chapter": "Light - Reflection and Refraction",
+            "pageReference": f"p. {160 + n % 40}",
+        })
+    return {
+        "subject": "Science",
+        "classNum": 10,
+        "board": "CBSE",
+        "chapters": ["Light - Reflection and Refraction"],
+        "timeLimit": 180,
+        "includeAnswerKey": True,
+        "includeInstructions": True,
+        "questions": items,
+    }
+
+
+def legacy_format(paper: dict) -> str:
+    """The previous format_test_content, on the same dict input."""
+    questions = paper["questions"]
+    test_content = f"""
+        {'='*60}
+        TEST PAPER
+        {'='*60}
+
+        Subject: {paper['subject']}
+        Class: {paper['classNum']}
+        Board: {paper['board']}
+        {'Chapters: ' + ', '.join(paper['chapters']) if paper['chapters'] else ''}
+
+        Time: {paper['timeLimit']} minutes (if specified)
+        Maximum Marks: {sum(q['marks'] for q in questions)}
+        """
+    test_content += "\n\n" + "="*60 + "\nQUESTIONS\n" + "="*60 + "\n"
+    for i, question in enumerate(questions, 1):
+        test_content += f"\nQ{i}. [{question['type'].upper()}] ({question['marks']} mark{'s' if question['marks'] > 1 else ''})\n"
+        test_content += f"    {question['question']}\n"
+        if question["options"]:
+            for opt_idx, option in enumerate(question["options"]):
+                test_content += f"    ({chr(65+opt_idx)}) {option}\n"
+        if paper["includeAnswerKey"]:
+            test_content += f"    [Ans: {question['correctAnswer']}]\n"
+            if question["explanation"]:
+                test_content += f"    [Explanation: {question['explanation']}]\n"
+        test_content += f"    [Difficulty: {question['difficulty'].title()} | "
+        test_content += f"Cognitive: {question['cognitiveLevel'].title()}]\n"
+        if question["chapter"]:
+            test_content += f"    [Chapter: {question['chapter']} | Page: {question['pageReference']}]\n"
+    test_content += f"""
+
+        {'='*60}
+        END OF TEST
+        {'='*60}
+
+        Generated by: NCERT Test Generator
+        Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        """
+    return test_content
+
+
+def first_chunk(paper: dict) -> str:
+    return next(iter_paper_text(paper))
+
+
+def _timed(label: str, repeat: int, fn, baseline: float = None) -> float:
+    fn()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    per_call = (time.perf_counter() - start) / repeat
+    speedup = f"  ({baseline / per_call:5.1f}x)" if baseline else ""
+    size = result if isinstance(result, int) else len(result)
+    print(f"  {label:34} {per_call * 1e6:10.1f} µs  {size:>9,} chars{speedup}")
+    return per_call
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the test paper formatter")
+    parser.add_argument("--questions", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    paper = make_paper(args.questions)
+    print(f"\n📝 FORMATTING {args.questions}-QUESTION PAPER WITH ANSWER KEY (x{args.repeat})")
+    legacy = _timed("legacy += formatter", args.repeat, lambda: legacy_format(paper))
+    _timed("format_paper_text (join)", args.repeat, lambda: format_paper_text(paper), legacy)
+    _timed("iter_paper_text first chunk", args.repeat, lambda: first_chunk(paper), legacy)
+    _timed("iter_paper_text drained", args.repeat, lambda: sum(len(chunk) for chunk in iter_paper_text(paper)), legacy)
+
+
+if __name__ == "__main__":
+    main()
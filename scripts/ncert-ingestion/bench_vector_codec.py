@@ -0,0 +1,176 @@
+"""
+Vector Codec Benchmark - Text vs binary pgvector paths.
+
+Offline mode times encode/decode of N embeddings exactly as the code paths do
+it (string join + literal_eval/JSON vs binary NumPy codec). With --db it also
+round-trips the rows through a scratch table on the configured database.
+
+Usage:
+    python bench_vector_codec.py                 # 50k rows, offline
+    python bench_vector_codec.py --rows 5000 --db
+"""
+
+import argparse
+import ast
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+from vector_codec import (
+    decode_vector_binary,
+    encode_vector_binary,
+    parse_vector_text,
+)
+
+env_path = Path(__file__).parent / '.env'
+if env_path.exists():
+    with open(env_path, 'r') as f:
+        for line in f:
+            if '=' in line and not line.startswith('#'):
+                key, value = line.split('=', 1)
+                os.environ[key.strip()] = value.strip().strip('"').strip("'")
+
+DIMENSION = 768
+
+
+def _timed(label: str, rows: int, fn):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    print(f"  {label:38} {elapsed * 1000:10.1f} ms  {rows / elapsed:12,.0f} rows/s")
+    return result, elapsed
+
+
+def bench_offline(rows: int):
+    """Pure codec cost, no network."""
+    print(f"\n📐 OFFLINE CODEC ({rows:,} x {DIMENSION}-d)")
+    vectors = np.random.default_rng(0).standard_normal((rows, DIMENSION)).astype(np.float32)
+    as_lists = vectors.tolist()
+
+    texts, t_text_enc = _timed(
+        "text encode (str join)", rows,
+        lambda: ["[" + ",".join(str(x) for x in v) + "]" for v in as_lists]
+    )
+    blobs, t_bin_enc = _timed(
+        "binary encode (numpy)", rows,
+        lambda: [encode_vector_binary(v) for v in vectors]
+    )
+
+    sample = texts[:max(1, rows // 10)]
+    _, t_eval = _timed(
+        f"text decode literal_eval ({len(sample):,} rows)", len(sample),
+        lambda: [np.array(ast.literal_eval(t), dtype='float64') for t in sample]
+    )
+    _, t_json = _timed(
+        "text decode json.loads", rows,
+        lambda: [np.array(json.loads(t), dtype='float64') for t in texts]
+    )
+    _, t_parse = _timed(
+        "text decode parse_vector_text", rows,
+        lambda: [parse_vector_text(t) for t in texts]
+    )
+    decoded, t_bin_dec = _timed(
+        "binary decode (numpy)", rows,
+        lambda: [decode_vector_binary(b) for b in blobs]
+    )
+
+    assert np.array_equal(decoded[-1], vectors[-1])
+
+    print("\n  Payload size:")
+    print(f"    text:   {sum(len(t) for t in texts) / rows:8.0f} bytes/row")
+    print(f"    binary: {sum(len(b) for b in blobs) / rows:8.0f} bytes/row")
+    print("\n  Speedups (binary vs text):")
+    print(f"    encode:                  {t_text_enc / t_bin_enc:6.1f}x")
+    print(f"    decode vs json.loads:    {t_json / t_bin_dec:6.1f}x")
+    print(f"    decode vs literal_eval:  {(t_eval * rows / len(sample)) / t_bin_dec:6.1f}x (extrapolated)")
+    print(f"    decode vs text parser:   {t_parse / t_bin_dec:6.1f}x")
+
+
+async def bench_database(rows: int):
+    """Round-trip rows through a scratch table with each codec."""
+    import asyncpg
+    from db_client import DatabaseConfig
+    from vector_codec import register_vector_asyncpg
+
+    print(f"\n🗄️  DATABASE ROUND-TRIP ({rows:,} rows)")
+    config = DatabaseConfig.from_env()
+    if not config.password:
+        print("  DATABASE_PASSWORD not set - skipping")
+        return
+
+    async def connect():
+        return await asyncpg.connect(
+            host=config.host, port=config.port, user=config.user,
+            password=config.password, database=config.database,
+            ssl=config.ssl, timeout=config.connect_timeout
+        )
+
+    vectors = np.random.default_rng(1).standard_normal((rows, DIMENSION)).astype(np.float32)
+    text_conn = await connect()
+    binary_conn = await connect()
+
+    try:
+        await register_vector_asyncpg(binary_conn)
+        await text_conn.execute("""
+            DROP TABLE IF EXISTS vector_codec_bench;
+            CREATE TABLE vector_codec_bench (id INTEGER, embedding vector(768));
+        """)
+
+        text_rows = [(i, "[" + ",".join(str(x) for x in v) + "]") for i, v in enumerate(vectors.tolist())]
+        start = time.perf_counter()
+        await text_conn.executemany(
+            "INSERT INTO vector_codec_bench (id, embedding) VALUES ($1, $2::vector)", text_rows
+        )
+        t_text_ins = time.perf_counter() - start
+
+        await text_conn.execute("TRUNCATE vector_codec_bench")
+
+        start = time.perf_counter()
+        await binary_conn.executemany(
+            "INSERT INTO vector_codec_bench (id, embedding) VALUES ($1, $2)",
+            [(i, v) for i, v in enumerate(vectors)]
+        )
+        t_bin_ins = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fetched = await text_conn.fetch("SELECT embedding::text AS e FROM vector_codec_bench")
+        parsed = [np.array(json.loads(r['e']), dtype='float64') for r in fetched]
+        t_text_sel = time.perf_counter() - start
+
+        start = time.perf_counter()
+        fetched = await binary_conn.fetch("SELECT embedding FROM vector_codec_bench")
+        arrays = [r['embedding'] for r in fetched]
+        t_bin_sel = time.perf_counter() - start
+
+        assert len(parsed) == len(arrays) == rows
+        print(f"  insert text   {t_text_ins:8.2f} s   binary {t_bin_ins:8.2f} s   ({t_text_ins / t_bin_ins:.1f}x)")
+        print(f"  select text   {t_text_sel:8.2f} s   binary {t_bin_sel:8.2f} s   ({t_text_sel / t_bin_sel:.1f}x)")
+    finally:
+        await text_conn.execute("DROP TABLE IF EXISTS vector_codec_bench")
+        await text_conn.close()
+        await binary_conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pgvector text vs binary codec")
+    parser.add_argument("--rows", type=int, default=50_000, help="Number of embeddings")
+    parser.add_argument("--db", action="store_true", help="Also round-trip through the database")
+    args = parser.parse_args()
+
+    print("\n" + "="*60)
+    print("PGVECTOR CODEC BENCHMARK")
+    print("="*60)
+
+    bench_offline(args.rows)
+    if args.db:
+        asyncio.run(bench_database(args.rows))
+
+    print("\n" + "="*60)
+
+
+if __name__ == "__main__":
+    main()
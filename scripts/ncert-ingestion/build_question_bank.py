@@ -0,0 +1,179 @@
+# build_question_bank.py - Offline job that fills the question bank
+"""
+Generate, validate and store questions for every syllabus cell
+(class, subject, chapter, type, difficulty, cognitive level) so that
+/generate-test can assemble papers without calling the LLM.
+
+Cells that already hold --per-cell questions are skipped, so the job can be
+re-run to top up coverage after new content is ingested. --class may be
+given as 10 or "Class 10"; chapter text is read for either stored spelling.
+
+Usage:
+    python build_question_bank.py --class 10 --subject Science
+    python build_question_bank.py --class 10 --subject Science --chapters "Light" \
+        --types mcq short --difficulties easy medium --per-cell 20
+"""
+
+import argparse
+import asyncio
+import itertools
+import os
+
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+import question_bank
+from corpus_scope import class_grades, class_number
+from db_client import DatabaseClient
+from question_generator import QuestionGenerationError, QuestionGenerator, QuestionSpec
+
+load_dotenv()
+
+DEFAULT_TYPES = ["mcq", "short", "long", "case_based"]
+DEFAULT_DIFFICULTIES = ["easy", "medium", "hard"]
+DEFAULT_COGNITIVE = ["remember", "understand", "apply", "analyze"]
+
+# Chunks of chapter text given to the generator as grounding context
+CONTEXT_CHUNKS = 8
+
+
+async def chapter_context(db: DatabaseClient, class_grade: str, subject: str, chapter: str) -> str:
+    rows = await db.fetch("""
+        SELECT content FROM ncert_chunks
+        WHERE class_grade = ANY($1::text[]) AND lower(subject) = lower($2) AND chapter = $3
+        ORDER BY id
+        LIMIT $4
+    """, class_grades(class_grade), subject, chapter, CONTEXT_CHUNKS)
+    return "\n\n".join(row['content'] for row in rows)
+
+
+async def embed(texts):
+    """Batch-embed question texts (same model as ncert_chunks)."""
+    result = await asyncio.to_thread(
+        genai.embed_content,
+        model=question_bank.EMBEDDING_MODEL,
+        content=list(texts),
+        task_type="retrieval_document"
+    )
+    return result["embedding"]
+
+
+async def build_cell(db, generator, spec, per_cell, context, counts):
+    existing = await db.fetchval("""
+        SELECT COUNT(*) FROM question_bank
+        WHERE class_grade = $1 AND lower(subject) = lower($2) AND chapter = $3
+          AND question_type = $4 AND difficulty = $5 AND cognitive_level = $6 AND language = $7
+    """, class_number(spec.class_num), spec.subject, spec.chapter or '', spec.type,
+        spec.difficulty, spec.cognitive, spec.language)
+
+    missing = per_cell - existing
+    label = f"{spec.chapter} | {spec.type}/{spec.difficulty}/{spec.cognitive}"
+    if missing <= 0:
+        counts['skipped'] += 1
+        return
+
+    try:
+        questions = await generator.generate(spec, missing, context)
+    except QuestionGenerationError as e:
+        print(f"   ❌ {label}: {e}")
+        counts['failed'] += 1
+        return
+
+    embeddings = await embed(q.question for q in questions)
+    async with db.acquire() as conn:
+        await question_bank.insert_questions(conn, spec, questions, embeddings)
+
+    counts['built'] += 1
+    counts['questions'] += len(questions)
+    print(f"   ✅ {label}: +{len(questions)}")
+
+
+async def build_question_bank(args):
+    print("🏦 BUILDING QUESTION BANK...")
+
+    api_key = os.getenv("GEMINI_API_KEY", "").strip()
+    if not api_key:
+        print("❌ GEMINI_API_KEY not set")
+        return
+    genai.configure(api_key=api_key)
+
+    db = DatabaseClient()
+    if not await db.connect():
+        print("❌ Database connection failed")
+        return
+
+    try:
+        async with db.acquire() as conn:
+            await question_bank.ensure_schema(conn)
+
+        chapters = args.chapters
+        if not chapters:
+            rows = await db.fetch("""
+                SELECT DISTINCT chapter FROM corpus_stats
+                WHERE class_grade = ANY($1::text[]) AND lower(subject) = lower($2) AND chunk_count > 0
+                ORDER BY chapter
+            """, class_grades(args.class_grade), args.subject)
+            chapters = [row['chapter'] for row in rows]
+
+        if not chapters:
+            print(f"❌ No chapters found for Class {class_number(args.class_grade)} {args.subject}")
+            return
+
+        generator = QuestionGenerator(args.model)
+        counts = {'built': 0, 'skipped': 0, 'failed': 0, 'questions': 0}
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        for chapter in chapters:
+            print(f"\n📖 {chapter}")
+            context = await chapter_context(db, args.class_grade, args.subject, chapter)
+            if not context:
+                print("   ⚠️  No content for chapter, skipping")
+                continue
+
+            async def run(spec):
+                async with semaphore:
+                    await build_cell(db, generator, spec, args.per_cell, context, counts)
+
+            await asyncio.gather(*(
+                run(QuestionSpec(
+                    subject=args.subject,
+                    class_num=int(class_number(args.class_grade)),
+                    type=qtype,
+                    difficulty=difficulty,
+                    cognitive=cognitive,
+                    chapter=chapter,
+                    language=args.language
+                ))
+                for qtype, difficulty, cognitive in itertools.product(
+                    args.types, args.difficulties, args.cognitive
+                )
+            ))
+
+        print("\n📊 SUMMARY")
+        print(f"   Cells built:   {counts['built']}")
+        print(f"   Cells full:    {counts['skipped']}")
+        print(f"   Cells failed:  {counts['failed']}")
+        print(f"   Questions:     {counts['questions']}")
+        print(f"   LLM calls:     {generator.calls} (rejected items: {generator.rejected})")
+
+    finally:
+        await db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the precomputed question bank")
+    parser.add_argument("--class", dest="class_grade", required=True, help="Class, e.g. 10")
+    parser.add_argument("--subject", required=True, help="Subject, e.g. Science")
+    parser.add_argument("--chapters", nargs="*", help="Chapters (default: all in corpus_stats)")
+    parser.add_argument("--types", nargs="*", default=DEFAULT_TYPES)
+    parser.add_argument("--difficulties", nargs="*", default=DEFAULT_DIFFICULTIES)
+    parser.add_argument("--cognitive", nargs="*", default=DEFAULT_COGNITIVE)
+    parser.add_argument("--language", default="english")
+    parser.add_argument("--per-cell", type=int, default=10, help="Target questions per cell")
+    parser.add_argument("--concurrency", type=int, default=4, help="Cells generated in parallel")
+    parser.add_argument("--model", default=os.getenv("GEMINI_MODEL", "gemini-2.0-flash"))
+    asyncio.run(build_question_bank(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,13 +4,14 @@ Production-ready with comprehensive checks and reporting.
 """
 
 import asyncio
-import asyncpg
 import os
 import logging
 from pathlib import Path
 from typing import List, Tuple
 import statistics
 
+from db_client import DatabaseClient
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -38,36 +39,20 @@ class ChunkChecker:
     """Checks database chunk quality and content."""
     
     def __init__(self):
-        self.connection = None
+        self.db = DatabaseClient()
     
     async def connect(self) -> bool:
-        """Establish database connection."""
-        try:
-            self.connection = await asyncpg.connect(
-                host='db.dcmnzvjftmdbywrjkust.supabase.co',
-                port=5432,
-                user='postgres',
-                password=os.getenv('DATABASE_PASSWORD'),
-                database='postgres',
-                ssl='require',
-                timeout=30
-            )
-            logger.info("Connected to database")
-            return True
-        except Exception as e:
-            logger.error(f"Database connection failed: {str(e)}")
-            return False
+        """Establish database connection pool."""
+        return await self.db.connect()
     
     async def close(self):
-        """Close database connection."""
-        if self.connection:
-            await self.connection.close()
-            logger.info("Database connection closed")
+        """Close database connection pool."""
+        await self.db.close()
     
     async def get_random_chunks(self, limit: int = 5) -> List[dict]:
         """Get random chunks from database."""
         try:
-            return await self.connection.fetch("""
+            return await self.db.fetch("""
                 SELECT chapter, content, LENGTH(content) as length 
                 FROM ncert_chunks 
                 WHERE LENGTH(content) > 200
@@ -81,7 +66,7 @@ class ChunkChecker:
     async def get_chapter_chunks(self, chapter: str, limit: int = 2) -> List[dict]:
         """Get chunks for specific chapter."""
         try:
-            return await self.connection.fetch("""
+            return await self.db.fetch("""
                 SELECT content, LENGTH(content) as length 
                 FROM ncert_chunks 
                 WHERE chapter = $1 
@@ -96,7 +81,7 @@ class ChunkChecker:
     async def get_chunk_statistics(self) -> dict:
         """Get comprehensive chunk statistics."""
         try:
-            stats = await self.connection.fetchrow("""
+            stats = await self.db.fetchrow("""
                 SELECT 
                     COUNT(*) as total_chunks,
                     COUNT(DISTINCT chapter) as unique_chapters,
@@ -116,7 +101,7 @@ class ChunkChecker:
     async def get_top_chapters(self, limit: int = 10) -> List[Tuple[str, int]]:
         """Get chapters with most chunks."""
         try:
-            rows = await self.connection.fetch("""
+            rows = await self.db.fetch("""
                 SELECT chapter, COUNT(*) as count 
                 FROM ncert_chunks 
                 GROUP BY chapter 
@@ -183,9 +168,13 @@ async def check_database():
             'Electricity'
         ]
         
-        for chapter in chapters_to_check:
+        # Chapter lookups are independent - run them concurrently over the pool
+        chapter_results = await asyncio.gather(
+            *(checker.get_chapter_chunks(chapter, 2) for chapter in chapters_to_check)
+        )
+        
+        for chapter, chapter_chunks in zip(chapters_to_check, chapter_results):
             logger.info(f"\n  {chapter}:")
-            chapter_chunks = await checker.get_chapter_chunks(chapter, 2)
             
             if chapter_chunks:
                 for j, chunk in enumerate(chapter_chunks, 1):
@@ -0,0 +1,104 @@
+"""
+Context Allocator - Spread retrieved chunks over a paper's buckets.
+
+Buckets that share a retrieval scope used to get the same chunks, so their
+questions clustered on the same few passages. allocate() instead gives each
+bucket a disjoint subset of the candidate chunks, sized in proportion to the
+bucket's weight (question count x marks):
+
+1. Quotas: the distinct candidates are split by weight (largest remainder),
+   at least one per bucket that has candidates, never more than a bucket
+   can use.
+2. Greedy assignment: chunks are taken best first and each goes to the
+   eligible bucket that needs it most - the most chunks still missing per
+   candidate it has left, so narrow scopes are served before broad ones
+   use up their chunks; then the least filled bucket. Buckets sharing a
+   scope therefore interleave the top chunks instead of one bucket taking
+   all of them.
+3. Leftovers: chunks no bucket had room for go to the eligible bucket with
+   the lowest fill per unit of weight, so no retrieved content is wasted.
+
+A bucket whose candidates were all taken by others (fully overlapping
+scopes with more buckets than chunks) falls back to sharing its best chunk
+rather than getting no context. Cost is O(P + C log C) for P
+candidate pairs over C distinct chunks - well under a millisecond for
+a paper.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+
+def _quotas(available: int, weights: Sequence[float], capacity: Sequence[int]) -> List[int]:
+    """Largest-remainder split of `available` chunks by weight, capped by capacity"""
+    total = sum(weight for weight, cap in zip(weights, capacity) if cap) or 1.0
+    exact = [available * weight / total if cap else 0.0 for weight, cap in zip(weights, capacity)]
+    quotas = [min(int(share), cap) for share, cap in zip(exact, capacity)]
+    quotas = [max(quota, 1) if cap else 0 for quota, cap in zip(quotas, capacity)]
+
+    spare = available - sum(quotas)
+    by_remainder = sorted(range(len(weights)), key=lambda i: exact[i] - int(exact[i]), reverse=True)
+    while spare > 0:
+        grown = False
+        for i in by_remainder:
+            if spare > 0 and quotas[i] < capacity[i]:
+                quotas[i] += 1
+                spare -= 1
+                grown = True
+        if not grown:
+            break
+    return quotas
+
+
+def allocate(
+    candidates: Sequence[Sequence[Dict[str, Any]]],
+    weights: Sequence[float],
+) -> List[List[Dict[str, Any]]]:
+    """
+    Disjoint chunk lists per bucket (best first). candidates[i] are the
+    chunks retrieved for bucket i's scope, each with "id" and "similarity".
+    """
+    chunks_by_id: Dict[Any, Dict[str, Any]] = {}
+    eligible: Dict[Any, List[int]] = {}
+    best: Dict[Any, float] = {}
+    for i, bucket_chunks in enumerate(candidates):
+        for chunk in bucket_chunks:
+            chunks_by_id.setdefault(chunk["id"], chunk)
+            eligible.setdefault(chunk["id"], []).append(i)
+            best[chunk["id"]] = max(best.get(chunk["id"], 0.0), chunk.get("similarity", 0.0))
+
+    capacity = [len({chunk["id"] for chunk in bucket_chunks}) for bucket_chunks in candidates]
+    quotas = _quotas(len(chunks_by_id), weights, capacity)
+
+    order = sorted(chunks_by_id, key=lambda chunk_id: best[chunk_id], reverse=True)
+
+    assigned: List[List[Any]] = [[] for _ in candidates]
+    remaining = list(capacity)
+    leftovers = []
+    for chunk_id in order:
+        # Most urgent bucket first: the most chunks still needed per candidate
+        # it has left; then the least filled; then the narrowest scope
+        open_buckets = [i for i in eligible[chunk_id] if len(assigned[i]) < quotas[i]]
+        if open_buckets:
+            target = max(open_buckets, key=lambda i: (
+                (quotas[i] - len(assigned[i])) / remaining[i],
+                -len(assigned[i]) / quotas[i],
+                -capacity[i]
+            ))
+            assigned[target].append(chunk_id)
+        else:
+            leftovers.append(chunk_id)
+        for i in set(eligible[chunk_id]):
+            remaining[i] -= 1
+
+    for chunk_id in leftovers:
+        target = min(eligible[chunk_id], key=lambda i: len(assigned[i]) / (weights[i] or 1.0))
+        assigned[target].append(chunk_id)
+
+    for i, bucket_chunks in enumerate(candidates):
+        if not assigned[i] and bucket_chunks:
+            assigned[i].append(bucket_chunks[0]["id"])
+
+    return [
+        sorted((chunks_by_id[chunk_id] for chunk_id in ids), key=lambda chunk: chunk.get("similarity", 0.0), reverse=True)
+        for ids in assigned
+    ]
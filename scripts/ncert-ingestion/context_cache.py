@@ -0,0 +1,111 @@
+"""
+Context Cache - Retrieved test-generation context, reused per syllabus scope.
+
+Papers for the same (class, subject, chapters, topic) scope with the same
+retrieval parameters retrieve the same context. Entries are stored under a
+normalized scope key together with the scope's corpus version: the chunk
+count and latest corpus_stats.updated_at of the chapters involved. Ingesting
+or deleting chunks in those chapters changes the version, so a stale entry
+is never served; other scopes stay cached.
+"""
+
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Sequence, Tuple
+
+from corpus_scope import class_grades
+
+logger = logging.getLogger(__name__)
+
+CONTEXT_CACHE_SIZE = int(os.getenv("CONTEXT_CACHE_SIZE", 512))
+# Upper bound on entry age, for changes corpus_stats does not see
+CONTEXT_CACHE_TTL_SECONDS = float(os.getenv("CONTEXT_CACHE_TTL_SECONDS", 3600))
+
+SCOPE_VERSION_SQL = """
+    SELECT COALESCE(SUM(chunk_count), 0) AS chunks, MAX(updated_at) AS updated_at
+    FROM corpus_stats
+    WHERE class_grade = ANY($1::text[])
+      AND lower(subject) = lower($2)
+      AND ($3::text[] IS NULL OR chapter = ANY($3))
+"""
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """Whitespace-collapsed form used in scope keys"""
+    return " ".join((text or "").split())
+
+
+def normalize_chapters(chapters: Optional[Sequence[str]]) -> Tuple[str, ...]:
+    """Order- and duplicate-insensitive chapter list"""
+    return tuple(sorted({normalize_text(chapter) for chapter in chapters or () if normalize_text(chapter)}))
+
+
+async def scope_version(
+    conn,
+    class_grade: str,
+    subject: str,
+    chapters: Optional[Sequence[str]] = None,
+) -> Optional[Tuple[int, str]]:
+    """
+    Corpus version of a scope (None chapters = whole subject), or None if
+    unknown. Counts rows of every stored spelling of the class (corpus_scope.py).
+    """
+    row = await conn.fetchrow(
+        SCOPE_VERSION_SQL, class_grades(class_grade), subject, list(chapters) if chapters else None
+    )
+    if row is None or row["updated_at"] is None:
+        return None
+    return int(row["chunks"]), row["updated_at"].isoformat()
+
+
+class ContextCache:
+    """LRU of scope key -> (corpus version, value)."""
+
+    def __init__(self, maxsize: int = CONTEXT_CACHE_SIZE, ttl_seconds: float = CONTEXT_CACHE_TTL_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable, version: Any) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        cached_version, stored_at, value = entry
+        if cached_version != version or time.monotonic() - stored_at > self.ttl:
+            del self._entries[key]
+            self.invalidated += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, version: Any, value: Any):
+        self._entries[key] = (version, time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidated": self.invalidated,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+context_cache = ContextCache()
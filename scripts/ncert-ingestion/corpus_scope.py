@@ -0,0 +1,40 @@
+"""
+Corpus Scope - How class and subject are spelled in ncert_chunks.
+
+The corpus holds class grades in two spellings: ingest.py stores the bare
+number ('10'), while add_ncert_content.py and maintain_database.py store
+'Class 10'. Subject case varies between sources too. Anything that filters
+or compares chunks by class/subject goes through these helpers: SQL filters
+match every spelling of the class (class_grade = ANY(class_grades(...)))
+and compare lower(subject).
+"""
+
+import re
+from typing import Any, List, Optional
+
+_CLASS_NUMBER = re.compile(r"^(?:class\s*)?(\d{1,2})$", re.IGNORECASE)
+
+
+def class_number(value: Any) -> Optional[str]:
+    """'10' for 10, '10' or 'Class 10'; other values stripped as is (None if empty)"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    match = _CLASS_NUMBER.match(text)
+    return match.group(1) if match else (text or None)
+
+
+def class_grades(value: Any) -> Optional[List[str]]:
+    """Every stored spelling of a class, for `class_grade = ANY($n)` (None = no filter)"""
+    number = class_number(value)
+    if number is None:
+        return None
+    return [f"Class {number}", number] if number.isdigit() else [number]
+
+
+def same_class(stored: Any, value: Any) -> bool:
+    return class_number(stored) == class_number(value)
+
+
+def same_subject(stored: Optional[str], value: Optional[str]) -> bool:
+    return (stored or "").strip().lower() == (value or "").strip().lower()
@@ -0,0 +1,248 @@
+"""
+Corpus Statistics - Incrementally maintained counts for ncert_chunks.
+
+Ingest and delete paths apply per-(class, subject, chapter) deltas in the same
+transaction as their writes; a periodic reconcile recomputes the table from
+ncert_chunks to correct any drift. Stats readers only touch corpus_stats, whose
+size is bounded by the number of chapters, never by the number of chunks.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS corpus_stats (
+        class_grade TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        chapter TEXT NOT NULL,
+        chunk_count BIGINT NOT NULL DEFAULT 0,
+        content_chars BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        reconciled_at TIMESTAMPTZ,
+        PRIMARY KEY (class_grade, subject, chapter)
+    )
+"""
+
+APPLY_DELTAS_SQL = """
+    INSERT INTO corpus_stats AS s
+        (class_grade, subject, chapter, chunk_count, content_chars, updated_at)
+    SELECT d.class_grade, d.subject, d.chapter, d.chunk_count, d.content_chars, NOW()
+    FROM unnest($1::text[], $2::text[], $3::text[], $4::bigint[], $5::bigint[])
+        AS d(class_grade, subject, chapter, chunk_count, content_chars)
+    ON CONFLICT (class_grade, subject, chapter) DO UPDATE
+    SET chunk_count = s.chunk_count + EXCLUDED.chunk_count,
+        content_chars = s.content_chars + EXCLUDED.content_chars,
+        updated_at = NOW()
+"""
+
+PRUNE_SQL = "DELETE FROM corpus_stats WHERE chunk_count <= 0"
+
+READ_SQL = """
+    SELECT class_grade, subject, chapter, chunk_count, content_chars,
+           updated_at, reconciled_at
+    FROM corpus_stats
+"""
+
+StatsKey = Tuple[str, str, str]
+
+
+# ============== DELTAS ==============
+
+def deltas_from_chunks(chunks: Iterable[Dict], sign: int = 1) -> Dict[StatsKey, List[int]]:
+    """Aggregate inserted/deleted chunk dicts into per-chapter deltas."""
+    deltas: Dict[StatsKey, List[int]] = defaultdict(lambda: [0, 0])
+    for chunk in chunks:
+        key = (chunk['class_grade'], chunk['subject'], chunk['chapter'])
+        deltas[key][0] += sign
+        deltas[key][1] += sign * len(chunk['content'])
+    return deltas
+
+
+def deltas_from_rows(rows: Iterable[Any], sign: int = -1) -> Dict[StatsKey, List[int]]:
+    """Build deltas from grouped rows (class_grade, subject, chapter, chunk_count, content_chars)."""
+    deltas: Dict[StatsKey, List[int]] = defaultdict(lambda: [0, 0])
+    for row in rows:
+        key = (row['class_grade'], row['subject'], row['chapter'])
+        deltas[key][0] += sign * int(row['chunk_count'])
+        deltas[key][1] += sign * int(row['content_chars'] or 0)
+    return deltas
+
+
+def _delta_arrays(deltas: Dict[StatsKey, List[int]]) -> Tuple[list, list, list, list, list]:
+    keys = list(deltas)
+    return (
+        [k[0] for k in keys],
+        [k[1] for k in keys],
+        [k[2] for k in keys],
+        [deltas[k][0] for k in keys],
+        [deltas[k][1] for k in keys],
+    )
+
+
+async def apply_deltas(conn, deltas: Dict[StatsKey, List[int]]):
+    """
+    Apply deltas with one statement. Call inside the transaction that wrote
+    the chunks so the counts commit (or roll back) together with the data.
+    """
+    if not deltas:
+        return
+    await conn.execute(APPLY_DELTAS_SQL, *_delta_arrays(deltas))
+    if any(count < 0 for count, _ in deltas.values()):
+        await conn.execute(PRUNE_SQL)
+
+
+# Deletes report what they removed so the stats can be decremented in the
+# same round trip. Wrap any `DELETE FROM ncert_chunks ...` with this.
+DELETE_WITH_DELTAS_SQL = """
+    WITH deleted AS (
+        {delete_sql}
+        RETURNING class_grade, subject, chapter, LENGTH(content) AS chars
+    )
+    SELECT class_grade, subject, chapter,
+           COUNT(*) AS chunk_count, SUM(chars) AS content_chars
+    FROM deleted
+    GROUP BY class_grade, subject, chapter
+"""
+
+
+async def delete_chunks(conn, where_sql: str, *args) -> int:
+    """
+    Delete from ncert_chunks and decrement corpus_stats in one transaction.
+    Returns the number of chunks removed.
+    """
+    query = DELETE_WITH_DELTAS_SQL.format(delete_sql=f"DELETE FROM ncert_chunks {where_sql}")
+    async with conn.transaction():
+        rows = await conn.fetch(query, *args)
+        await apply_deltas(conn, deltas_from_rows(rows))
+    return sum(int(row['chunk_count']) for row in rows)
+
+
+# ============== SCHEMA & RECONCILE ==============
+
+async def ensure_schema(conn):
+    """Create corpus_stats and seed it from ncert_chunks on first use."""
+    await conn.execute(SCHEMA_SQL)
+    has_rows = await conn.fetchval("SELECT EXISTS (SELECT 1 FROM corpus_stats)")
+    if not has_rows:
+        await reconcile(conn)
+
+
+async def reconcile(conn) -> int:
+    """
+    Recompute corpus_stats from ncert_chunks. Writers are blocked (readers are
+    not) for the duration of the scan so no delta can be double counted.
+    updated_at only moves for chapters whose counts actually changed, so it
+    can be used to detect content changes (see context_cache.py).
+    """
+    async with conn.transaction():
+        await conn.execute("LOCK TABLE ncert_chunks IN SHARE MODE")
+        result = await conn.execute("""
+            WITH fresh AS (
+                SELECT class_grade, subject, chapter,
+                       COUNT(*) AS chunk_count,
+                       COALESCE(SUM(LENGTH(content)), 0) AS content_chars
+                FROM ncert_chunks
+                GROUP BY class_grade, subject, chapter
+            ),
+            removed AS (
+                DELETE FROM corpus_stats s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM fresh f
+                    WHERE f.class_grade = s.class_grade AND f.subject = s.subject AND f.chapter = s.chapter
+                )
+            )
+            INSERT INTO corpus_stats AS s
+                (class_grade, subject, chapter, chunk_count, content_chars, updated_at, reconciled_at)
+            SELECT class_grade, subject, chapter, chunk_count, content_chars, NOW(), NOW()
+            FROM fresh
+            ON CONFLICT (class_grade, subject, chapter) DO UPDATE
+            SET chunk_count = EXCLUDED.chunk_count,
+                content_chars = EXCLUDED.content_chars,
+                updated_at = CASE
+                    WHEN s.chunk_count = EXCLUDED.chunk_count AND s.content_chars = EXCLUDED.content_chars
+                    THEN s.updated_at ELSE NOW()
+                END,
+                reconciled_at = NOW()
+        """)
+    scopes = int(result.split()[-1]) if result else 0
+    logger.info(f"Reconciled corpus_stats ({scopes} chapters)")
+    return scopes
+
+
+async def reconcile_periodically(pool, interval_seconds: float):
+    """Background task: reconcile corpus_stats every `interval_seconds`."""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            async with pool.acquire() as conn:
+                await reconcile(conn)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"corpus_stats reconcile failed: {e}")
+
+
+# ============== READERS ==============
+
+def summarize(rows: Iterable[Any], top_chapters: int = 10) -> Dict[str, Any]:
+    """Turn corpus_stats rows into the stats payload served by the APIs."""
+    rows = [dict(row) for row in rows if row['chunk_count'] > 0]
+
+    by_class: Dict[str, int] = defaultdict(int)
+    by_subject: Dict[str, int] = defaultdict(int)
+    by_chapter: Dict[str, int] = defaultdict(int)
+    total_chunks = 0
+    total_chars = 0
+    last_change: Optional[datetime] = None
+    reconciled: Optional[datetime] = None
+
+    for row in rows:
+        total_chunks += row['chunk_count']
+        total_chars += row['content_chars']
+        by_class[row['class_grade']] += row['chunk_count']
+        by_subject[row['subject']] += row['chunk_count']
+        by_chapter[row['chapter']] += row['chunk_count']
+        if last_change is None or row['updated_at'] > last_change:
+            last_change = row['updated_at']
+        if row['reconciled_at'] and (reconciled is None or row['reconciled_at'] < reconciled):
+            reconciled = row['reconciled_at']
+
+    now = datetime.now(timezone.utc)
+    top = sorted(by_chapter.items(), key=lambda item: item[1], reverse=True)[:top_chapters]
+
+    return {
+        "total_chunks": total_chunks,
+        "unique_chapters": len(by_chapter),
+        "unique_subjects": len(by_subject),
+        "unique_classes": len(by_class),
+        "total_content_chars": total_chars,
+        "avg_content_length": (total_chars / total_chunks) if total_chunks else 0,
+        "by_class": [{"class_grade": k, "count": v} for k, v in sorted(by_class.items())],
+        "by_subject": [{"subject": k, "count": v} for k, v in sorted(by_subject.items())],
+        "top_chapters": [{"chapter": k, "count": v} for k, v in top],
+        "freshness": {
+            "source": "corpus_stats",
+            "last_change_at": last_change.isoformat() if last_change else None,
+            "reconciled_at": reconciled.isoformat() if reconciled else None,
+            "seconds_since_reconcile": int((now - reconciled).total_seconds()) if reconciled else None,
+        },
+    }
+
+
+async def read_stats(conn, top_chapters: int = 10) -> Dict[str, Any]:
+    """Read stats with asyncpg (connection, pool or DatabaseClient)."""
+    return summarize(await conn.fetch(READ_SQL), top_chapters)
+
+
+def read_stats_sync(conn, top_chapters: int = 10) -> Dict[str, Any]:
+    """Read stats with a psycopg2 connection."""
+    from psycopg2.extras import RealDictCursor
+
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute(READ_SQL)
+        return summarize(cursor.fetchall(), top_chapters)
@@ -0,0 +1,163 @@
+"""
+Shared Database Client - Pooled asyncpg access for all NCERT scripts.
+Provides connection pooling, prepared-statement caching, statement timeouts
+and a binary codec mapping the pgvector `vector` type to NumPy arrays.
+"""
+
+import asyncio
+import asyncpg
+import os
+import logging
+from dataclasses import dataclass
+from typing import Any, List, Optional, Sequence
+
+from vector_codec import register_vector_asyncpg
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HOST = 'db.dcmnzvjftmdbywrjkust.supabase.co'
+
+
+@dataclass
+class DatabaseConfig:
+    """Connection and pool settings, read from the environment."""
+    host: str = DEFAULT_HOST
+    port: int = 5432
+    user: str = 'postgres'
+    password: str = ''
+    database: str = 'postgres'
+    ssl: str = 'require'
+    connect_timeout: float = 30.0
+    min_size: int = 1
+    max_size: int = 10
+    # asyncpg prepares every query and keeps it per connection; set to 0
+    # when connecting through a transaction-mode pooler (e.g. pgbouncer).
+    statement_cache_size: int = 256
+    max_cached_statement_lifetime: int = 300
+    statement_timeout_ms: int = 60_000
+
+    @classmethod
+    def from_env(cls) -> "DatabaseConfig":
+        """Build config from DATABASE_* / DB_* environment variables."""
+        return cls(
+            host=os.getenv('DATABASE_HOST', DEFAULT_HOST),
+            port=int(os.getenv('DATABASE_PORT', 5432)),
+            user=os.getenv('DATABASE_USER', 'postgres'),
+            password=os.getenv('DATABASE_PASSWORD', '').strip(),
+            database=os.getenv('DATABASE_NAME', 'postgres'),
+            ssl=os.getenv('DATABASE_SSL', 'require'),
+            connect_timeout=float(os.getenv('DB_CONNECT_TIMEOUT', 30)),
+            min_size=int(os.getenv('DB_POOL_MIN_SIZE', 1)),
+            max_size=int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            statement_cache_size=int(os.getenv('DB_STATEMENT_CACHE_SIZE', 256)),
+            max_cached_statement_lifetime=int(os.getenv('DB_STATEMENT_CACHE_LIFETIME', 300)),
+            statement_timeout_ms=int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 60_000)),
+        )
+
+
+# ============== CLIENT ==============
+
+class DatabaseClient:
+    """Pooled database client shared by scripts and API servers."""
+
+    def __init__(self, config: Optional[DatabaseConfig] = None):
+        self.config = config or DatabaseConfig.from_env()
+        self.pool: Optional[asyncpg.Pool] = None
+        self._lock = asyncio.Lock()
+
+    async def _init_connection(self, conn: asyncpg.Connection):
+        """Per-connection setup run once when the pool opens a connection."""
+        await register_vector_asyncpg(conn)
+
+    async def connect(self) -> bool:
+        """Create the connection pool. Safe to call more than once."""
+        async with self._lock:
+            if self.pool is not None:
+                return True
+
+            if not self.config.password:
+                logger.error("DATABASE_PASSWORD is empty or not set")
+                return False
+
+            try:
+                self.pool = await asyncpg.create_pool(
+                    host=self.config.host,
+                    port=self.config.port,
+                    user=self.config.user,
+                    password=self.config.password,
+                    database=self.config.database,
+                    ssl=self.config.ssl,
+                    timeout=self.config.connect_timeout,
+                    min_size=self.config.min_size,
+                    max_size=self.config.max_size,
+                    statement_cache_size=self.config.statement_cache_size,
+                    max_cached_statement_lifetime=self.config.max_cached_statement_lifetime,
+                    server_settings={
+                        'statement_timeout': str(self.config.statement_timeout_ms),
+                        'application_name': 'ncert-ingestion',
+                    },
+                    init=self._init_connection
+                )
+                logger.info(
+                    f"Connected to database (pool {self.config.min_size}-{self.config.max_size}, "
+                    f"statement_timeout={self.config.statement_timeout_ms}ms)"
+                )
+                return True
+            except Exception as e:
+                logger.error(f"Database connection failed: {str(e)}")
+                self.pool = None
+                return False
+
+    async def close(self):
+        """Close the pool and all its connections."""
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
+            logger.info("Database connection closed")
+
+    async def __aenter__(self) -> "DatabaseClient":
+        if not await self.connect():
+            raise ConnectionError("Could not connect to database")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    def _require_pool(self) -> asyncpg.Pool:
+        if self.pool is None:
+            raise ConnectionError("Database client is not connected")
+        return self.pool
+
+    def acquire(self, timeout: Optional[float] = None):
+        """Acquire a pooled connection (use as `async with db.acquire() as conn`)."""
+        return self._require_pool().acquire(timeout=timeout)
+
+    # Each helper checks out its own connection, so independent queries can
+    # be run concurrently with asyncio.gather().
+
+    async def fetch(self, query: str, *args, timeout: Optional[float] = None) -> List[asyncpg.Record]:
+        return await self._require_pool().fetch(query, *args, timeout=timeout)
+
+    async def fetchrow(self, query: str, *args, timeout: Optional[float] = None) -> Optional[asyncpg.Record]:
+        return await self._require_pool().fetchrow(query, *args, timeout=timeout)
+
+    async def fetchval(self, query: str, *args, timeout: Optional[float] = None) -> Any:
+        return await self._require_pool().fetchval(query, *args, timeout=timeout)
+
+    async def execute(self, query: str, *args, timeout: Optional[float] = None) -> str:
+        return await self._require_pool().execute(query, *args, timeout=timeout)
+
+    async def executemany(self, query: str, args: Sequence[Sequence[Any]], timeout: Optional[float] = None):
+        return await self._require_pool().executemany(query, args, timeout=timeout)
+
+
+# Shared instance for long-running services
+_database_client: Optional[DatabaseClient] = None
+
+
+def get_database_client() -> DatabaseClient:
+    """Return the process-wide database client (call connect() before use)."""
+    global _database_client
+    if _database_client is None:
+        _database_client = DatabaseClient()
+    return _database_client
@@ -0,0 +1,160 @@
+"""
+Request Deadlines - Per-request time budgets and cancellation.
+
+A request handler runs its work as a task under a Deadline. The task is
+cancelled when the deadline passes or the client disconnects, and the
+cancellation propagates into whatever it is awaiting: asyncpg cancels the
+running statement on the server, and in-flight LLM calls are abandoned.
+Code deeper in the stack reads the active deadline with current_deadline()
+to size statement_timeout and LLM timeouts to the time actually left.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT_SECONDS", 30))
+
+# How often the client connection is polled while work is running
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time."""
+
+
+class ClientDisconnected(Exception):
+    """The client went away before the response was ready."""
+
+
+class Deadline:
+    """Absolute point in (monotonic) time by which a request must finish."""
+
+    def __init__(self, timeout_seconds: float):
+        self.timeout = timeout_seconds
+        self.expires_at = time.monotonic() + timeout_seconds
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self):
+        """Raise DeadlineExceeded if no time is left."""
+        if self.expired:
+            raise DeadlineExceeded(f"deadline of {self.timeout:.1f}s exceeded")
+
+    def statement_timeout_ms(self, floor_ms: int = 100) -> int:
+        """Remaining budget as a Postgres statement_timeout value."""
+        return max(int(self.remaining() * 1000), floor_ms)
+
+
+_current_deadline: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar(
+    "current_deadline", default=None
+)
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline of the request being served, if any."""
+    return _current_deadline.get()
+
+
+def remaining_or(default: Optional[float]) -> Optional[float]:
+    """Seconds left on the active deadline, or `default` outside a request."""
+    deadline = current_deadline()
+    return deadline.remaining() if deadline else default
+
+
+async def run_with_deadline(
+    work: Awaitable[Any],
+    timeout_seconds: float = DEFAULT_REQUEST_TIMEOUT,
+    request=None,
+) -> Any:
+    """
+    Run `work` under a deadline, cancelling it on timeout or (when a Starlette
+    `request` is given) client disconnect.
+
+    Raises:
+        DeadlineExceeded: the deadline passed first
+        ClientDisconnected: the client closed the connection first
+    """
+    deadline = Deadline(timeout_seconds)
+    # Set before creating the task so it inherits the deadline in its context
+    token = _current_deadline.set(deadline)
+    task = asyncio.ensure_future(work)
+    _current_deadline.reset(token)
+
+    try:
+        while True:
+            wait = deadline.remaining()
+            if request is not None:
+                wait = min(wait, DISCONNECT_POLL_SECONDS)
+            done, _ = await asyncio.wait({task}, timeout=wait)
+            if done:
+                return task.result()
+            if deadline.expired:
+                raise DeadlineExceeded(f"deadline of {timeout_seconds:.1f}s exceeded")
+            if request is not None and await request.is_disconnected():
+                raise ClientDisconnected("client disconnected")
+    finally:
+        if not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+            logger.info("Cancelled in-flight request work")
+
+
+async def detached(work: Awaitable[Any]) -> Any:
+    """
+    Await `work` with no request deadline in scope. For work shared by several
+    requests (see singleflight.py); must run as its own task, since it clears
+    the deadline in the context it runs in.
+    """
+    _current_deadline.set(None)
+    return await work
+
+
+async def iterate_with_deadline(
+    events: AsyncIterator[Any],
+    timeout_seconds: float = DEFAULT_REQUEST_TIMEOUT,
+) -> AsyncIterator[Any]:
+    """
+    Deadline for streaming responses: re-yield `events` until it finishes or
+    the deadline passes (DeadlineExceeded). Client disconnects are handled by
+    StreamingResponse, which cancels the stream and so closes `events`.
+    """
+    deadline = Deadline(timeout_seconds)
+    previous = _current_deadline.get()
+    _current_deadline.set(deadline)
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(events.__anext__(), timeout=deadline.remaining())
+            except StopAsyncIteration:
+                return
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"deadline of {timeout_seconds:.1f}s exceeded")
+            yield item
+    finally:
+        _current_deadline.set(previous)
+        await events.aclose()
+
+
+async def set_statement_timeout(conn, deadline: Optional[Deadline] = None):
+    """
+    Bound every statement in the current transaction by the request deadline
+    (SET LOCAL, so the pooled connection is unaffected once it is released).
+    """
+    deadline = deadline or current_deadline()
+    if deadline is not None:
+        deadline.check()
+        await conn.execute(f"SET LOCAL statement_timeout = {deadline.statement_timeout_ms()}")
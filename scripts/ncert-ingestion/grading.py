@@ -0,0 +1,264 @@
+"""
+Grading - Vectorized auto-grading of objective answer sheets.
+
+A sheet of student responses for a stored test is encoded once into an
+integer answer matrix (students x questions) and graded against the key
+vector with NumPy:
+
+    codes[s, q]   choice index the student picked (-1 = blank, -2 = not an option)
+    key[q]        index of the correct choice
+    correct       = codes == key
+    wrong         = answered & ~correct
+    scores        = correct @ marks - wrong @ (marks * negative)
+
+MCQ and true/false answers may be given as the option letter ("B") or the
+option text, compared case- and punctuation-insensitively with whitespace
+normalized; fill-in-the-blank answers ignore case, punctuation and spaces
+altogether, so "photo-synthesis" matches "Photosynthesis" (choice 0 =
+matches the key, 1 = anything else).
+Strings are mapped to codes once per distinct value of each column, not
+per cell, so encoding stays cheap for thousands of students. Other
+question types (short/long/numerical/case-based) need a human and are
+reported as ungraded.
+
+Per-question statistics (correct/wrong/blank rates, choice distribution and
+an upper-lower 27% discrimination index) come out of the same matrices.
+"""
+
+import csv
+import io
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GRADING_MAX_STUDENTS = int(os.getenv("GRADING_MAX_STUDENTS", 20000))
+
+GRADABLE_TYPES = ("mcq", "true_false", "fill_blanks")
+
+BLANK, INVALID = -1, -2
+
+STUDENT_ID_COLUMNS = ("studentid", "student_id", "student", "rollno", "roll_no", "roll")
+
+
+def normalize_text(text: str) -> str:
+    """Case/punctuation-insensitive, whitespace-normalized form of an answer"""
+    return re.sub(r"[\W_]+", " ", text.lower()).strip()
+
+
+def _blank_form(text: str) -> str:
+    """Fill-in-the-blank comparison form: normalized text without spaces"""
+    return normalize_text(text).replace(" ", "")
+
+
+class GradingError(ValueError):
+    """Raised when a response sheet cannot be graded"""
+    pass
+
+
+@dataclass
+class ResponseSheet:
+    """Student responses, column-wise: question id -> one answer per student"""
+    student_ids: List[str]
+    columns: Dict[str, List[Optional[str]]]
+
+
+def parse_csv(text: str) -> ResponseSheet:
+    """
+    CSV with a header row: a student id column (studentId, roll, ... or the
+    first column) and one column per question id (Q1, Q2, ...).
+    """
+    rows = list(csv.reader(io.StringIO(text.lstrip("\ufeff"))))
+    if len(rows) < 2:
+        raise GradingError("CSV needs a header row and at least one student")
+
+    header = [cell.strip() for cell in rows[0]]
+    lowered = [cell.lower() for cell in header]
+    id_col = next((lowered.index(name) for name in STUDENT_ID_COLUMNS if name in lowered), 0)
+
+    body = [row for row in rows[1:] if any(cell.strip() for cell in row)]
+    _check_size(len(body))
+    width = len(header)
+    body = [row[:width] + [""] * (width - len(row)) for row in body]
+
+    return ResponseSheet(
+        student_ids=[row[id_col].strip() or f"row{n}" for n, row in enumerate(body, 2)],
+        columns={
+            header[col]: [row[col] for row in body]
+            for col in range(width) if col != id_col and header[col]
+        }
+    )
+
+
+def parse_json(data: Any) -> ResponseSheet:
+    """
+    {"responses": [{"studentId": ..., "answers": {"Q1": "B", ...}}, ...]}
+    (or just the list)
+    """
+    entries = data.get("responses") if isinstance(data, dict) else data
+    if not isinstance(entries, list) or not entries:
+        raise GradingError("JSON needs a non-empty 'responses' list")
+    _check_size(len(entries))
+
+    student_ids, columns = [], {}
+    for n, entry in enumerate(entries):
+        if not isinstance(entry, dict) or not isinstance(entry.get("answers"), dict):
+            raise GradingError(f"responses[{n}] needs an 'answers' object")
+        student_ids.append(str(entry.get("studentId") or f"student{n + 1}"))
+        for question_id, answer in entry["answers"].items():
+            columns.setdefault(question_id, [None] * len(entries))[n] = None if answer is None else str(answer)
+    return ResponseSheet(student_ids=student_ids, columns=columns)
+
+
+def _check_size(students: int):
+    if students > GRADING_MAX_STUDENTS:
+        raise GradingError(f"At most {GRADING_MAX_STUDENTS} students per sheet (got {students})")
+
+
+def _choice_codes(question: Dict[str, Any]) -> Dict[str, int]:
+    """Accepted spellings of each choice -> choice index"""
+    if question["type"] == "fill_blanks":
+        return {_blank_form(question["correctAnswer"]): 0}
+    options = question.get("options") or []
+    codes = {chr(97 + i): i for i in range(len(options))}
+    codes.update((normalize_text(option), i) for i, option in enumerate(options))
+    return codes
+
+
+def _key_index(question: Dict[str, Any]) -> int:
+    if question["type"] == "fill_blanks":
+        return 0
+    options = [normalize_text(option) for option in question.get("options") or []]
+    answer = normalize_text(question["correctAnswer"])
+    return options.index(answer) if answer in options else INVALID
+
+
+def _encode_column(question: Dict[str, Any], answers: Sequence[Optional[str]]) -> np.ndarray:
+    """One column of the answer matrix, mapping each distinct answer once"""
+    # Factorize: distinct raw answers -> 0..k-1 (cheaper than np.unique on strings)
+    distinct: Dict[str, int] = {}
+    inverse = np.fromiter(
+        (distinct.setdefault(answer or "", len(distinct)) for answer in answers),
+        dtype=np.int32, count=len(answers)
+    )
+    values = list(distinct)
+    codes = _choice_codes(question)
+    fill_blank = question["type"] == "fill_blanks"
+    mapped = np.empty(len(values), dtype=np.int16)
+    for i, value in enumerate(values):
+        text = normalize_text(value)
+        if not text:
+            mapped[i] = BLANK
+        elif fill_blank:
+            mapped[i] = codes.get(text.replace(" ", ""), 1)
+        else:
+            mapped[i] = codes.get(text, INVALID)
+    return mapped[inverse]
+
+
+def grade(
+    questions: List[Dict[str, Any]],
+    negative: Sequence[float],
+    sheet: ResponseSheet,
+) -> Dict[str, Any]:
+    """
+    Grade `sheet` against a test's questions; negative[q] is the fraction of
+    question q's marks deducted for a wrong (non-blank) answer.
+    """
+    gradable = [i for i, question in enumerate(questions) if question.get("type") in GRADABLE_TYPES]
+    if not gradable:
+        raise GradingError("Test has no auto-gradable (MCQ, true/false, fill-in-the-blank) questions")
+
+    graded = [questions[i] for i in gradable]
+    students = len(sheet.student_ids)
+    missing = [question["id"] for question in graded if question["id"] not in sheet.columns]
+
+    codes = np.full((students, len(graded)), BLANK, dtype=np.int16)
+    for q, question in enumerate(graded):
+        if question["id"] in sheet.columns:
+            codes[:, q] = _encode_column(question, sheet.columns[question["id"]])
+
+    key = np.array([_key_index(question) for question in graded], dtype=np.int16)
+    marks = np.array([question.get("marks", 1) for question in graded], dtype=np.float64)
+    penalty = marks * np.array([negative[i] or 0.0 for i in gradable], dtype=np.float64)
+
+    answered = codes != BLANK
+    correct = (codes == key) & (key >= 0)
+    wrong = answered & ~correct
+
+    scores = correct @ marks - wrong @ penalty
+    max_score = float(marks.sum())
+
+    # Discrimination: correct rate among the top 27% minus the bottom 27%
+    group = max(1, int(round(students * 0.27)))
+    order = np.argsort(scores, kind="stable")
+    discrimination = correct[order[-group:]].mean(axis=0) - correct[order[:group]].mean(axis=0)
+
+    # Choice distribution in one scatter-add: counts[q, choice]
+    width = max(2, max(len(question.get("options") or []) for question in graded))
+    counts = np.zeros((len(graded), width), dtype=np.int64)
+    picked = codes >= 0
+    np.add.at(counts, (np.nonzero(picked)[1], codes[picked]), 1)
+
+    # Per-student and per-question aggregates, converted to Python values in bulk
+    student_scores = np.round(scores, 2).tolist()
+    percentages = (np.round(scores * 100 / max_score, 2) if max_score else np.zeros(students)).tolist()
+    correct_count = correct.sum(axis=1).tolist()
+    wrong_count = wrong.sum(axis=1).tolist()
+    correct_rate = np.round(correct.mean(axis=0), 4).tolist()
+    wrong_rate = np.round(wrong.mean(axis=0), 4).tolist()
+    blank_rate = np.round(1.0 - answered.mean(axis=0), 4).tolist()
+    invalid = (codes == INVALID).sum(axis=0).tolist()
+    discrimination = np.round(discrimination, 4).tolist()
+    counts = counts.tolist()
+
+    return {
+        "summary": {
+            "students": students,
+            "gradedQuestions": len(graded),
+            "maxScore": max_score,
+            "mean": round(float(scores.mean()), 2),
+            "median": round(float(np.median(scores)), 2),
+            "std": round(float(scores.std()), 2),
+            "min": round(float(scores.min()), 2),
+            "max": round(float(scores.max()), 2),
+            "ungradedQuestions": [question["id"] for question in questions if question.get("type") not in GRADABLE_TYPES],
+            "missingColumns": missing,
+            "unknownColumns": sorted(set(sheet.columns) - {question["id"] for question in questions}),
+        },
+        "students": [
+            {
+                "studentId": student_id,
+                "score": score,
+                "percentage": percentage,
+                "correct": n_correct,
+                "wrong": n_wrong,
+                "blank": len(graded) - n_correct - n_wrong,
+            }
+            for student_id, score, percentage, n_correct, n_wrong
+            in zip(sheet.student_ids, student_scores, percentages, correct_count, wrong_count)
+        ],
+        "questions": [
+            {
+                "id": question["id"],
+                "type": question["type"],
+                "marks": question.get("marks", 1),
+                "negativeMarks": float(penalty[q]),
+                "correctRate": correct_rate[q],
+                "wrongRate": wrong_rate[q],
+                "blankRate": blank_rate[q],
+                "invalidAnswers": invalid[q],
+                "discrimination": discrimination[q],
+                "choiceCounts": (
+                    None if question["type"] == "fill_blanks"
+                    else {chr(65 + i): counts[q][i] for i in range(len(question.get("options") or []))}
+                ),
+            }
+            for q, question in enumerate(graded)
+        ],
+    }
@@ -0,0 +1,185 @@
+"""
+Background Health Monitor - Cached dependency checks for cheap probes.
+
+Checks (database, LLM, system resources) run on a timer in the background and
+store their results in a snapshot. Liveness and readiness endpoints only read
+that snapshot, so probing frequency never turns into database or CPU load.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+CheckFn = Callable[[], Awaitable[Dict[str, Any]]]
+
+
+class HealthMonitor:
+    """Runs registered health checks periodically and caches the results."""
+
+    def __init__(
+        self,
+        interval_seconds: float = float(os.getenv("HEALTH_CHECK_INTERVAL_SECONDS", 15)),
+        check_timeout_seconds: float = float(os.getenv("HEALTH_CHECK_TIMEOUT_SECONDS", 5)),
+    ):
+        self.interval = interval_seconds
+        self.check_timeout = check_timeout_seconds
+        # Readiness fails if the monitor itself stops refreshing
+        self.stale_after = interval_seconds * 3
+        self.started_at = time.monotonic()
+
+        self._checks: Dict[str, Tuple[CheckFn, bool]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._ready = False
+        self._refreshed_at: Optional[float] = None
+        self._snapshot: Dict[str, Any] = {
+            "status": "starting",
+            "checked_at": None,
+            "checks": {},
+        }
+
+    def add_check(self, name: str, check: CheckFn, critical: bool = True):
+        """Register a check. Critical checks gate readiness."""
+        self._checks[name] = (check, critical)
+
+    async def _run_check(self, name: str, check: CheckFn) -> Dict[str, Any]:
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(check(), timeout=self.check_timeout)
+            result.setdefault("status", "healthy")
+        except asyncio.TimeoutError:
+            result = {"status": "unhealthy", "error": f"timed out after {self.check_timeout}s"}
+        except Exception as e:
+            result = {"status": "unhealthy", "error": str(e)}
+        result["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        return result
+
+    async def refresh(self) -> Dict[str, Any]:
+        """Run every check once (concurrently) and publish a new snapshot."""
+        names = list(self._checks)
+        results = await asyncio.gather(
+            *(self._run_check(name, self._checks[name][0]) for name in names)
+        )
+        checks = dict(zip(names, results))
+
+        ready = all(
+            checks[name]["status"] != "unhealthy"
+            for name in names if self._checks[name][1]
+        )
+        degraded = any(result["status"] != "healthy" for result in results)
+
+        # Publish atomically - readers never see a half-built snapshot
+        self._snapshot = {
+            "status": "healthy" if not degraded else ("degraded" if ready else "unhealthy"),
+            "checked_at": datetime.utcnow().isoformat(),
+            "checks": checks,
+        }
+        self._ready = ready
+        self._refreshed_at = time.monotonic()
+        return self._snapshot
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Health refresh failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the background refresh task (call from the app lifespan)."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ============== PROBES (no I/O) ==============
+
+    def liveness(self) -> Dict[str, Any]:
+        """Process is up and the event loop is responsive."""
+        return {
+            "status": "alive",
+            "uptime_seconds": int(time.monotonic() - self.started_at),
+        }
+
+    def readiness(self) -> Tuple[bool, Dict[str, Any]]:
+        """Whether the service should receive traffic, from the cached snapshot."""
+        age = None if self._refreshed_at is None else time.monotonic() - self._refreshed_at
+        stale = age is None or age > self.stale_after
+        ready = self._ready and not stale
+        return ready, {
+            "status": "ready" if ready else "not_ready",
+            "snapshot_age_seconds": None if age is None else round(age, 1),
+            "stale": stale,
+            "checks": {name: result["status"] for name, result in self._snapshot["checks"].items()},
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Full cached health report."""
+        return self._snapshot
+
+
+# ============== COMMON CHECKS ==============
+
+def estimated_rows_check(pool, table: str) -> CheckFn:
+    """
+    Database check using the planner's pg_class.reltuples estimate instead of
+    COUNT(*): a catalog lookup that costs the same regardless of table size.
+    """
+    async def check() -> Dict[str, Any]:
+        estimate = await pool.fetchval(
+            "SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass($1)", table
+        )
+        if estimate is None:
+            return {"status": "unhealthy", "error": f"table {table} not found"}
+        return {
+            "status": "healthy",
+            "table": table,
+            # -1 means the table has never been analyzed
+            "estimated_rows": max(int(estimate), 0),
+        }
+    return check
+
+
+def system_resources_check(disk_path: str = '/') -> CheckFn:
+    """Memory/disk usage sampled off the event loop."""
+    def sample() -> Dict[str, Any]:
+        import psutil
+
+        memory = psutil.virtual_memory()
+        disk = psutil.disk_usage(disk_path)
+        warning = memory.percent >= 90 or disk.percent >= 90
+        return {
+            "status": "warning" if warning else "healthy",
+            "memory_percent": memory.percent,
+            "disk_percent": disk.percent,
+            "process_rss_mb": psutil.Process().memory_info().rss // (1024 * 1024),
+        }
+
+    async def check() -> Dict[str, Any]:
+        return await asyncio.to_thread(sample)
+    return check
+
+
+# Shared instance so routers can read the same snapshot as the app
+_health_monitor: Optional[HealthMonitor] = None
+
+
+def get_health_monitor() -> HealthMonitor:
+    global _health_monitor
+    if _health_monitor is None:
+        _health_monitor = HealthMonitor()
+    return _health_monitor
@@ -0,0 +1,138 @@
+"""
+Idempotency Keys - One generation per client requestId.
+
+A client-supplied requestId is claimed in the idempotency_keys table together
+with a hash of the request payload before any work starts. A retry with the
+same id and payload finds the claim and reuses the original work (its stored
+result, or the run still in progress) instead of starting another
+generation; the same id with a different payload is a conflict.
+
+Claims that never complete (worker died) can be taken over after
+IDEMPOTENCY_LOCK_SECONDS; failed runs release their claim so the client can
+retry. Keys expire with the tests they produced (IDEMPOTENCY_TTL_SECONDS).
+"""
+
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, Optional
+
+from db_client import get_database_client
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 3600))
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 600))
+
+IN_PROGRESS, COMPLETED = "in_progress", "completed"
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS idempotency_keys (
+        request_id TEXT PRIMARY KEY,
+        payload_hash TEXT NOT NULL,
+        mode TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'in_progress',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        expires_at TIMESTAMPTZ NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_idempotency_keys_expires
+        ON idempotency_keys (expires_at);
+"""
+
+# Insert a new claim, or take over one that expired or was abandoned
+# mid-run. Returns no row when a live claim already holds the key.
+CLAIM_SQL = """
+    INSERT INTO idempotency_keys (request_id, payload_hash, mode, expires_at)
+    VALUES ($1, $2, $3, NOW() + make_interval(secs => $4))
+    ON CONFLICT (request_id) DO UPDATE
+    SET payload_hash = EXCLUDED.payload_hash, mode = EXCLUDED.mode,
+        status = 'in_progress', created_at = NOW(), updated_at = NOW(),
+        expires_at = EXCLUDED.expires_at
+    WHERE idempotency_keys.expires_at <= NOW()
+       OR (idempotency_keys.status = 'in_progress'
+           AND idempotency_keys.updated_at < NOW() - make_interval(secs => $5))
+    RETURNING request_id
+"""
+
+GET_SQL = """
+    SELECT request_id, payload_hash, mode, status, created_at, updated_at
+    FROM idempotency_keys
+    WHERE request_id = $1 AND expires_at > NOW()
+"""
+
+COMPLETE_SQL = """
+    UPDATE idempotency_keys SET status = 'completed', updated_at = NOW()
+    WHERE request_id = $1
+"""
+
+RELEASE_SQL = "DELETE FROM idempotency_keys WHERE request_id = $1"
+
+
+def payload_hash(payload: Dict[str, Any]) -> str:
+    """Hash of the canonical JSON payload (key order and spacing ignored)"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Claims on client request ids, in Postgres."""
+
+    def __init__(self):
+        self._schema_ready = False
+
+    async def _connect(self):
+        db = get_database_client()
+        if not await db.connect():
+            raise ConnectionError("Idempotency store database is unavailable")
+        if not self._schema_ready:
+            async with db.acquire() as conn:
+                await conn.execute(SCHEMA_SQL)
+            self._schema_ready = True
+        return db
+
+    async def claim(self, request_id: str, digest: str, mode: str) -> Optional[Dict[str, Any]]:
+        """
+        Claim `request_id` for a new run. Returns None if the caller now owns
+        it, otherwise the existing claim (payload_hash, mode, status).
+        """
+        db = await self._connect()
+        async with db.acquire() as conn:
+            # Two tries: the existing claim may be released between statements
+            for _ in range(2):
+                if await conn.fetchval(CLAIM_SQL, request_id, digest, mode,
+                                       IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_LOCK_SECONDS):
+                    return None
+                row = await conn.fetchrow(GET_SQL, request_id)
+                if row is not None:
+                    return dict(row)
+        raise ConnectionError(f"Could not claim request {request_id}")
+
+    async def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        db = await self._connect()
+        row = await db.fetchrow(GET_SQL, request_id)
+        return dict(row) if row else None
+
+    async def complete(self, request_id: str):
+        db = await self._connect()
+        await db.execute(COMPLETE_SQL, request_id)
+
+    async def release(self, request_id: str):
+        """Drop a claim (failed run, or result no longer available) so the request can run again."""
+        try:
+            db = await self._connect()
+            await db.execute(RELEASE_SQL, request_id)
+        except Exception as e:
+            logger.error(f"Failed to release idempotency key {request_id}: {e}")
+
+
+_idempotency_store: Optional[IdempotencyStore] = None
+
+
+def get_idempotency_store() -> IdempotencyStore:
+    global _idempotency_store
+    if _idempotency_store is None:
+        _idempotency_store = IdempotencyStore()
+    return _idempotency_store
@@ -4,7 +4,6 @@ Optimized with better chapter extraction and error handling
 """
 
 import asyncio
-import asyncpg
 import fitz  # PyMuPDF
 import os
 import re
@@ -16,6 +15,9 @@ from typing import List, Dict, Optional
 import google.generativeai as genai
 from datetime import datetime, timezone
 
+import corpus_stats
+from db_client import DatabaseClient
+
 # ========== FIX FOR WINDOWS UNICODE ==========
 if sys.platform == "win32":
     import io
@@ -252,37 +254,18 @@ class DatabaseManager:
     """Handle database operations."""
     
     def __init__(self):
-        self.conn = None
+        self.db = DatabaseClient()
         self.batch_size = 50  # Insert in batches for better performance
         
     async def connect(self):
         """Connect to database."""
-        try:
-            password = os.getenv("DATABASE_PASSWORD", "").strip()
-            if not password:
-                logger.error("DATABASE_PASSWORD is empty or not set")
-                return False
-            
-            self.conn = await asyncpg.connect(
-                host='db.dcmnzvjftmdbywrjkust.supabase.co',
-                port=5432,
-                user='postgres',
-                password=password,
-                database='postgres',
-                ssl='require',
-                timeout=30
-            )
-            logger.info("Connected to database")
-            return True
-        except Exception as e:
-            logger.error(f"Database connection failed: {str(e)}")
-            return False
+        return await self.db.connect()
     
     async def create_tables_if_not_exist(self):
         """Create necessary tables if they don't exist."""
         try:
             # Check if table exists
-            table_exists = await self.conn.fetchval("""
+            table_exists = await self.db.fetchval("""
                 SELECT EXISTS (
                     SELECT FROM information_schema.tables 
                     WHERE table_name = 'ncert_chunks'
@@ -290,7 +273,7 @@ class DatabaseManager:
             """)
             
             if not table_exists:
-                await self.conn.execute("""
+                await self.db.execute("""
                     CREATE TABLE ncert_chunks (
                         id SERIAL PRIMARY KEY,
                         class_grade TEXT NOT NULL,
@@ -305,7 +288,7 @@ class DatabaseManager:
             
             # Create vector index if not exists
             try:
-                await self.conn.execute("""
+                await self.db.execute("""
                     CREATE INDEX IF NOT EXISTS idx_ncert_embedding 
                     ON ncert_chunks USING ivfflat (embedding vector_cosine_ops);
                 """)
@@ -313,6 +296,10 @@ class DatabaseManager:
             except:
                 logger.info("Embedding index already exists or not supported")
             
+            # Incrementally maintained counts for stats endpoints
+            async with self.db.acquire() as conn:
+                await corpus_stats.ensure_schema(conn)
+            
             return True
             
         except Exception as e:
@@ -327,22 +314,24 @@ class DatabaseManager:
         try:
             values = []
             for chunk, embedding in zip(chunks, embeddings):
-                embedding_str = "[" + ",".join(str(x) for x in embedding) + "]"
                 values.append((
                     chunk['class_grade'],
                     chunk['subject'],
                     chunk['chapter'],
                     chunk['content'],
-                    embedding_str,
+                    embedding,
                     datetime.now(timezone.utc)
                 ))
             
-            # Insert in batch
-            await self.conn.executemany("""
-                INSERT INTO ncert_chunks 
-                (class_grade, subject, chapter, content, embedding, created_at)
-                VALUES ($1, $2, $3, $4, $5::vector, $6)
-            """, values)
+            # Insert in batch, updating corpus_stats in the same transaction
+            async with self.db.acquire() as conn:
+                async with conn.transaction():
+                    await conn.executemany("""
+                        INSERT INTO ncert_chunks 
+                        (class_grade, subject, chapter, content, embedding, created_at)
+                        VALUES ($1, $2, $3, $4, $5, $6)
+                    """, values)
+                    await corpus_stats.apply_deltas(conn, corpus_stats.deltas_from_chunks(chunks))
             
             return len(chunks)
             
@@ -353,7 +342,7 @@ class DatabaseManager:
     async def count_chunks(self) -> int:
         """Count total chunks in database."""
         try:
-            count = await self.conn.fetchval("SELECT COUNT(*) FROM ncert_chunks")
+            count = await self.db.fetchval("SELECT COUNT(*) FROM ncert_chunks")
             return count
         except:
             return 0
@@ -361,23 +350,21 @@ class DatabaseManager:
     async def clear_old_data(self, class_grade: str = None, subject: str = None):
         """Clear old data before re-ingesting."""
         try:
-            if class_grade and subject:
-                await self.conn.execute("""
-                    DELETE FROM ncert_chunks 
-                    WHERE class_grade = $1 AND subject = $2
-                """, class_grade, subject)
-                logger.info(f"Cleared old data for {class_grade} {subject}")
-            else:
-                await self.conn.execute("DELETE FROM ncert_chunks")
-                logger.info("Cleared all old data")
+            async with self.db.acquire() as conn:
+                if class_grade and subject:
+                    removed = await corpus_stats.delete_chunks(
+                        conn, "WHERE class_grade = $1 AND subject = $2", class_grade, subject
+                    )
+                    logger.info(f"Cleared {removed} old chunks for {class_grade} {subject}")
+                else:
+                    removed = await corpus_stats.delete_chunks(conn, "")
+                    logger.info(f"Cleared all old data ({removed} chunks)")
         except Exception as e:
             logger.error(f"Failed to clear data: {str(e)}")
     
     async def close(self):
         """Close database connection."""
-        if self.conn:
-            await self.conn.close()
-            logger.info("Database connection closed")
+        await self.db.close()
 
 async def add_test_data():
     """Add high-quality test data directly."""
@@ -388,6 +375,8 @@ async def add_test_data():
         return
     
     try:
+        await db.create_tables_if_not_exist()
+        
         # Clear old test data first
         await db.clear_old_data("10", "Science")
         
@@ -0,0 +1,355 @@
+"""
+Job Queue - Durable background jobs on a Postgres SKIP LOCKED queue.
+
+Long-running work (test generation) is enqueued as a row in generation_jobs
+and picked up by a pool of asyncio workers. Workers claim jobs with
+`FOR UPDATE SKIP LOCKED`, so any number of workers - in this process or in
+other processes sharing the database - take distinct jobs without blocking
+each other. Progress and results are written back to the row, so clients can
+poll or stream them from any API instance, and results survive restarts.
+
+A running job refreshes its heartbeat while it works; jobs whose heartbeat
+stops (worker crashed, process killed) are re-queued, up to JOB_MAX_ATTEMPTS.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from db_client import get_database_client
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", 2))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", 1.0))
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", 10))
+JOB_STALE_SECONDS = float(os.getenv("JOB_STALE_SECONDS", 60))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 2))
+
+QUEUED, RUNNING, SUCCEEDED, FAILED = "queued", "running", "succeeded", "failed"
+TERMINAL_STATUSES = (SUCCEEDED, FAILED)
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS generation_jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        status TEXT NOT NULL DEFAULT 'queued',
+        user_id TEXT,
+        payload JSONB NOT NULL,
+        progress JSONB NOT NULL DEFAULT '{}'::jsonb,
+        result JSONB,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker_id TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        started_at TIMESTAMPTZ,
+        heartbeat_at TIMESTAMPTZ,
+        finished_at TIMESTAMPTZ
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_generation_jobs_queued
+        ON generation_jobs (created_at) WHERE status = 'queued';
+
+    CREATE INDEX IF NOT EXISTS idx_generation_jobs_running
+        ON generation_jobs (heartbeat_at) WHERE status = 'running';
+"""
+
+ENQUEUE_SQL = """
+    INSERT INTO generation_jobs (id, kind, user_id, payload)
+    VALUES ($1, $2, $3, $4)
+    ON CONFLICT (id) DO NOTHING
+    RETURNING id
+"""
+
+# A failed job goes back to the queue under the same id, with a fresh
+# payload and attempt count (a client retrying its own request id).
+RETRY_FAILED_SQL = """
+    UPDATE generation_jobs
+    SET status = 'queued', kind = $2, user_id = $3, payload = $4,
+        progress = '{}'::jsonb, result = NULL, error = NULL, attempts = 0,
+        worker_id = NULL, created_at = NOW(), started_at = NULL,
+        heartbeat_at = NULL, finished_at = NULL
+    WHERE id = $1 AND status = 'failed'
+    RETURNING id
+"""
+
+# Oldest queued job of a kind this worker handles; rows locked by other
+# workers are skipped rather than waited on.
+CLAIM_SQL = """
+    UPDATE generation_jobs
+    SET status = 'running', attempts = attempts + 1, worker_id = $2,
+        started_at = NOW(), heartbeat_at = NOW(), error = NULL
+    WHERE id = (
+        SELECT id FROM generation_jobs
+        WHERE status = 'queued' AND kind = ANY($1)
+        ORDER BY created_at
+        FOR UPDATE SKIP LOCKED
+        LIMIT 1
+    )
+    RETURNING id, kind, user_id, payload, attempts
+"""
+
+PROGRESS_SQL = """
+    UPDATE generation_jobs SET progress = $2, heartbeat_at = NOW()
+    WHERE id = $1 AND status = 'running'
+"""
+
+HEARTBEAT_SQL = """
+    UPDATE generation_jobs SET heartbeat_at = NOW()
+    WHERE id = $1 AND status = 'running'
+"""
+
+# Only the attempt that is still running may finish a job: once the reaper
+# has re-queued it, a late result from the old worker is discarded.
+FINISH_SQL = """
+    UPDATE generation_jobs
+    SET status = $2, result = $3, error = $4, finished_at = NOW(), heartbeat_at = NOW()
+    WHERE id = $1 AND status = 'running' AND worker_id = $5 AND attempts = $6
+    RETURNING id
+"""
+
+# Running jobs whose worker stopped heartbeating go back to the queue (or
+# fail once they have used up their attempts).
+REQUEUE_STALE_SQL = """
+    UPDATE generation_jobs
+    SET status = CASE WHEN attempts < $2 THEN 'queued' ELSE 'failed' END,
+        error = 'worker stopped responding',
+        finished_at = CASE WHEN attempts < $2 THEN NULL ELSE NOW() END
+    WHERE status = 'running' AND heartbeat_at < NOW() - make_interval(secs => $1)
+    RETURNING id, status
+"""
+
+GET_SQL = """
+    SELECT id, kind, status, user_id, progress, result, error, attempts,
+           created_at, started_at, finished_at
+    FROM generation_jobs
+    WHERE id = $1
+"""
+
+
+class JobError(Exception):
+    """Expected job failure (bad input, generator unavailable); logged without a traceback"""
+    pass
+
+
+ProgressFn = Callable[..., Awaitable[None]]
+Handler = Callable[[Dict[str, Any], ProgressFn], Awaitable[Dict[str, Any]]]
+
+
+def _decode(value):
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _job_dict(row) -> Dict[str, Any]:
+    job = dict(row)
+    for key in ("payload", "progress", "result"):
+        if key in job:
+            job[key] = _decode(job[key])
+    return job
+
+
+async def ensure_schema(conn):
+    await conn.execute(SCHEMA_SQL)
+
+
+async def enqueue(conn, kind: str, payload: Dict[str, Any], job_id: Optional[str] = None,
+                  user_id: Optional[str] = None) -> Optional[str]:
+    """Queue a job; returns its id, or None if a job with `job_id` already exists."""
+    job_id = job_id or f"job_{uuid.uuid4().hex[:12]}"
+    return await conn.fetchval(ENQUEUE_SQL, job_id, kind, user_id, json.dumps(payload, default=str))
+
+
+async def retry_failed(conn, job_id: str, kind: str, payload: Dict[str, Any],
+                       user_id: Optional[str] = None) -> Optional[str]:
+    """Re-queue the failed job `job_id` with a new payload; None if it is not failed."""
+    return await conn.fetchval(RETRY_FAILED_SQL, job_id, kind, user_id, json.dumps(payload, default=str))
+
+
+async def get_job(conn, job_id: str) -> Optional[Dict[str, Any]]:
+    row = await conn.fetchrow(GET_SQL, job_id)
+    return _job_dict(row) if row else None
+
+
+class JobWorkerPool:
+    """Asyncio workers that claim and run queued jobs."""
+
+    def __init__(
+        self,
+        concurrency: int = JOB_WORKERS,
+        poll_interval: float = JOB_POLL_SECONDS,
+    ):
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.worker_prefix = f"{socket.gethostname()}:{os.getpid()}"
+        self.completed = 0
+        self.failed = 0
+
+        self._handlers: Dict[str, Handler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._running: Dict[str, str] = {}  # worker id -> job id
+
+    def register(self, kind: str, handler: Handler):
+        """Handle jobs of `kind` with `handler(payload, progress)` -> result dict."""
+        self._handlers[kind] = handler
+
+    def notify(self):
+        """Wake idle workers (a job was just enqueued in this process)."""
+        self._wakeup.set()
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self) -> bool:
+        """Create the queue table and start the workers (call from the app lifespan)."""
+        if self._tasks:
+            return True
+        db = get_database_client()
+        if not await db.connect():
+            logger.error("Job workers not started: database unavailable")
+            return False
+        try:
+            async with db.acquire() as conn:
+                await ensure_schema(conn)
+        except Exception as e:
+            logger.error(f"Job workers not started: {e}")
+            return False
+
+        self._tasks = [
+            asyncio.create_task(self._worker(f"{self.worker_prefix}:{n}"))
+            for n in range(self.concurrency)
+        ]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+        logger.info(f"Started {self.concurrency} job workers for {sorted(self._handlers)}")
+        return True
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _claim(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        async with get_database_client().acquire() as conn:
+            row = await conn.fetchrow(CLAIM_SQL, list(self._handlers), worker_id)
+        return _job_dict(row) if row else None
+
+    async def _idle(self):
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+    async def _worker(self, worker_id: str):
+        db = get_database_client()
+        while True:
+            try:
+                job = await self._claim(worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"[{worker_id}] claim failed: {e}")
+                job = None
+
+            if job is None:
+                await self._idle()
+                continue
+
+            self._running[worker_id] = job["id"]
+            try:
+                await self._run(db, job, worker_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Never let one job take the worker down with it
+                logger.error(f"[{worker_id}] job {job['id']} could not be finished: {e}", exc_info=True)
+            finally:
+                self._running.pop(worker_id, None)
+
+    async def _run(self, db, job: Dict[str, Any], worker_id: str):
+        job_id = job["id"]
+        logger.info(f"Running job {job_id} ({job['kind']}, attempt {job['attempts']})")
+
+        async def progress(stage: str, percent: int, **details):
+            await db.execute(PROGRESS_SQL, job_id, json.dumps(
+                {"stage": stage, "percent": percent, **details}, default=str
+            ))
+
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+                try:
+                    await db.execute(HEARTBEAT_SQL, job_id)
+                except Exception as e:
+                    logger.warning(f"Heartbeat for job {job_id} failed: {e}")
+
+        beat = asyncio.create_task(heartbeat())
+        try:
+            result = await self._handlers[job["kind"]](job["payload"], progress)
+            status, error = SUCCEEDED, None
+        except asyncio.CancelledError:
+            # Shutting down: leave the job running; the reaper re-queues it
+            # once its heartbeat goes stale.
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=not isinstance(e, JobError))
+            result, status, error = None, FAILED, str(e)
+        finally:
+            beat.cancel()
+
+        try:
+            finished = await db.fetchval(
+                FINISH_SQL, job_id, status,
+                json.dumps(result, default=str) if result is not None else None, error,
+                worker_id, job["attempts"]
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Left running: the reaper re-queues it once the heartbeat is stale
+            logger.error(f"Recording the result of job {job_id} failed: {e}")
+            return
+        if finished is None:
+            logger.warning(f"Job {job_id} was re-queued while running; discarding this attempt's result")
+            return
+        if status == SUCCEEDED:
+            self.completed += 1
+        else:
+            self.failed += 1
+
+    async def _reaper(self):
+        db = get_database_client()
+        while True:
+            await asyncio.sleep(JOB_STALE_SECONDS / 2)
+            try:
+                for row in await db.fetch(REQUEUE_STALE_SQL, JOB_STALE_SECONDS, JOB_MAX_ATTEMPTS):
+                    logger.warning(f"Job {row['id']} lost its worker -> {row['status']}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job reaper failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.concurrency if self._tasks else 0,
+            "busy": len(self._running),
+            "completed": self.completed,
+            "failed": self.failed,
+        }
+
+
+# Shared pool: routers register handlers at import, the app lifespan starts it
+_job_pool: Optional[JobWorkerPool] = None
+
+
+def get_job_pool() -> JobWorkerPool:
+    global _job_pool
+    if _job_pool is None:
+        _job_pool = JobWorkerPool()
+    return _job_pool
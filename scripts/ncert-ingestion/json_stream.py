@@ -0,0 +1,76 @@
+"""
+Incremental JSON Array Parser - Pull complete objects out of streamed text.
+
+LLM output arrives in arbitrary chunks. JSONObjectStream scans each chunk
+once, tracking string/escape state and nesting, and returns every object
+element of an array as soon as its closing brace arrives - so items can be
+validated while the rest of the response is still being generated. Text
+outside the array (markdown fences, preamble) is ignored.
+"""
+
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JSONObjectStream:
+    """Feed text chunks, get back completed objects that are array elements."""
+
+    def __init__(self):
+        self._buffer: List[str] = []   # chars of the object being captured
+        self._stack: List[str] = []    # open containers: '[' or '{'
+        self._capture_depth: Optional[int] = None
+        self._in_string = False
+        self._escaped = False
+        self.malformed = 0
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Consume `text`; return objects completed within it (in order)."""
+        completed: List[Dict[str, Any]] = []
+
+        for char in text:
+            capturing = self._capture_depth is not None
+            if capturing:
+                self._buffer.append(char)
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+                continue
+
+            if char == '"':
+                # Strings only matter inside JSON containers
+                if self._stack:
+                    self._in_string = True
+            elif char in '[{':
+                if char == '{' and not capturing and self._stack and self._stack[-1] == '[':
+                    self._capture_depth = len(self._stack)
+                    self._buffer = ['{']
+                self._stack.append(char)
+            elif char in ']}':
+                if not self._stack:
+                    continue
+                self._stack.pop()
+                if capturing and char == '}' and len(self._stack) == self._capture_depth:
+                    self._capture_depth = None
+                    obj = self._decode(''.join(self._buffer))
+                    self._buffer = []
+                    if obj is not None:
+                        completed.append(obj)
+
+        return completed
+
+    def _decode(self, raw: str) -> Optional[Dict[str, Any]]:
+        try:
+            obj = json.loads(raw)
+        except json.JSONDecodeError as e:
+            self.malformed += 1
+            logger.debug(f"Skipping malformed streamed object: {e}")
+            return None
+        return obj if isinstance(obj, dict) else None
@@ -0,0 +1,344 @@
+"""
+LLM Client - Shared Gemini access with reuse, limits and a circuit breaker.
+
+One process-wide client caches GenerativeModel instances (and with them the
+underlying transport), caps concurrent calls, retries transient failures with
+jittered exponential backoff and can hedge slow requests. A circuit breaker
+fails calls immediately while Gemini is unhealthy so callers can go straight
+to their fallback instead of waiting for each call to time out.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, AsyncIterator, Dict, Optional
+
+import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+
+from deadlines import DeadlineExceeded, remaining_or
+
+logger = logging.getLogger(__name__)
+
+# Errors worth retrying (and counting against the breaker): rate limits,
+# overload and transport problems. Bad requests fail immediately.
+RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.GatewayTimeout,
+    asyncio.TimeoutError,
+    ConnectionError,
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the LLM while the circuit breaker is open."""
+
+
+# ============== CIRCUIT BREAKER ==============
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures;
+    open -> half_open after `reset_timeout` seconds (one trial call);
+    half_open -> closed on success, back to open on failure.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()  # shared by the sync and async paths
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def admit(self) -> Optional[str]:
+        """'call' or 'trial' if a call may go through now, None if it must fail fast."""
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return "call"
+            if state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return "trial"
+            return None
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("LLM circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_flight or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._trial_in_flight:
+                    logger.warning(f"LLM circuit opened after {self._failures} failures")
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release_trial(self):
+        """A trial call ended without a verdict (e.g. cancelled)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+
+# ============== CLIENT ==============
+
+class LLMClient:
+    """Process-wide Gemini client shared by the sync and async code paths."""
+
+    def __init__(
+        self,
+        max_concurrency: int = int(os.getenv("LLM_MAX_CONCURRENCY", 8)),
+        max_retries: int = int(os.getenv("LLM_MAX_RETRIES", 2)),
+        backoff_base: float = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 0.5)),
+        backoff_max: float = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 8)),
+        attempt_timeout: float = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", 30)),
+        hedge_after: Optional[float] = (
+            float(os.environ["LLM_HEDGE_AFTER_SECONDS"]) if os.getenv("LLM_HEDGE_AFTER_SECONDS") else None
+        ),
+        breaker: Optional[CircuitBreaker] = None,
+    ):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.attempt_timeout = attempt_timeout
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", 5)),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", 30)),
+        )
+
+        self._models: Dict[str, Any] = {}
+        self._models_lock = threading.Lock()
+        self._async_slots = asyncio.Semaphore(max_concurrency)
+        self._sync_slots = threading.BoundedSemaphore(max_concurrency)
+        # Sync calls run here so generate_sync can stop waiting after attempt_timeout
+        self._sync_executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-sync")
+        self._configured = False
+
+    def model(self, model_name: str):
+        """Cached GenerativeModel for `model_name`."""
+        with self._models_lock:
+            if not self._configured:
+                api_key = os.getenv("GEMINI_API_KEY", "").strip()
+                if api_key:
+                    genai.configure(api_key=api_key)
+                self._configured = True
+            if model_name not in self._models:
+                self._models[model_name] = genai.GenerativeModel(model_name)
+            return self._models[model_name]
+
+    def _backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _admit(self) -> bool:
+        """Pass the breaker or raise; returns True if this call is the half-open trial."""
+        admission = self.breaker.admit()
+        if admission is None:
+            raise CircuitOpenError("LLM circuit is open - Gemini marked unhealthy")
+        return admission == "trial"
+
+    # ============== ASYNC ==============
+
+    async def _call(self, model_name: str, prompt: str, generation_config: Optional[Dict]) -> str:
+        timeout = min(self.attempt_timeout, remaining_or(self.attempt_timeout))
+        if timeout <= 0:
+            raise DeadlineExceeded("no time left for LLM call")
+        try:
+            response = await asyncio.wait_for(
+                self.model(model_name).generate_content_async(prompt, generation_config=generation_config),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            # Running out of request budget says nothing about Gemini's health
+            if timeout < self.attempt_timeout:
+                raise DeadlineExceeded("request deadline reached during LLM call")
+            raise
+        return response.text
+
+    async def _hedged_call(self, model_name: str, prompt: str, generation_config: Optional[Dict]) -> str:
+        """Send a second identical request if the first is slow; first success wins."""
+        first = asyncio.ensure_future(self._call(model_name, prompt, generation_config))
+        if self.hedge_after is None:
+            return await first
+
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_after)
+            if not done:
+                logger.debug(f"LLM call slower than {self.hedge_after}s, hedging")
+                pending.add(asyncio.ensure_future(self._call(model_name, prompt, generation_config)))
+
+            error: Optional[BaseException] = None
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def generate(
+        self,
+        prompt: str,
+        model_name: str,
+        generation_config: Optional[Dict] = None,
+    ) -> str:
+        """
+        Generate text asynchronously.
+
+        Raises:
+            CircuitOpenError: Gemini is currently marked unhealthy
+            DeadlineExceeded: the request deadline ran out
+        """
+        is_trial = self._admit()
+        try:
+            async with self._async_slots:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        text = await self._hedged_call(model_name, prompt, generation_config)
+                        self.breaker.record_success()
+                        return text
+                    except RETRYABLE_ERRORS as e:
+                        self.breaker.record_failure()
+                        delay = self._backoff(attempt)
+                        if attempt == self.max_retries or delay >= remaining_or(float("inf")):
+                            raise
+                        if self.breaker.state == "open":
+                            raise CircuitOpenError("LLM circuit opened while retrying") from e
+                        logger.warning(f"LLM call failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+                        await asyncio.sleep(delay)
+        finally:
+            # Cancelled or non-retryable error during a half-open trial
+            if is_trial:
+                self.breaker.release_trial()
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        model_name: str,
+        generation_config: Optional[Dict] = None,
+    ) -> AsyncIterator[str]:
+        """
+        Stream text chunks as Gemini produces them. Failures before the first
+        chunk are retried like generate(); once text has been yielded an error
+        is raised to the caller (the partial answer cannot be taken back).
+        Closing the iterator early cancels the underlying request.
+        """
+        is_trial = self._admit()
+        try:
+            async with self._async_slots:
+                for attempt in range(self.max_retries + 1):
+                    started = False
+                    try:
+                        timeout = min(self.attempt_timeout, remaining_or(self.attempt_timeout))
+                        if timeout <= 0:
+                            raise DeadlineExceeded("no time left for LLM call")
+                        response = await asyncio.wait_for(
+                            self.model(model_name).generate_content_async(
+                                prompt, generation_config=generation_config, stream=True
+                            ),
+                            timeout=timeout
+                        )
+                        async for chunk in response:
+                            if chunk.text:
+                                started = True
+                                yield chunk.text
+                        self.breaker.record_success()
+                        return
+                    except RETRYABLE_ERRORS as e:
+                        self.breaker.record_failure()
+                        delay = self._backoff(attempt)
+                        if started or attempt == self.max_retries or delay >= remaining_or(float("inf")):
+                            raise
+                        if self.breaker.state == "open":
+                            raise CircuitOpenError("LLM circuit opened while retrying") from e
+                        logger.warning(f"LLM stream failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+                        await asyncio.sleep(delay)
+        finally:
+            if is_trial:
+                self.breaker.release_trial()
+
+    # ============== SYNC ==============
+
+    def _call_sync(self, model_name: str, prompt: str, generation_config: Optional[Dict]) -> str:
+        """
+        One blocking attempt bounded by attempt_timeout, like _call(). The
+        pinned SDK (0.3.2) takes no per-request timeout, so the call runs on
+        the executor and is abandoned (left to finish in its thread) on timeout.
+        """
+        future = self._sync_executor.submit(
+            lambda: self.model(model_name).generate_content(prompt, generation_config=generation_config).text
+        )
+        try:
+            return future.result(timeout=self.attempt_timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise asyncio.TimeoutError(f"LLM call exceeded {self.attempt_timeout}s")
+
+    def generate_sync(
+        self,
+        prompt: str,
+        model_name: str,
+        generation_config: Optional[Dict] = None,
+    ) -> str:
+        """Blocking variant for the sync (psycopg2) code path. No hedging."""
+        is_trial = self._admit()
+        try:
+            with self._sync_slots:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        text = self._call_sync(model_name, prompt, generation_config)
+                        self.breaker.record_success()
+                        return text
+                    except RETRYABLE_ERRORS as e:
+                        self.breaker.record_failure()
+                        if attempt == self.max_retries:
+                            raise
+                        if self.breaker.state == "open":
+                            raise CircuitOpenError("LLM circuit opened while retrying") from e
+                        delay = self._backoff(attempt)
+                        logger.warning(f"LLM call failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s")
+                        time.sleep(delay)
+        finally:
+            if is_trial:
+                self.breaker.release_trial()
+
+
+# Shared instance (model cache, limits and breaker are process-wide)
+_llm_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    global _llm_client
+    if _llm_client is None:
+        _llm_client = LLMClient()
+    return _llm_client
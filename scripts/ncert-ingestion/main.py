@@ -9,7 +9,7 @@ from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.exceptions import RequestValidationError
 from fastapi.openapi.utils import get_openapi
 from fastapi.openapi.docs import get_swagger_ui_html, get_redoc_html
@@ -30,6 +30,11 @@ load_dotenv()
 # Import routes
 from routes import chat, test_gen, upload
 from app_dependencies import API_PREFIX
+from db_client import get_database_client
+from health_monitor import estimated_rows_check, get_health_monitor, system_resources_check
+from jobs import get_job_pool
+import renderers
+import singleflight
 
 # Setup logging
 logging.basicConfig(
@@ -42,6 +47,26 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# ============== HEALTH CHECKS ==============
+
+async def check_openai() -> Dict[str, Any]:
+    """OpenAI reachability (runs in the background monitor, never per probe)"""
+    import openai
+    openai.api_key = os.getenv("OPENAI_API_KEY")
+    models = await asyncio.to_thread(openai.Model.list)
+    return {
+        "status": "healthy",
+        "details": f"Connected. Available models: {len(models.data)}"
+    }
+
+def setup_health_monitor():
+    """Register dependency checks on the shared health monitor"""
+    monitor = get_health_monitor()
+    monitor.add_check("database", estimated_rows_check(get_database_client(), "ncert_chunks"))
+    monitor.add_check("openai", check_openai, critical=False)
+    monitor.add_check("system", system_resources_check(), critical=False)
+    return monitor
+
 # ============== LIFECYCLE MANAGEMENT ==============
 
 @asynccontextmanager
@@ -78,6 +103,15 @@ async def lifespan(app: FastAPI):
         logger.error(f"❌ Startup failed: {str(e)}", exc_info=True)
         # Don't raise - let app start but log error
     
+    # Background health monitor - probes only read its cached snapshot
+    await get_database_client().connect()
+    monitor = setup_health_monitor()
+    monitor.start()
+    
+    # Background workers for queued test generation (/generate-test/jobs)
+    job_pool = get_job_pool()
+    await job_pool.start()
+    
     yield
     
     # Shutdown
@@ -85,7 +119,10 @@ async def lifespan(app: FastAPI):
     logger.info(f"🛑 NCERT RAG API Shutting Down - {shutdown_time}")
     
     # Cleanup resources
-    # Close database connections, etc.
+    await monitor.stop()
+    await job_pool.stop()
+    renderers.shutdown()
+    await get_database_client().close()
     logger.info("✅ Cleanup completed")
 
 # ============== APPLICATION CONFIGURATION ==============
@@ -355,6 +392,8 @@ async def root():
         "documentation": "/docs",
         "openapi": "/openapi.json",
         "health": "/health",
+        "liveness": "/health/live",
+        "readiness": "/health/ready",
         "endpoints": {
             "chat": f"{API_PREFIX}/chat",
             "test_generation": f"{API_PREFIX}/generate-test",
@@ -367,65 +406,31 @@ async def root():
 
 @app.get("/health", tags=["System"])
 async def health_check():
-    """Comprehensive health check endpoint"""
+    """Comprehensive health report (cached by the background health monitor)"""
+    snapshot = get_health_monitor().snapshot()
     
-    health_status = {
-        "status": "healthy",
+    return {
+        "status": snapshot["status"],
         "timestamp": datetime.utcnow().isoformat(),
+        "checked_at": snapshot["checked_at"],
         "service": "ncert-rag-api",
         "version": app.version,
         "environment": os.getenv("ENVIRONMENT", "development"),
-        "checks": {}
+        "checks": snapshot["checks"]
     }
-    
-    # Database health check
-    try:
-        from app_dependencies import get_rag_system
-        rag = get_rag_system()
-        test_result = await rag.supabase.table("document_chunks").select("count", count="exact").limit(1).execute()
-        health_status["checks"]["database"] = {
-            "status": "healthy",
-            "details": f"Connected to Supabase. Chunks: {test_result.count if hasattr(test_result, 'count') else 'N/A'}"
-        }
-    except Exception as e:
-        health_status["status"] = "degraded"
-        health_status["checks"]["database"] = {
-            "status": "unhealthy",
-            "error": str(e)
-        }
-    
-    # OpenAI health check
-    try:
-        import openai
-        openai.api_key = os.getenv("OPENAI_API_KEY")
-        models = openai.Model.list()
-        health_status["checks"]["openai"] = {
-            "status": "healthy",
-            "details": f"Connected. Available models: {len(models.data)}"
-        }
-    except Exception as e:
-        health_status["status"] = "degraded"
-        health_status["checks"]["openai"] = {
-            "status": "unhealthy",
-            "error": str(e)
-        }
-    
-    # Memory health check
-    import psutil
-    memory = psutil.virtual_memory()
-    health_status["checks"]["memory"] = {
-        "status": "healthy" if memory.percent < 90 else "warning",
-        "details": f"{memory.percent}% used ({memory.used // (1024**3)}GB/{memory.total // (1024**3)}GB)"
-    }
-    
-    # Disk health check
-    disk = psutil.disk_usage('/')
-    health_status["checks"]["disk"] = {
-        "status": "healthy" if disk.percent < 90 else "warning",
-        "details": f"{disk.percent}% used ({disk.used // (1024**3)}GB/{disk.total // (1024**3)}GB)"
-    }
-    
-    return health_status
+
+@app.get("/health/live", tags=["System"])
+async def liveness_probe():
+    """Liveness probe - no I/O, only confirms the event loop is serving"""
+    return get_health_monitor().liveness()
+
+@app.get("/health/ready", tags=["System"])
+async def readiness_probe():
+    """Readiness probe - 503 when a critical dependency is down or checks are stale"""
+    ready, body = get_health_monitor().readiness()
+    if not ready:
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=body)
+    return body
 
 @app.get("/metrics", tags=["System"])
 async def metrics():
@@ -451,7 +456,19 @@ async def metrics():
         f'ncert_api_cpu_usage {psutil.cpu_percent()}',
     ]
     
-    return "\n".join(metrics_lines)
+    # Each family's HELP/TYPE lines are followed by all of its samples
+    singleflight_stats = singleflight.all_stats()
+    for name, key, kind, help_text in (
+        ("ncert_singleflight_executions_total", "executions", "counter", "Computations started (not coalesced)"),
+        ("ncert_singleflight_coalesced_total", "coalesced", "counter", "Requests served by joining an in-flight computation"),
+        ("ncert_singleflight_in_flight", "in_flight", "gauge", "Computations currently in flight"),
+    ):
+        metrics_lines += ["", f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        metrics_lines += [
+            f'{name}{{group="{group}"}} {stats[key]}' for group, stats in singleflight_stats.items()
+        ]
+    
+    return PlainTextResponse("\n".join(metrics_lines) + "\n", media_type="text/plain; version=0.0.4")
 
 @app.get("/system", tags=["System"])
 async def system_info():
@@ -3,11 +3,13 @@ Database Maintenance Script - Fixes chapter names, cleans data, optimizes databa
 """
 
 import asyncio
-import asyncpg
 import os
 import logging
 from pathlib import Path
 
+import corpus_stats
+from db_client import DatabaseClient
+
 # Setup logging
 logging.basicConfig(
     level=logging.INFO,
@@ -42,32 +44,25 @@ async def maintain_database():
         logger.error("DATABASE_PASSWORD environment variable is not set")
         return
     
-    conn = None
+    db = DatabaseClient()
+    if not await db.connect():
+        return
+    
     try:
-        # Connect to database
-        conn = await asyncpg.connect(
-            host='db.dcmnzvjftmdbywrjkust.supabase.co',
-            port=5432,
-            user='postgres',
-            password=os.getenv('DATABASE_PASSWORD'),
-            database='postgres',
-            ssl='require',
-            timeout=30
-        )
-        
-        logger.info("Connected to database")
-        
         # Get initial stats
-        initial_count = await conn.fetchval('SELECT COUNT(*) FROM ncert_chunks')
+        initial_count = await db.fetchval('SELECT COUNT(*) FROM ncert_chunks')
         logger.info(f"Initial record count: {initial_count}")
         
         # ===== FIX 1: STANDARDIZE CLASS GRADES =====
         logger.info("\n1. Standardizing class grades...")
-        updated_classes = await conn.fetchval("""
-            UPDATE ncert_chunks 
-            SET class_grade = 'Class 10'
-            WHERE class_grade = '10'
-            RETURNING COUNT(*)
+        updated_classes = await db.fetchval("""
+            WITH updated AS (
+                UPDATE ncert_chunks 
+                SET class_grade = 'Class 10'
+                WHERE class_grade = '10'
+                RETURNING 1
+            )
+            SELECT COUNT(*) FROM updated
         """)
         logger.info(f"   Updated {updated_classes} class grades")
         
@@ -87,11 +82,14 @@ async def maintain_database():
         
         total_fixed = 0
         for bad_name, good_name in chapter_fixes:
-            fixed = await conn.fetchval("""
-                UPDATE ncert_chunks 
-                SET chapter = $1
-                WHERE chapter = $2
-                RETURNING COUNT(*)
+            fixed = await db.fetchval("""
+                WITH updated AS (
+                    UPDATE ncert_chunks 
+                    SET chapter = $1
+                    WHERE chapter = $2
+                    RETURNING 1
+                )
+                SELECT COUNT(*) FROM updated
             """, good_name, bad_name)
             
             if fixed and fixed > 0:
@@ -100,49 +98,57 @@ async def maintain_database():
         
         # ===== FIX 3: REMOVE EXACT DUPLICATES =====
         logger.info("\n3. Removing exact duplicates...")
-        duplicates_removed = await conn.fetchval("""
-            DELETE FROM ncert_chunks 
-            WHERE ctid NOT IN (
-                SELECT MIN(ctid)
-                FROM ncert_chunks 
-                GROUP BY md5(content::text)
-            )
-            RETURNING COUNT(*)
-        """)
+        async with db.acquire() as conn:
+            duplicates_removed = await corpus_stats.delete_chunks(conn, """
+                WHERE ctid NOT IN (
+                    SELECT MIN(ctid)
+                    FROM ncert_chunks 
+                    GROUP BY md5(content::text)
+                )
+            """)
         logger.info(f"   Removed {duplicates_removed} duplicate records")
         
         # ===== FIX 4: ADD MISSING METADATA =====
         logger.info("\n4. Ensuring consistent metadata...")
-        metadata_fixed = await conn.fetchval("""
-            UPDATE ncert_chunks 
-            SET subject = 'Science'
-            WHERE subject IS NULL 
-            OR subject = ''
-            RETURNING COUNT(*)
+        metadata_fixed = await db.fetchval("""
+            WITH updated AS (
+                UPDATE ncert_chunks 
+                SET subject = 'Science'
+                WHERE subject IS NULL 
+                OR subject = ''
+                RETURNING 1
+            )
+            SELECT COUNT(*) FROM updated
         """)
         logger.info(f"   Fixed {metadata_fixed} missing subjects")
         
         # ===== FIX 5: CLEAN VERY SHORT CHUNKS =====
         logger.info("\n5. Cleaning very short chunks...")
-        short_chunks = await conn.fetchval("""
-            DELETE FROM ncert_chunks 
-            WHERE LENGTH(content) < 150
-            RETURNING COUNT(*)
-        """)
+        async with db.acquire() as conn:
+            short_chunks = await corpus_stats.delete_chunks(conn, "WHERE LENGTH(content) < 150")
         logger.info(f"   Removed {short_chunks} chunks under 150 characters")
         
+        # ===== FIX 6: RECONCILE CORPUS STATS =====
+        # Renames above move chunks between chapters, so recompute the
+        # incrementally maintained counts from scratch.
+        logger.info("\n6. Reconciling corpus statistics...")
+        async with db.acquire() as conn:
+            await conn.execute(corpus_stats.SCHEMA_SQL)
+            scopes = await corpus_stats.reconcile(conn)
+        logger.info(f"   Reconciled stats for {scopes} chapters")
+        
         # ===== FINAL STATISTICS =====
         logger.info("\n" + "="*60)
         logger.info("MAINTENANCE SUMMARY")
         logger.info("="*60)
         
-        final_count = await conn.fetchval('SELECT COUNT(*) FROM ncert_chunks')
+        final_count = await db.fetchval('SELECT COUNT(*) FROM ncert_chunks')
         logger.info(f"Final record count: {final_count}")
         logger.info(f"Records changed: {initial_count - final_count}")
         
         # Show chapter distribution after fixes
         logger.info("\nUpdated Chapter Distribution:")
-        chapters = await conn.fetch("""
+        chapters = await db.fetch("""
             SELECT chapter, COUNT(*) as count 
             FROM ncert_chunks 
             GROUP BY chapter 
@@ -154,7 +160,7 @@ async def maintain_database():
             logger.info(f"  {i:2}. {row['chapter'][:40]:40} - {row['count']:4} records")
         
         # Quality metrics
-        quality = await conn.fetchrow("""
+        quality = await db.fetchrow("""
             SELECT 
                 AVG(LENGTH(content)) as avg_length,
                 MIN(LENGTH(content)) as min_length,
@@ -179,9 +185,7 @@ async def maintain_database():
     except Exception as e:
         logger.error(f"Maintenance failed: {str(e)}")
     finally:
-        if conn:
-            await conn.close()
-            logger.info("Database connection closed")
+        await db.close()
 
 def main():
     """Main entry point."""
@@ -0,0 +1,194 @@
+"""
+Paper Formatter - Incremental layout of a test paper.
+
+iter_paper_blocks() walks a paper once and yields layout blocks in reading
+order: title, metadata, instructions, section headings, questions, answer
+key. It is the single source of paper structure; the text formatter below
+and the PDF/DOCX/HTML renderers in renderers.py each just map blocks to
+their own output.
+
+iter_paper_text() yields the plain-text paper piece by piece, so it can be
+passed straight to a StreamingResponse (first bytes go out before the last
+question is formatted). format_paper_text() builds the whole paper from the
+same piece formatters but without the block generator: one list per paper,
+filled section by section and joined once. Per-block generator round trips
+cost more than CPython's in-place `+=` resize saves, so the streaming path is
+only the faster choice for time to first byte (see bench_formatter.py).
+
+A paper is the dict described in renderers.py.
+"""
+
+from typing import Any, Dict, Iterator, List, Tuple
+
+RULE = "=" * 60
+
+INSTRUCTIONS = [
+    "All questions are compulsory.",
+    "Read each question carefully.",
+    "Marks are indicated against each question.",
+    "Write answers neatly and legibly.",
+]
+
+SECTION_TITLES = {
+    "mcq": "Multiple Choice Questions",
+    "true_false": "True or False",
+    "fill_blanks": "Fill in the Blanks",
+    "short": "Short Answer Questions",
+    "long": "Long Answer Questions",
+    "numerical": "Numerical Problems",
+    "case_based": "Case-Based Questions",
+}
+
+Block = Tuple[str, Any]
+
+
+def marks_label(marks: int) -> str:
+    return f"{marks} mark{'s' if marks != 1 else ''}"
+
+
+def paper_heading(paper: Dict[str, Any]) -> Tuple[str, List[str]]:
+    """Title and metadata lines"""
+    title = f"{paper.get('subject') or ''} - Class {paper.get('classNum') or ''}".strip(" -")
+    lines = []
+    if paper.get("board"):
+        lines.append(f"Board: {paper['board']}")
+    if paper.get("topic"):
+        lines.append(f"Topic: {paper['topic']}")
+    if paper.get("chapters"):
+        lines.append(f"Chapters: {', '.join(paper['chapters'])}")
+    if paper.get("timeLimit"):
+        lines.append(f"Time: {paper['timeLimit']} minutes")
+    lines.append(f"Maximum Marks: {sum(q.get('marks', 0) for q in paper['questions'])}")
+    return title, lines
+
+
+def iter_sections(questions: List[Dict[str, Any]]) -> Iterator[Tuple[str, str, int, int, List[Dict[str, Any]]]]:
+    """
+    (letter, title, total_marks, first_number, questions) per section. A new
+    section starts whenever the question type changes; numbering is
+    continuous across sections.
+    """
+    start = 0
+    section = 0
+    count = len(questions)
+    while start < count:
+        question_type = questions[start].get("type")
+        end = start + 1
+        while end < count and questions[end].get("type") == question_type:
+            end += 1
+        group = questions[start:end]
+        yield (
+            chr(65 + section),
+            SECTION_TITLES.get(question_type, str(question_type or "Questions").title()),
+            sum(question.get("marks", 0) for question in group),
+            start + 1,
+            group
+        )
+        section += 1
+        start = end
+
+
+def iter_paper_blocks(paper: Dict[str, Any]) -> Iterator[Block]:
+    """
+    Layout blocks in reading order:
+        ("title", str), ("meta", [str]), ("instructions", [str]),
+        ("section", (letter, title, total_marks)), ("question", (n, question)),
+        ("answer_key", None), ("answer", (n, question))
+    """
+    questions = paper["questions"]
+    title, meta = paper_heading(paper)
+    yield "title", title
+    yield "meta", meta
+
+    if paper.get("includeInstructions", True):
+        yield "instructions", INSTRUCTIONS
+
+    for letter, section_title, total, first, group in iter_sections(questions):
+        yield "section", (letter, section_title, total)
+        for n, question in enumerate(group, first):
+            yield "question", (n, question)
+
+    if paper.get("includeAnswerKey"):
+        yield "answer_key", None
+        for n, question in enumerate(questions, 1):
+            yield "answer", (n, question)
+
+
+# ============== PLAIN TEXT ==============
+
+ANSWER_KEY_TEXT = f"\n{RULE}\nANSWER KEY\n{RULE}\n"
+END_TEXT = f"\n{RULE}\nEND OF TEST\n{RULE}\n"
+
+
+def _title_text(title: str) -> str:
+    return f"{RULE}\n{title.center(60).rstrip()}\n{RULE}\n\n"
+
+
+def _meta_text(lines: List[str]) -> str:
+    return "".join([f"{line}\n" for line in lines])
+
+
+def _instructions_text(instructions: List[str]) -> str:
+    return "\nGeneral Instructions:\n" + "".join([f"{i}. {text}\n" for i, text in enumerate(instructions, 1)])
+
+
+def _section_text(letter: str, title: str, total: int) -> str:
+    return f"\n{RULE}\nSECTION {letter}: {title} ({marks_label(total)})\n{RULE}\n"
+
+
+def _question_text(n: int, question: Dict[str, Any]) -> str:
+    text = f"\nQ{n}. ({marks_label(question.get('marks', 1))})\n    {question['question']}\n"
+    options = question.get("options")
+    if options:
+        text += "".join([f"    ({chr(65 + i)}) {option}\n" for i, option in enumerate(options)])
+    if question.get("chapter"):
+        page = f" | Page: {question['pageReference']}" if question.get("pageReference") else ""
+        text += f"    [Chapter: {question['chapter']}{page}]\n"
+    return text
+
+
+def _answer_text(n: int, question: Dict[str, Any]) -> str:
+    if question.get("explanation"):
+        return f"Q{n}. {question['correctAnswer']}\n    {question['explanation']}\n"
+    return f"Q{n}. {question['correctAnswer']}\n"
+
+
+def iter_paper_text(paper: Dict[str, Any]) -> Iterator[str]:
+    """Plain-text paper, one piece per block"""
+    for kind, data in iter_paper_blocks(paper):
+        if kind == "title":
+            yield _title_text(data)
+        elif kind == "meta":
+            yield _meta_text(data)
+        elif kind == "instructions":
+            yield _instructions_text(data)
+        elif kind == "section":
+            yield _section_text(*data)
+        elif kind == "question":
+            yield _question_text(*data)
+        elif kind == "answer_key":
+            yield ANSWER_KEY_TEXT
+        elif kind == "answer":
+            yield _answer_text(*data)
+
+    yield END_TEXT
+
+
+def format_paper_text(paper: Dict[str, Any]) -> str:
+    """Whole plain-text paper as one string (same output as joining iter_paper_text)"""
+    questions = paper["questions"]
+    title, meta = paper_heading(paper)
+    parts = [_title_text(title), _meta_text(meta)]
+    if paper.get("includeInstructions", True):
+        parts.append(_instructions_text(INSTRUCTIONS))
+
+    for letter, section_title, total, first, group in iter_sections(questions):
+        parts.append(_section_text(letter, section_title, total))
+        parts.extend([_question_text(n, question) for n, question in enumerate(group, first)])
+
+    if paper.get("includeAnswerKey"):
+        parts.append(ANSWER_KEY_TEXT)
+        parts.extend([_answer_text(n, question) for n, question in enumerate(questions, 1)])
+
+    parts.append(END_TEXT)
+    return "".join(parts)
@@ -0,0 +1,98 @@
+"""
+Paper Variants - Sets A, B, C... of one paper from a single generation pass.
+
+Instead of generating each set separately, the caller generates one pooled
+question set per bucket, a little larger than the paper needs (pool_size),
+and derive_variants() cuts the sets out of it:
+
+- each bucket's pool is permuted once with the set seed, and set v takes a
+  window of the bucket's count starting at v * count (wrapping around), so
+  pool questions are spread evenly over the sets and neighbouring sets
+  overlap as little as the pool allows;
+- with shuffleQuestions, questions are shuffled within their bucket (the
+  paper's sections stay in bucket order);
+- with shuffleOptions, MCQ options are shuffled. correctAnswer holds the
+  option text, so every set's answer key stays correct as is.
+
+Everything is seeded, so the same pool and seed always give the same sets.
+"""
+
+import hashlib
+import math
+import os
+import random
+from typing import Any, Dict, List, Sequence
+
+# Extra pool questions per bucket, as a fraction of the bucket's count
+VARIANT_POOL_EXTRA = float(os.getenv("VARIANT_POOL_EXTRA", 0.5))
+# Questions per bucket the request model allows
+MAX_BUCKET_QUESTIONS = 100
+
+
+def set_label(index: int) -> str:
+    """Set name for a 0-based variant index (A, B, C, ...)"""
+    return chr(65 + index)
+
+
+def default_seed(test_id: str) -> int:
+    """Stable seed derived from the test id"""
+    return int(hashlib.sha256(test_id.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def pool_size(count: int, variants: int, extra: float = VARIANT_POOL_EXTRA) -> int:
+    """Questions to generate for a bucket of `count` shared by `variants` sets"""
+    if variants <= 1:
+        return count
+    return min(MAX_BUCKET_QUESTIONS, max(count + 1, math.ceil(count * (1 + extra))))
+
+
+def derive_variants(
+    pool: List[Dict[str, Any]],
+    pool_counts: Sequence[int],
+    counts: Sequence[int],
+    variants: int,
+    seed: int,
+    shuffle_questions: bool = True,
+    shuffle_options: bool = True,
+) -> List[List[Dict[str, Any]]]:
+    """
+    Questions of each set, numbered Q1..Qn. `pool` holds the generated
+    questions in bucket order, pool_counts[i] of them for bucket i; every
+    set takes counts[i] questions from bucket i.
+    """
+    rng = random.Random(seed)
+    bucket_pools = []
+    start = 0
+    for size in pool_counts:
+        items = pool[start:start + size]
+        start += size
+        rng.shuffle(items)
+        bucket_pools.append(items)
+
+    papers = []
+    for v in range(variants):
+        set_rng = random.Random(f"{seed}:{v}")
+        chosen = []
+        for items, count in zip(bucket_pools, counts):
+            offset = (v * count) % len(items)
+            window = [items[(offset + i) % len(items)] for i in range(count)]
+            if shuffle_questions:
+                set_rng.shuffle(window)
+            chosen.extend(window)
+
+        paper = []
+        for n, question in enumerate(chosen, 1):
+            question = {**question, "id": f"Q{n}"}
+            if shuffle_options and question.get("type") == "mcq" and question.get("options"):
+                options = list(question["options"])
+                set_rng.shuffle(options)
+                question["options"] = options
+            paper.append(question)
+        papers.append(paper)
+
+    return papers
+
+
+def answer_key(questions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-set answer key"""
+    return [{"id": question["id"], "correctAnswer": question["correctAnswer"]} for question in questions]
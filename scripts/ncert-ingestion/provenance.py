@@ -0,0 +1,96 @@
+"""
+Provenance - Link generated questions to the NCERT chunks they came from.
+
+In chunks context mode every block the LLM sees is labelled with its chunk id
+("[chunk 123] (chapter)"), and each generated question cites the ids it is
+based on (sourceChunkIds). resolve() then looks all cited chunks of a paper
+up in ONE query (WHERE id = ANY($1)) - never a round trip per question -
+drops ids that do not exist or belong to another class/subject (in any
+stored spelling, see corpus_scope.py), and fills each question's ncertSource
+with the sentence of its first cited chunk that best matches the question,
+plus its chapter when the question has none.
+
+ncert_chunks stores no page numbers, so pageReference stays whatever the
+model cited from the content (or empty).
+"""
+
+import logging
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+from corpus_scope import same_class, same_subject
+
+logger = logging.getLogger(__name__)
+
+SNIPPET_CHARS = 240
+
+CHUNKS_BY_ID_SQL = """
+    SELECT id, class_grade, subject, chapter, content
+    FROM ncert_chunks
+    WHERE id = ANY($1::int[])
+"""
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def chunk_ids(values: Optional[Iterable[Any]]) -> List[int]:
+    """Numeric ids from cited values like 123, "123" or "chunk 123" (order kept, deduplicated)"""
+    ids = []
+    for value in values or ():
+        match = re.search(r"\d+", str(value))
+        if match and int(match.group()) not in ids:
+            ids.append(int(match.group()))
+    return ids
+
+
+def best_snippet(content: str, text: str, limit: int = SNIPPET_CHARS) -> str:
+    """Sentence of `content` sharing the most words with `text`, trimmed to `limit`"""
+    words = set(re.findall(r"\w{3,}", text.lower()))
+    sentences = [sentence.strip() for sentence in _SENTENCE_END.split(content) if sentence.strip()]
+    if not sentences:
+        return ""
+    best = max(sentences, key=lambda sentence: len(words & set(re.findall(r"\w{3,}", sentence.lower()))))
+    return best if len(best) <= limit else best[:limit - 1].rstrip() + "…"
+
+
+async def fetch_chunks(conn, ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """id -> chunk row for every id that exists, in one query"""
+    ids = sorted(set(ids))
+    if not ids:
+        return {}
+    rows = await conn.fetch(CHUNKS_BY_ID_SQL, ids)
+    return {row["id"]: dict(row) for row in rows}
+
+
+async def resolve(
+    conn,
+    questions: List[Dict[str, Any]],
+    class_grade: str,
+    subject: str,
+) -> int:
+    """
+    Resolve sourceChunkIds of all `questions` in place (one query for the
+    whole paper). Returns the number of questions linked to a chunk.
+    """
+    cited = {id(question): chunk_ids(question.get("sourceChunkIds")) for question in questions}
+    chunks = await fetch_chunks(conn, (chunk_id for ids in cited.values() for chunk_id in ids))
+
+    linked = 0
+    for question in questions:
+        found = [
+            chunks[chunk_id] for chunk_id in cited[id(question)]
+            if chunk_id in chunks
+            and same_class(chunks[chunk_id]["class_grade"], class_grade)
+            and same_subject(chunks[chunk_id]["subject"], subject)
+        ]
+        question["sourceChunkIds"] = [str(chunk["id"]) for chunk in found] or None
+        if not found:
+            continue
+        linked += 1
+        primary = found[0]
+        question["ncertSource"] = best_snippet(
+            primary["content"], f"{question['question']} {question.get('correctAnswer') or ''}"
+        ) or question.get("ncertSource")
+        question["chapter"] = question.get("chapter") or primary["chapter"]
+
+    return linked
@@ -0,0 +1,180 @@
+"""
+Question Bank - Precomputed, validated questions indexed by syllabus cell.
+
+A cell is (class, subject, chapter, type, difficulty, cognitive level,
+language). build_question_bank.py fills cells offline; TestGenerationService
+takes questions from the bank first and only generates live for the part of
+a bucket the bank cannot cover. Questions are stored with embeddings so near
+duplicates can be found and papers can be assembled by similarity later.
+"""
+
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+from question_generator import GeneratedQuestion, QuestionSpec, normalize_text
+from corpus_scope import class_number
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "models/embedding-001"
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS question_bank (
+        id BIGSERIAL PRIMARY KEY,
+        class_grade TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        chapter TEXT NOT NULL DEFAULT '',
+        question_type TEXT NOT NULL,
+        difficulty TEXT NOT NULL,
+        cognitive_level TEXT NOT NULL,
+        language TEXT NOT NULL DEFAULT 'english',
+        question TEXT NOT NULL,
+        options JSONB,
+        correct_answer TEXT NOT NULL,
+        explanation TEXT,
+        page_reference TEXT,
+        ncert_source TEXT,
+        question_hash TEXT NOT NULL UNIQUE,
+        embedding vector(768),
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_question_bank_cell
+        ON question_bank (class_grade, lower(subject), question_type, difficulty,
+                          cognitive_level, language, chapter);
+
+    CREATE INDEX IF NOT EXISTS idx_question_bank_embedding
+        ON question_bank USING hnsw (embedding vector_cosine_ops);
+"""
+
+# Random sample from one cell. chapter filter is optional (NULL = any chapter).
+FETCH_CELL_SQL = """
+    SELECT id, chapter, question, options, correct_answer, explanation,
+           page_reference, ncert_source
+    FROM question_bank
+    WHERE class_grade = $1
+      AND lower(subject) = lower($2)
+      AND question_type = $3
+      AND difficulty = $4
+      AND cognitive_level = $5
+      AND language = $6
+      AND ($7::text[] IS NULL OR chapter = ANY($7))
+    ORDER BY random()
+    LIMIT $8
+"""
+
+INSERT_SQL = """
+    INSERT INTO question_bank
+        (class_grade, subject, chapter, question_type, difficulty, cognitive_level,
+         language, question, options, correct_answer, explanation, page_reference,
+         ncert_source, question_hash, embedding)
+    VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15)
+    ON CONFLICT (question_hash) DO NOTHING
+"""
+
+COVERAGE_SQL = """
+    SELECT class_grade, subject, chapter, question_type, difficulty,
+           cognitive_level, language, COUNT(*) AS questions
+    FROM question_bank
+    GROUP BY class_grade, subject, chapter, question_type, difficulty,
+             cognitive_level, language
+    ORDER BY class_grade, subject, chapter, question_type, difficulty, cognitive_level
+"""
+
+
+def question_hash(spec: QuestionSpec, question: str) -> str:
+    """Stable identity for a question within its subject/class (dedupe key)."""
+    key = f"{spec.class_num}|{spec.subject.lower()}|{spec.type}|{spec.language}|{normalize_text(question)}"
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+async def ensure_schema(conn):
+    await conn.execute(SCHEMA_SQL)
+
+
+async def insert_questions(
+    conn,
+    spec: QuestionSpec,
+    questions: Sequence[GeneratedQuestion],
+    embeddings: Sequence[Optional[Sequence[float]]],
+) -> int:
+    """Store validated questions for one cell; duplicates are skipped. Returns rows attempted."""
+    rows = [
+        (
+            class_number(spec.class_num), spec.subject, spec.chapter or '', spec.type, spec.difficulty,
+            spec.cognitive, spec.language, q.question,
+            json.dumps(q.options) if q.options is not None else None,
+            q.correctAnswer, q.explanation, q.pageReference, q.ncertSource,
+            question_hash(spec, q.question), embedding,
+        )
+        for q, embedding in zip(questions, embeddings)
+    ]
+    if rows:
+        await conn.executemany(INSERT_SQL, rows)
+    return len(rows)
+
+
+async def fetch_cell(
+    conn,
+    spec: QuestionSpec,
+    limit: int,
+    chapters: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Up to `limit` bank questions for a cell (random sample)."""
+    rows = await conn.fetch(
+        FETCH_CELL_SQL,
+        class_number(spec.class_num), spec.subject, spec.type, spec.difficulty,
+        spec.cognitive, spec.language, chapters or None, limit
+    )
+    questions = []
+    for row in rows:
+        question = dict(row)
+        if isinstance(question['options'], str):
+            question['options'] = json.loads(question['options'])
+        questions.append(question)
+    return questions
+
+
+async def coverage(conn) -> List[Dict[str, Any]]:
+    """Question counts per cell."""
+    return [dict(row) for row in await conn.fetch(COVERAGE_SQL)]
+
+
+# ============== HIT-RATE STATS ==============
+
+class BankStats:
+    """In-process counters for how much of each paper the bank served."""
+
+    def __init__(self):
+        self.buckets_requested = 0
+        self.buckets_full_hit = 0
+        self.buckets_partial_hit = 0
+        self.questions_requested = 0
+        self.questions_from_bank = 0
+
+    def record(self, requested: int, served: int):
+        self.buckets_requested += 1
+        self.questions_requested += requested
+        self.questions_from_bank += served
+        if served >= requested:
+            self.buckets_full_hit += 1
+        elif served > 0:
+            self.buckets_partial_hit += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "buckets_requested": self.buckets_requested,
+            "buckets_full_hit": self.buckets_full_hit,
+            "buckets_partial_hit": self.buckets_partial_hit,
+            "questions_requested": self.questions_requested,
+            "questions_from_bank": self.questions_from_bank,
+            "question_hit_rate": (
+                round(self.questions_from_bank / self.questions_requested, 4)
+                if self.questions_requested else 0.0
+            ),
+        }
+
+
+bank_stats = BankStats()
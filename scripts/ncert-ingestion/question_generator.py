@@ -0,0 +1,240 @@
+"""
+Question Generator - Batched, schema-validated question generation.
+
+Each LLM call asks for up to QUESTIONS_PER_CALL questions as a strict JSON
+array. The streamed response is parsed incrementally (json_stream.py) and
+every object is validated as soon as it closes. Only the questions that are
+missing or invalid are requested again, so a 100-question paper costs about
+ten calls rather than a hundred.
+"""
+
+import asyncio
+import logging
+import os
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from pydantic import BaseModel, ValidationError, constr, validator
+
+from json_stream import JSONObjectStream
+from llm_client import get_llm_client
+
+logger = logging.getLogger(__name__)
+
+QUESTIONS_PER_CALL = int(os.getenv("TEST_GEN_QUESTIONS_PER_CALL", 10))
+MAX_CALL_ROUNDS = int(os.getenv("TEST_GEN_MAX_CALL_ROUNDS", 3))
+CONTEXT_CHAR_LIMIT = int(os.getenv("TEST_GEN_CONTEXT_CHARS", 6000))
+# Existing questions listed in the prompt as "do not repeat" (most relevant first)
+AVOID_PROMPT_LIMIT = int(os.getenv("TEST_GEN_AVOID_PROMPT_LIMIT", 50))
+
+# No response_mime_type: google-generativeai 0.3.2 (requirements.txt) does not
+# support it. The prompt asks for a bare JSON array and JSONObjectStream skips
+# any fences or preamble around it.
+GENERATION_CONFIG = {
+    "temperature": 0.4,
+    "max_output_tokens": 8192,
+}
+
+TYPE_RULES = {
+    "mcq": 'exactly 4 "options"; "correctAnswer" must be copied exactly from "options"',
+    "true_false": '"options" must be ["True", "False"]; "correctAnswer" is "True" or "False"',
+    "fill_blanks": 'mark the blank with "_____" in "question"; "options" is null',
+    "numerical": '"correctAnswer" includes the final value with units; "options" is null',
+    "short": '"correctAnswer" is a 2-4 sentence model answer; "options" is null',
+    "long": '"correctAnswer" is a structured model answer (key points); "options" is null',
+    "case_based": '"question" starts with a short case/passage followed by the question; "options" is null',
+}
+
+
+class QuestionGenerationError(Exception):
+    """Raised when questions cannot be generated"""
+    pass
+
+
+@dataclass
+class QuestionSpec:
+    """What to generate: one cell of (class, subject, chapter, type, difficulty, cognitive)"""
+    subject: str
+    class_num: int
+    type: str
+    difficulty: str = "medium"
+    cognitive: str = "understand"
+    chapter: Optional[str] = None
+    topic: Optional[str] = None
+    language: str = "english"
+
+
+class GeneratedQuestion(BaseModel):
+    """Schema every generated question must satisfy"""
+    question: constr(strip_whitespace=True, min_length=5)
+    options: Optional[List[constr(strip_whitespace=True, min_length=1)]] = None
+    correctAnswer: constr(strip_whitespace=True, min_length=1)
+    explanation: Optional[str] = None
+    pageReference: Optional[str] = None
+    ncertSource: Optional[str] = None
+    sourceChunkIds: Optional[List[str]] = None
+
+    @validator('sourceChunkIds', pre=True)
+    def chunk_ids_to_str(cls, v):
+        if v is None:
+            return None
+        return [str(item) for item in (v if isinstance(v, list) else [v])] or None
+
+    @validator('pageReference', 'ncertSource', 'explanation', pre=True)
+    def empty_to_none(cls, v):
+        if isinstance(v, str) and not v.strip():
+            return None
+        return v
+
+
+def normalize_text(text: str) -> str:
+    """Case/space/punctuation-insensitive form used for duplicate checks"""
+    return re.sub(r"[\W_]+", " ", text.lower()).strip()
+
+
+def validate_question(obj: Dict, question_type: str) -> Tuple[Optional[GeneratedQuestion], Optional[str]]:
+    """Validate one parsed object; returns (question, None) or (None, reason)."""
+    try:
+        question = GeneratedQuestion.parse_obj(obj)
+    except ValidationError as e:
+        return None, f"schema: {e.errors()[0]['loc']} {e.errors()[0]['msg']}"
+
+    if question_type == "mcq":
+        if not question.options or len(question.options) != 4:
+            return None, "mcq needs exactly 4 options"
+        if len({normalize_text(o) for o in question.options}) != 4:
+            return None, "mcq options are not distinct"
+        if question.correctAnswer not in question.options:
+            return None, "mcq answer is not one of the options"
+    elif question_type == "true_false":
+        question.options = ["True", "False"]
+        if question.correctAnswer.title() not in question.options:
+            return None, "true_false answer must be True or False"
+        question.correctAnswer = question.correctAnswer.title()
+    else:
+        question.options = None
+
+    return question, None
+
+
+class QuestionGenerator:
+    """Generates validated questions for a QuestionSpec with batched LLM calls."""
+
+    def __init__(self, model_name: Optional[str]):
+        self.model_name = model_name
+        self.llm = get_llm_client()
+        self.calls = 0
+        self.rejected = 0
+
+    @property
+    def available(self) -> bool:
+        return self.model_name is not None
+
+    def build_prompt(self, spec: QuestionSpec, n: int, context: str, avoid: List[str]) -> str:
+        scope = f"Class {spec.class_num} {spec.subject}"
+        if spec.chapter:
+            scope += f", chapter '{spec.chapter}'"
+        if spec.topic:
+            scope += f", topic '{spec.topic}'"
+
+        avoid_block = ""
+        if avoid:
+            avoid_block = "\nDo NOT repeat these existing questions:\n" + "\n".join(
+                f"- {q}" for q in avoid[:AVOID_PROMPT_LIMIT]
+            ) + "\n"
+
+        context_block = ""
+        if context:
+            context_block = f"\nNCERT CONTENT (base every question on this):\n{context[:CONTEXT_CHAR_LIMIT]}\n"
+
+        # Chunk-mode context labels each block "[chunk <id>]"; ask for citations
+        chunk_key = ""
+        if "[chunk " in context:
+            chunk_key = '  "sourceChunkIds": array of the [chunk <id>] ids the question is based on\n'
+
+        return f"""You are an expert CBSE/NCERT question paper setter.
+Write exactly {n} {spec.type} questions for {scope}.
+Difficulty: {spec.difficulty}. Cognitive level (Bloom's): {spec.cognitive}. Language: {spec.language}.
+{context_block}{avoid_block}
+Return ONLY a JSON array of {n} objects, no markdown, no commentary. Each object has exactly these keys:
+  "question": string
+  "options": array of strings or null
+  "correctAnswer": string
+  "explanation": string (one or two sentences)
+  "pageReference": string or null (NCERT page/section if known)
+  "ncertSource": string or null (short phrase from the NCERT content the question is based on)
+{chunk_key}Rules for {spec.type}: {TYPE_RULES.get(spec.type, '"options" is null')}.
+"""
+
+    async def _call(
+        self, spec: QuestionSpec, n: int, context: str, seen: set, shown: List[str]
+    ) -> List[GeneratedQuestion]:
+        """One streamed LLM call; returns the valid, non-duplicate questions (at most n)."""
+        self.calls += 1
+        parser = JSONObjectStream()
+        accepted: List[GeneratedQuestion] = []
+
+        async for text in self.llm.generate_stream(
+            self.build_prompt(spec, n, context, shown),
+            model_name=self.model_name,
+            generation_config=GENERATION_CONFIG
+        ):
+            for obj in parser.feed(text):
+                question, reason = validate_question(obj, spec.type)
+                if question is None:
+                    self.rejected += 1
+                    logger.debug(f"Rejected generated {spec.type} question: {reason}")
+                    continue
+                key = normalize_text(question.question)
+                if key in seen or len(accepted) >= n:
+                    continue
+                seen.add(key)
+                shown.append(question.question)
+                accepted.append(question)
+
+        self.rejected += parser.malformed
+        return accepted
+
+    async def _generate_batch(
+        self, spec: QuestionSpec, n: int, context: str, seen: set, shown: List[str]
+    ) -> List[GeneratedQuestion]:
+        """Get n valid questions, re-requesting only the shortfall each round."""
+        accepted: List[GeneratedQuestion] = []
+        for round_number in range(1, MAX_CALL_ROUNDS + 1):
+            missing = n - len(accepted)
+            if missing <= 0:
+                break
+            if round_number > 1:
+                logger.info(f"Re-requesting {missing}/{n} {spec.type} questions (round {round_number})")
+            accepted.extend(await self._call(spec, missing, context, seen, shown))
+
+        if len(accepted) < n:
+            raise QuestionGenerationError(
+                f"only {len(accepted)}/{n} valid {spec.type} questions after {MAX_CALL_ROUNDS} calls"
+            )
+        return accepted
+
+    async def generate(
+        self, spec: QuestionSpec, count: int, context: str = "", avoid: Sequence[str] = ()
+    ) -> List[GeneratedQuestion]:
+        """
+        Generate `count` validated questions. Batches of QUESTIONS_PER_CALL run
+        concurrently (bounded by the LLM client); results keep batch order.
+        Questions in `avoid` (e.g. the rest of the paper) are never returned;
+        the prompt lists the first AVOID_PROMPT_LIMIT of them as given, so
+        callers put the ones most likely to be repeated first.
+        """
+        if not self.available:
+            raise QuestionGenerationError("no LLM model configured")
+
+        # shared so concurrent batches avoid duplicating each other: `seen`
+        # (normalized) rejects exact repeats, `shown` (original text, caller's
+        # order, then questions accepted so far) goes into the prompt
+        seen: set = {normalize_text(question) for question in avoid}
+        shown: List[str] = list(dict.fromkeys(question for question in avoid if question))
+        sizes = [min(QUESTIONS_PER_CALL, count - start) for start in range(0, count, QUESTIONS_PER_CALL)]
+        batches = await asyncio.gather(
+            *(self._generate_batch(spec, size, context, seen, shown) for size in sizes)
+        )
+        return [question for batch in batches for question in batch]
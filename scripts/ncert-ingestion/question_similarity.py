@@ -0,0 +1,124 @@
+"""
+Question Similarity - Near-duplicate detection for generated questions.
+
+Questions are embedded with a signed hashing vectorizer (content words and
+word bigrams hashed into SIMILARITY_DIM float32 slots, L2-normalized), so
+cosine similarity is a single matrix product and nothing has to be fitted
+or loaded. A SimilarityIndex holds the embedded questions of a teacher's
+recent papers; find_duplicates() checks a whole paper against that index
+and against its own earlier questions in two products:
+
+    paper  @ index.T    -> best match among recent questions
+    paper  @ paper.T    -> lower triangle: matches among earlier questions
+
+Anything at or above DUPLICATE_THRESHOLD is a near-duplicate. Exact
+duplicates are already rejected while generating (question_generator.py);
+this catches lightly reworded repeats ("Explain the laws of refraction." /
+"State and explain the laws of refraction.") across buckets and papers.
+"""
+
+import os
+import re
+import zlib
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+SIMILARITY_DIM = int(os.getenv("QUESTION_SIMILARITY_DIM", 2048))
+DUPLICATE_THRESHOLD = float(os.getenv("QUESTION_DUPLICATE_THRESHOLD", 0.8))
+
+_STOPWORDS = frozenset(
+    "a an the of to in on for and or is are was were be been by with as at from "
+    "that this these those which what who whom how why when where it its their "
+    "does do did can will should would following given".split()
+)
+
+
+def _words(text: str) -> List[str]:
+    return [word for word in re.sub(r"[\W_]+", " ", text.lower()).split() if word not in _STOPWORDS]
+
+
+@lru_cache(maxsize=65536)
+def _slot(feature: str) -> Tuple[int, float]:
+    """Hash slot and sign of a feature (crc32: stable across processes)"""
+    digest = zlib.crc32(feature.encode("utf-8"))
+    return digest % SIMILARITY_DIM, 1.0 if digest & 0x80000000 else -1.0
+
+
+def embed(texts: Sequence[str]) -> np.ndarray:
+    """Unit-length hashed bag of words + bigrams, one row per text"""
+    rows, cols, signs = [], [], []
+    for row, text in enumerate(texts):
+        words = _words(text)
+        for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+            col, sign = _slot(feature)
+            rows.append(row)
+            cols.append(col)
+            signs.append(sign)
+
+    flat = np.asarray(rows, dtype=np.int64) * SIMILARITY_DIM + np.asarray(cols, dtype=np.int64)
+    matrix = np.bincount(flat, weights=signs, minlength=len(texts) * SIMILARITY_DIM)
+    matrix = matrix.astype(np.float32).reshape(len(texts), SIMILARITY_DIM)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
+
+
+class SimilarityIndex:
+    """Embedded questions to check new papers against"""
+
+    def __init__(self, texts: Sequence[str] = ()):
+        self.texts = list(texts)
+        self.vectors = embed(self.texts)
+
+    def add(self, texts: Sequence[str]):
+        self.texts.extend(texts)
+        self.vectors = np.vstack([self.vectors, embed(texts)])
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def closest(self, texts: Sequence[str]) -> List[str]:
+        """Indexed questions, most similar to any of `texts` first"""
+        if not texts or not len(self):
+            return list(self.texts)
+        similarity = (self.vectors @ embed(texts).T).max(axis=1)
+        return [self.texts[i] for i in np.argsort(-similarity, kind="stable").tolist()]
+
+
+def find_duplicates(
+    texts: Sequence[str],
+    index: Optional[SimilarityIndex] = None,
+    threshold: float = DUPLICATE_THRESHOLD,
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    For each text, None or {"source": "paper"|"recent", "match": text,
+    "similarity": s}. Within the paper the first occurrence is kept and
+    later ones are flagged; a recent-paper match wins over a paper match.
+    """
+    count = len(texts)
+    if count == 0:
+        return []
+    vectors = embed(texts)
+
+    within = vectors @ vectors.T
+    within[np.triu_indices(count)] = -1.0
+    paper_best = within.argmax(axis=1)
+    paper_sim = within[np.arange(count), paper_best]
+
+    if index is not None and len(index):
+        against = vectors @ index.vectors.T
+        recent_best = against.argmax(axis=1)
+        recent_sim = against[np.arange(count), recent_best]
+    else:
+        recent_best = np.zeros(count, dtype=np.int64)
+        recent_sim = np.full(count, -1.0, dtype=np.float32)
+
+    result: List[Optional[Dict[str, Any]]] = [None] * count
+    for i in np.nonzero((recent_sim >= threshold) | (paper_sim >= threshold))[0].tolist():
+        if recent_sim[i] >= threshold:
+            result[i] = {"source": "recent", "match": index.texts[recent_best[i]], "similarity": round(float(recent_sim[i]), 3)}
+        else:
+            result[i] = {"source": "paper", "match": texts[paper_best[i]], "similarity": round(float(paper_sim[i]), 3)}
+    return result
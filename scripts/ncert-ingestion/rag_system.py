@@ -3,16 +3,26 @@ NCERT RAG SYSTEM - PRODUCTION READY
 Optimized for Flask API with proper sync/async handling
 """
 
+import asyncio
 import os
 import logging
 import sys
+import time
 from pathlib import Path
-from typing import List, Dict, Any, Tuple, Optional
+from typing import List, Dict, Any, AsyncIterator, Tuple, Optional
 import psycopg2
 from psycopg2.extras import RealDictCursor
-import google.generativeai as genai
 from datetime import datetime
 
+import asyncpg
+import corpus_stats
+from corpus_scope import class_grades
+import google.generativeai as genai
+from db_client import get_database_client
+from deadlines import DeadlineExceeded, remaining_or, set_statement_timeout
+from llm_client import CircuitOpenError, get_llm_client
+from vector_codec import register_vector_psycopg2
+
 # ========== FIX FOR WINDOWS UNICODE ==========
 if sys.platform == "win32":
     import io
@@ -30,12 +40,54 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 1000,
+}
+
+KEYWORD_SEARCH_SQL = """
+    SELECT 
+        id, class_grade, subject, chapter, content,
+        0.8 as similarity
+    FROM ncert_chunks 
+    WHERE content ILIKE $1
+      AND ($3::text[] IS NULL OR class_grade = ANY($3))
+      AND ($4::text IS NULL OR lower(subject) = lower($4))
+      AND ($5::text IS NULL OR chapter = $5)
+    ORDER BY id
+    LIMIT $2
+"""
+
+RANDOM_CHUNKS_SQL = """
+    SELECT 
+        id, class_grade, subject, chapter, content,
+        0.5 as similarity
+    FROM ncert_chunks 
+    WHERE ($2::text[] IS NULL OR class_grade = ANY($2))
+      AND ($3::text IS NULL OR lower(subject) = lower($3))
+      AND ($4::text IS NULL OR chapter = $4)
+    ORDER BY RANDOM()
+    LIMIT $1
+"""
+
+INSERT_CHUNK_SQL = """
+    INSERT INTO ncert_chunks
+    (class_grade, subject, chapter, content, embedding, created_at)
+    VALUES ($1, $2, $3, $4, $5, NOW())
+"""
+
+EMBEDDING_MODEL = "models/embedding-001"
+EMBEDDING_DIM = 768
+
 class RAGSystem:
     """Production-ready RAG system for NCERT with sync/async support."""
     
     def __init__(self):
         self.conn = None
+        self.db = get_database_client()  # Pooled asyncpg client for the async API path
+        self.llm = get_llm_client()  # Shared Gemini client (model reuse, limits, breaker)
         self.current_model = None
+        self.top_k = 10
         self.initialized = False
         self.initialize_sync()
     
@@ -94,6 +146,9 @@ class RAGSystem:
                 connect_timeout=30
             )
             
+            # Embeddings come back as float32 NumPy arrays
+            register_vector_psycopg2(self.conn)
+            
             # Test connection
             with self.conn.cursor() as cursor:
                 cursor.execute("SELECT version()")
@@ -133,14 +188,12 @@ class RAGSystem:
                 self.current_model = None
                 return
             
-            genai.configure(api_key=api_key)
-            
             # Test models
             models_to_try = ["gemini-2.0-flash", "gemini-1.5-flash", "gemini-1.5-pro"]
             
             for model_name in models_to_try:
                 try:
-                    model = genai.GenerativeModel(model_name)
+                    model = self.llm.model(model_name)
                     # Quick test
                     response = model.generate_content("test", max_output_tokens=1)
                     if response.text:
@@ -166,8 +219,7 @@ class RAGSystem:
         
         try:
             # First try keyword search
-            keywords = query.lower().split()
-            keywords = [k for k in keywords if len(k) > 3][:5]
+            keywords = self._extract_keywords(query)
             
             chunks = []
             seen_ids = set()
@@ -220,20 +272,40 @@ class RAGSystem:
         # Try Gemini if available
         if self.current_model:
             try:
-                # Prepare context
-                context_parts = []
-                for i, chunk in enumerate(chunks[:3], 1):
-                    context_parts.append(
-                        f"[Source {i}: Class {chunk.get('class_grade', 'N/A')}, "
-                        f"Subject: {chunk.get('subject', 'N/A')}, "
-                        f"Chapter: {chunk.get('chapter', 'N/A')}]\n"
-                        f"{chunk['content']}"
-                    )
-                
-                context = "\n\n---\n\n".join(context_parts)
+                return self.llm.generate_sync(
+                    self._build_prompt(query, chunks),
+                    model_name=self.current_model,
+                    generation_config=GENERATION_CONFIG
+                )
                 
-                # Build prompt
-                prompt = f"""You are an expert NCERT tutor. Answer based ONLY on the provided NCERT content.
+            except CircuitOpenError:
+                logger.warning("Gemini circuit open, using fallback")
+            except Exception as e:
+                logger.error(f"Gemini generation failed: {e}, using fallback")
+                # Fall through to fallback
+        
+        # Fallback response - combine top chunks
+        return self._generate_fallback_response(chunks)
+    
+    def _extract_keywords(self, query: str) -> List[str]:
+        """Pick up to 5 significant words from the query for keyword search."""
+        keywords = query.lower().split()
+        return [k for k in keywords if len(k) > 3][:5]
+    
+    def _build_prompt(self, query: str, chunks: List[Dict]) -> str:
+        """Build the grounded answer prompt from the top chunks."""
+        context_parts = []
+        for i, chunk in enumerate(chunks[:3], 1):
+            context_parts.append(
+                f"[Source {i}: Class {chunk.get('class_grade', 'N/A')}, "
+                f"Subject: {chunk.get('subject', 'N/A')}, "
+                f"Chapter: {chunk.get('chapter', 'N/A')}]\n"
+                f"{chunk['content']}"
+            )
+        
+        context = "\n\n---\n\n".join(context_parts)
+        
+        return f"""You are an expert NCERT tutor. Answer based ONLY on the provided NCERT content.
 
 NCERT CONTENT:
 {context}
@@ -248,25 +320,6 @@ INSTRUCTIONS:
 5. Mention relevant class and subject if applicable
 
 ANSWER: """
-                
-                # Generate response
-                model = genai.GenerativeModel(self.current_model)
-                response = model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.2,
-                        "max_output_tokens": 1000,
-                    }
-                )
-                
-                return response.text
-                
-            except Exception as e:
-                logger.error(f"Gemini generation failed: {e}, using fallback")
-                # Fall through to fallback
-        
-        # Fallback response - combine top chunks
-        return self._generate_fallback_response(chunks)
     
     def _generate_fallback_response(self, chunks: List[Dict]) -> str:
         """Generate fallback response when Gemini fails."""
@@ -311,6 +364,236 @@ ANSWER: """
         
         return answer, len(chunks)
     
+    # ============== ASYNC API PATH ==============
+    # Used by the FastAPI routes. Everything here honours the request deadline
+    # (see deadlines.py): statements run with SET LOCAL statement_timeout and
+    # are cancelled server-side if the request task is cancelled, and the
+    # Gemini call is abandoned as soon as the request is.
+    
+    async def initialize(self) -> bool:
+        """Open the shared connection pool for the async path."""
+        return await self.db.connect()
+    
+    @property
+    def pool(self):
+        return self.db.pool
+    
+    async def retrieve_chunks(
+        self,
+        query: str,
+        limit: int = 10,
+        filters: Optional[Dict[str, str]] = None
+    ) -> List[Dict]:
+        """
+        Retrieve relevant chunks asynchronously within the request deadline.
+        `filters` may restrict class_grade (any spelling, see corpus_scope.py)
+        / subject (case-insensitive) / chapter.
+        """
+        filters = filters or {}
+        scope = (class_grades(filters.get('class_grade')), filters.get('subject'), filters.get('chapter'))
+        
+        if not await self.db.connect():
+            logger.error("Database not connected")
+            return []
+        
+        try:
+            chunks = []
+            seen_ids = set()
+            
+            async with self.db.acquire(timeout=remaining_or(None)) as conn:
+                async with conn.transaction(readonly=True):
+                    await set_statement_timeout(conn)
+                    
+                    for keyword in self._extract_keywords(query):
+                        rows = await conn.fetch(KEYWORD_SEARCH_SQL, f'%{keyword}%', limit, *scope)
+                        for row in rows:
+                            if row['id'] not in seen_ids:
+                                seen_ids.add(row['id'])
+                                chunks.append(dict(row))
+                    
+                    # If no keyword matches found, get random chunks
+                    if not chunks:
+                        rows = await conn.fetch(RANDOM_CHUNKS_SQL, limit, *scope)
+                        chunks = [dict(row) for row in rows]
+            
+            logger.debug(f"Retrieved {len(chunks)} chunks via keyword search")
+            return chunks
+            
+        except asyncpg.exceptions.QueryCanceledError as e:
+            raise DeadlineExceeded(f"retrieval cancelled: {e}")
+        except Exception as e:
+            logger.error(f"Retrieval failed: {e}")
+            return []
+    
+    async def generate_response(self, query: str, chunks: List[Dict]) -> str:
+        """Generate response asynchronously; the LLM call is bounded by the deadline."""
+        if not chunks:
+            return "I couldn't find relevant information in my NCERT knowledge base."
+        
+        if self.current_model:
+            try:
+                return await self.llm.generate(
+                    self._build_prompt(query, chunks),
+                    model_name=self.current_model,
+                    generation_config=GENERATION_CONFIG
+                )
+                
+            except DeadlineExceeded:
+                raise
+            except CircuitOpenError:
+                # Gemini is known to be unhealthy - answer extractively right away
+                logger.warning("Gemini circuit open, using fallback")
+            except Exception as e:
+                logger.error(f"Gemini generation failed: {e}, using fallback")
+        
+        return self._generate_fallback_response(chunks)
+    
+    async def generate_embedding(self, text: str) -> List[float]:
+        """Document embedding for `text` (dummy vector without GEMINI_API_KEY, as in ingest.py)."""
+        if not os.getenv("GEMINI_API_KEY", "").strip():
+            return [0.1] * EMBEDDING_DIM
+        self.llm.model(self.current_model or "gemini-1.5-flash")  # configures the API key once
+        result = await asyncio.to_thread(
+            genai.embed_content, model=EMBEDDING_MODEL, content=text, task_type="retrieval_document"
+        )
+        return result["embedding"]
+    
+    async def store_embeddings(self, embeddings: List[List[float]], chunks: List[Dict]) -> bool:
+        """Insert chunks and update corpus_stats in the same transaction."""
+        if not await self.db.connect():
+            logger.error("Database not connected")
+            return False
+        
+        try:
+            async with self.db.acquire() as conn:
+                async with conn.transaction():
+                    await conn.executemany(INSERT_CHUNK_SQL, [
+                        (chunk['class_grade'], chunk['subject'], chunk['chapter'], chunk['content'], embedding)
+                        for chunk, embedding in zip(chunks, embeddings)
+                    ])
+                    await corpus_stats.apply_deltas(conn, corpus_stats.deltas_from_chunks(chunks))
+            return True
+        except Exception as e:
+            logger.error(f"Storing chunks failed: {e}")
+            return False
+    
+    def _format_sources(self, chunks: List[Dict]) -> List[Dict]:
+        """Shape retrieved chunks as API source documents."""
+        return [
+            {
+                "id": str(chunk['id']),
+                "content": chunk['content'],
+                "metadata": {
+                    "class_grade": chunk.get('class_grade'),
+                    "subject": chunk.get('subject'),
+                    "chapter": chunk.get('chapter'),
+                },
+                "similarity": float(chunk.get('similarity', 0.0)),
+            }
+            for chunk in chunks
+        ]
+    
+    async def query(
+        self,
+        question: str,
+        limit: Optional[int] = None,
+        filters: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Async query method for the API routes.
+        Returns: {"answer", "sources", "chunks_retrieved"}
+        """
+        start_time = datetime.now()
+        
+        chunks = await self.retrieve_chunks(question, limit=limit or self.top_k, filters=filters)
+        
+        if not chunks:
+            return {
+                "answer": "I couldn't find relevant information in my NCERT knowledge base.",
+                "sources": [],
+                "chunks_retrieved": 0,
+            }
+        
+        answer = await self.generate_response(question, chunks)
+        
+        processing_time = (datetime.now() - start_time).total_seconds()
+        logger.info(f"Query processed in {processing_time:.2f}s, chunks: {len(chunks)}")
+        
+        return {
+            "answer": answer,
+            "sources": self._format_sources(chunks),
+            "chunks_retrieved": len(chunks),
+        }
+    
+    async def query_stream(
+        self,
+        question: str,
+        limit: Optional[int] = None,
+        filters: Optional[Dict[str, str]] = None
+    ) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """
+        Streaming variant of query(). Yields (event, data) pairs:
+            ("sources", {...})  as soon as retrieval finishes
+            ("token", {...})    for each piece of the answer as it is generated
+            ("done", {...})     timings and chunk ids
+        Closing the iterator cancels the in-flight LLM request.
+        """
+        start = time.perf_counter()
+        
+        chunks = await self.retrieve_chunks(question, limit=limit or self.top_k, filters=filters)
+        retrieval_ms = int((time.perf_counter() - start) * 1000)
+        
+        yield "sources", {
+            "sources": self._format_sources(chunks),
+            "chunks_retrieved": len(chunks),
+        }
+        
+        first_token_ms = None
+        mode = "llm"
+        
+        if not chunks:
+            mode = "empty"
+            yield "token", {"text": "I couldn't find relevant information in my NCERT knowledge base."}
+        else:
+            streamed = False
+            if self.current_model:
+                try:
+                    async for text in self.llm.generate_stream(
+                        self._build_prompt(question, chunks),
+                        model_name=self.current_model,
+                        generation_config=GENERATION_CONFIG
+                    ):
+                        if first_token_ms is None:
+                            first_token_ms = int((time.perf_counter() - start) * 1000)
+                        streamed = True
+                        yield "token", {"text": text}
+                except DeadlineExceeded:
+                    raise
+                except CircuitOpenError:
+                    logger.warning("Gemini circuit open, using fallback")
+                except Exception as e:
+                    # Already-sent tokens stand; only fall back if nothing went out
+                    if streamed:
+                        raise
+                    logger.error(f"Gemini streaming failed: {e}, using fallback")
+            
+            if not streamed:
+                mode = "fallback"
+                yield "token", {"text": self._generate_fallback_response(chunks)}
+        
+        total_ms = int((time.perf_counter() - start) * 1000)
+        logger.info(f"Streamed query in {total_ms}ms (retrieval {retrieval_ms}ms), chunks: {len(chunks)}")
+        
+        yield "done", {
+            "chunk_ids": [str(chunk['id']) for chunk in chunks],
+            "answer_mode": mode,
+            "timings": {
+                "retrieval_ms": retrieval_ms,
+                "first_token_ms": first_token_ms,
+                "total_ms": total_ms,
+            },
+        }
+    
     def count_chunks(self) -> int:
         """Count total chunks in database."""
         if not self.conn:
@@ -326,26 +609,19 @@ ANSWER: """
             return 0
     
     def get_stats_sync(self) -> Dict[str, Any]:
-        """Get database statistics synchronously."""
+        """Get database statistics synchronously (from corpus_stats, no table scans)."""
         if not self.conn:
             return {}
         
         try:
-            with self.conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute("SELECT COUNT(*) as total FROM ncert_chunks")
-                total = cursor.fetchone()['total']
-                
-                cursor.execute("SELECT COUNT(DISTINCT chapter) as chapters FROM ncert_chunks")
-                chapters = cursor.fetchone()['chapters']
-                
-                cursor.execute("SELECT COUNT(DISTINCT subject) as subjects FROM ncert_chunks")
-                subjects = cursor.fetchone()['subjects']
+            stats = corpus_stats.read_stats_sync(self.conn)
             
             return {
-                "total_chunks": total,
-                "unique_chapters": chapters,
-                "unique_subjects": subjects,
+                "total_chunks": stats["total_chunks"],
+                "unique_chapters": stats["unique_chapters"],
+                "unique_subjects": stats["unique_subjects"],
                 "current_model": self.current_model or "none",
+                "freshness": stats["freshness"],
             }
             
         except Exception as e:
@@ -366,11 +642,17 @@ ANSWER: """
             logger.error(f"Failed to list chapters: {e}")
             return []
     
-    def close(self):
-        """Cleanup resources."""
+    def close_sync(self):
+        """Close the sync (psycopg2) connection."""
         if self.conn:
             self.conn.close()
+            self.conn = None
             logger.info("✓ Database connection closed")
+    
+    async def close(self):
+        """Cleanup resources: the sync connection and the shared asyncpg pool."""
+        self.close_sync()
+        await self.db.close()
 
 class VectorDatabase:
     """Wrapper for database operations (for backward compatibility)."""
@@ -440,7 +722,7 @@ def test_system_sync():
     except Exception as e:
         print(f"❌ Test failed: {e}")
     finally:
-        rag.close()
+        rag.close_sync()
 
 if __name__ == "__main__":
     # Run synchronous test
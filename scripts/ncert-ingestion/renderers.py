@@ -0,0 +1,440 @@
+"""
+Test Paper Renderers - PDF/DOCX/HTML/CSV/JSON output files.
+
+PDF and DOCX layout is CPU-bound, so it runs in a ProcessPoolExecutor and
+never blocks the event loop. Each worker process registers fonts and builds
+the static layout (header, logo, watermark, DOCX base documents) once, in its
+initializer, and reuses it for every paper it renders. The DOCX base document
+exists per watermark/page-number combination, so options never have to be
+patched into a copied document.
+
+Artifacts are cached on disk by content hash: the same paper in the same
+format is rendered once, however many times it is downloaded, and
+concurrent requests for the same artifact share a single render.
+
+A paper is a plain dict (picklable for the pool):
+    subject, classNum, board, topic, chapters, timeLimit,
+    includeAnswerKey, includeInstructions, watermark, includePageNumbers,
+    questions (list of question dicts)
+
+Layout order comes from paper_formatter.iter_paper_blocks(); each renderer
+only decides how a block looks in its format.
+"""
+
+import asyncio
+import csv
+import hashlib
+import html
+import io
+import json
+import logging
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from paper_formatter import iter_paper_blocks, marks_label
+from singleflight import get_singleflight
+
+logger = logging.getLogger(__name__)
+
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", 2))
+ARTIFACT_DIR = os.getenv("TEST_ARTIFACT_DIR", os.path.join(tempfile.gettempdir(), "ncert_test_artifacts"))
+ARTIFACT_TTL_SECONDS = float(os.getenv("TEST_ARTIFACT_TTL_SECONDS", 24 * 3600))
+PAPER_FONT_PATH = os.getenv("TEST_PAPER_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf")
+PAPER_BOLD_FONT_PATH = os.getenv("TEST_PAPER_BOLD_FONT", "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf")
+PAPER_LOGO_PATH = os.getenv("TEST_PAPER_LOGO")
+PAPER_WATERMARK = os.getenv("TEST_PAPER_WATERMARK", "NCERT Test Generator")
+
+# Bump when layout changes so cached artifacts are not reused
+RENDERER_VERSION = "2"
+
+MEDIA_TYPES = {
+    "pdf": "application/pdf",
+    "docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    "html": "text/html; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+}
+
+CSV_FIELDS = ["id", "type", "question", "options", "correctAnswer", "explanation", "marks",
+              "difficulty", "cognitiveLevel", "chapter", "pageReference"]
+
+# Formats rendered in the process pool; the rest are cheap enough for a thread
+POOLED_FORMATS = {"pdf", "docx"}
+
+
+def artifact_key(fmt: str, paper: Dict[str, Any]) -> str:
+    """Content hash of everything that affects the rendered file"""
+    canonical = json.dumps(paper, sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(f"{RENDERER_VERSION}|{fmt}|{canonical}".encode("utf-8")).hexdigest()
+
+
+# ============== PER-WORKER STATIC LAYOUT ==============
+
+# Built once per process by _init_worker (or lazily when rendering inline)
+_fonts: Optional[Tuple[str, str]] = None
+_pdf_styles = None
+# (watermark, page numbers) -> saved DOCX base document
+_docx_templates: Dict[Tuple[bool, bool], bytes] = {}
+
+
+def _init_worker():
+    """Process pool initializer: fonts, styles and the DOCX base documents"""
+    global _fonts, _pdf_styles
+    if _fonts is not None:
+        return
+
+    from reportlab.lib.enums import TA_CENTER
+    from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+
+    regular, bold = "Helvetica", "Helvetica-Bold"
+    try:
+        if os.path.exists(PAPER_FONT_PATH):
+            pdfmetrics.registerFont(TTFont("PaperFont", PAPER_FONT_PATH))
+            regular = bold = "PaperFont"
+            if os.path.exists(PAPER_BOLD_FONT_PATH):
+                pdfmetrics.registerFont(TTFont("PaperFont-Bold", PAPER_BOLD_FONT_PATH))
+                bold = "PaperFont-Bold"
+    except Exception as e:
+        logger.warning(f"Falling back to Helvetica, could not load paper font: {e}")
+    _fonts = (regular, bold)
+
+    base = getSampleStyleSheet()
+    _pdf_styles = {
+        "title": ParagraphStyle("PaperTitle", parent=base["Title"], fontName=bold, fontSize=16),
+        "meta": ParagraphStyle("PaperMeta", parent=base["Normal"], fontName=regular,
+                               fontSize=10, alignment=TA_CENTER),
+        "heading": ParagraphStyle("PaperHeading", parent=base["Heading2"], fontName=bold, fontSize=12),
+        "body": ParagraphStyle("PaperBody", parent=base["Normal"], fontName=regular,
+                               fontSize=10.5, leading=14),
+        "option": ParagraphStyle("PaperOption", parent=base["Normal"], fontName=regular,
+                                 fontSize=10.5, leading=14, leftIndent=18),
+        "note": ParagraphStyle("PaperNote", parent=base["Normal"], fontName=regular,
+                               fontSize=9, leading=12, leftIndent=18, textColor="#444444"),
+    }
+
+    for watermark in (True, False):
+        for page_numbers in (True, False):
+            _docx_templates[watermark, page_numbers] = _build_docx_template(watermark, page_numbers)
+
+
+def _build_docx_template(watermark: bool, page_numbers: bool) -> bytes:
+    """DOCX base document: styles, logo header, optional watermark and page-number footer"""
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+    from docx.oxml import OxmlElement
+    from docx.oxml.ns import qn
+    from docx.shared import Inches, Pt
+
+    document = Document()
+    style = document.styles["Normal"]
+    style.font.name = "Calibri"
+    style.font.size = Pt(11)
+    section = document.sections[0]
+    header = section.header.paragraphs[0]
+    if PAPER_LOGO_PATH and os.path.exists(PAPER_LOGO_PATH):
+        header.add_run().add_picture(PAPER_LOGO_PATH, height=Inches(0.4))
+        header.add_run("  ")
+    if watermark:
+        header.add_run(PAPER_WATERMARK).italic = True
+
+    if page_numbers:
+        footer = section.footer.paragraphs[0]
+        footer.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        footer.add_run("Page ")
+        # PAGE field, filled in by Word when the document is laid out
+        for kind, text in (("begin", None), ("instr", "PAGE"), ("end", None)):
+            run = footer.add_run()
+            if kind == "instr":
+                element = OxmlElement("w:instrText")
+                element.set(qn("xml:space"), "preserve")
+                element.text = text
+            else:
+                element = OxmlElement("w:fldChar")
+                element.set(qn("w:fldCharType"), kind)
+            run._r.append(element)
+
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+
+def _page_furniture(watermark: bool, page_numbers: bool):
+    """PDF page callback drawing the header, logo and the enabled watermark/page number"""
+
+    def draw(canvas, doc):
+        from reportlab.lib.colors import Color
+
+        regular, _ = _fonts
+        width, height = doc.pagesize
+        canvas.saveState()
+
+        if watermark:
+            canvas.setFillColor(Color(0.5, 0.5, 0.5, alpha=0.08))
+            canvas.setFont(regular, 48)
+            canvas.translate(width / 2, height / 2)
+            canvas.rotate(45)
+            canvas.drawCentredString(0, 0, PAPER_WATERMARK)
+            canvas.rotate(-45)
+            canvas.translate(-width / 2, -height / 2)
+
+        canvas.setFillColor(Color(0.3, 0.3, 0.3))
+        canvas.setFont(regular, 8)
+        if PAPER_LOGO_PATH and os.path.exists(PAPER_LOGO_PATH):
+            canvas.drawImage(PAPER_LOGO_PATH, doc.leftMargin, height - 40, height=24,
+                             preserveAspectRatio=True, mask="auto")
+        if watermark:
+            canvas.drawRightString(width - doc.rightMargin, height - 30, PAPER_WATERMARK)
+        if page_numbers:
+            canvas.drawCentredString(width / 2, 20, f"Page {doc.page}")
+        canvas.restoreState()
+
+    return draw
+
+
+# ============== RENDERERS (run in workers) ==============
+
+def _render_pdf(paper: Dict[str, Any], path: str):
+    from xml.sax.saxutils import escape
+
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import KeepTogether, PageBreak, Paragraph, SimpleDocTemplate, Spacer
+
+    _init_worker()
+    styles = _pdf_styles
+    story = []
+    title = ""
+
+    for kind, data in iter_paper_blocks(paper):
+        if kind == "title":
+            title = data
+            story.append(Paragraph(escape(data), styles["title"]))
+        elif kind == "meta":
+            story.extend(Paragraph(escape(line), styles["meta"]) for line in data)
+            story.append(Spacer(1, 10))
+        elif kind == "instructions":
+            story.append(Paragraph("General Instructions", styles["heading"]))
+            story.extend(
+                Paragraph(f"{i}. {escape(text)}", styles["body"]) for i, text in enumerate(data, 1)
+            )
+        elif kind == "section":
+            letter, section_title, total = data
+            story.append(Paragraph(
+                f"Section {letter}: {escape(section_title)} ({marks_label(total)})", styles["heading"]
+            ))
+        elif kind == "question":
+            n, question = data
+            block = [Paragraph(
+                f"<b>Q{n}.</b> {escape(question['question'])} "
+                f"<i>({marks_label(question.get('marks', 1))})</i>",
+                styles["body"]
+            )]
+            block.extend(
+                Paragraph(f"({chr(65 + i)}) {escape(option)}", styles["option"])
+                for i, option in enumerate(question.get("options") or [])
+            )
+            block.append(Spacer(1, 6))
+            story.append(KeepTogether(block))
+        elif kind == "answer_key":
+            story.extend([PageBreak(), Paragraph("Answer Key", styles["heading"])])
+        elif kind == "answer":
+            n, question = data
+            story.append(Paragraph(f"<b>Q{n}.</b> {escape(question['correctAnswer'])}", styles["body"]))
+            if question.get("explanation"):
+                story.append(Paragraph(escape(question["explanation"]), styles["note"]))
+
+    furniture = _page_furniture(paper.get("watermark", True), paper.get("includePageNumbers", True))
+    document = SimpleDocTemplate(path, pagesize=A4, title=title, topMargin=56, bottomMargin=40)
+    document.build(story, onFirstPage=furniture, onLaterPages=furniture)
+
+
+def _render_docx(paper: Dict[str, Any], path: str):
+    from docx import Document
+    from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+    _init_worker()
+    template = _docx_templates[paper.get("watermark", True), paper.get("includePageNumbers", True)]
+    document = Document(io.BytesIO(template))
+
+    for kind, data in iter_paper_blocks(paper):
+        if kind == "title":
+            document.add_heading(data, level=0).alignment = WD_ALIGN_PARAGRAPH.CENTER
+        elif kind == "meta":
+            for line in data:
+                document.add_paragraph(line).alignment = WD_ALIGN_PARAGRAPH.CENTER
+        elif kind == "instructions":
+            document.add_heading("General Instructions", level=2)
+            for text in data:
+                document.add_paragraph(text, style="List Number")
+        elif kind == "section":
+            letter, section_title, total = data
+            document.add_heading(f"Section {letter}: {section_title} ({marks_label(total)})", level=2)
+        elif kind == "question":
+            n, question = data
+            paragraph = document.add_paragraph()
+            paragraph.add_run(f"Q{n}. ").bold = True
+            paragraph.add_run(question["question"])
+            paragraph.add_run(f" ({marks_label(question.get('marks', 1))})").italic = True
+            for i, option in enumerate(question.get("options") or []):
+                document.add_paragraph(f"({chr(65 + i)}) {option}").paragraph_format.left_indent = 228600
+        elif kind == "answer_key":
+            document.add_page_break()
+            document.add_heading("Answer Key", level=2)
+        elif kind == "answer":
+            n, question = data
+            paragraph = document.add_paragraph()
+            paragraph.add_run(f"Q{n}. ").bold = True
+            paragraph.add_run(question["correctAnswer"])
+            if question.get("explanation"):
+                document.add_paragraph(question["explanation"]).runs[0].italic = True
+
+    document.save(path)
+
+
+def _render_html(paper: Dict[str, Any], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("<!DOCTYPE html><html><head><meta charset=\"utf-8\"></head><body>")
+        in_list = False
+        for kind, data in iter_paper_blocks(paper):
+            if in_list and kind in ("section", "answer_key"):
+                f.write("</ol>")
+                in_list = False
+            if kind == "title":
+                f.write(f"<h1>{html.escape(data)}</h1>")
+            elif kind == "meta":
+                f.write("".join(f"<p>{html.escape(line)}</p>" for line in data))
+            elif kind == "instructions":
+                f.write("<h2>General Instructions</h2><ol>")
+                f.write("".join(f"<li>{html.escape(text)}</li>" for text in data))
+                f.write("</ol>")
+            elif kind == "section":
+                letter, section_title, total = data
+                f.write(f"<h2>Section {letter}: {html.escape(section_title)} ({marks_label(total)})</h2>")
+            elif kind == "answer_key":
+                f.write("<h2>Answer Key</h2>")
+            elif kind in ("question", "answer"):
+                n, question = data
+                if not in_list:
+                    f.write(f"<ol start=\"{n}\">")
+                    in_list = True
+                if kind == "question":
+                    f.write(f"<li><p>{html.escape(question['question'])} "
+                            f"<em>({marks_label(question.get('marks', 1))})</em></p>")
+                    if question.get("options"):
+                        f.write("<ol type=\"A\">")
+                        f.write("".join(f"<li>{html.escape(option)}</li>" for option in question["options"]))
+                        f.write("</ol>")
+                    f.write("</li>")
+                else:
+                    f.write(f"<li>{html.escape(question['correctAnswer'])}</li>")
+        if in_list:
+            f.write("</ol>")
+        f.write("</body></html>")
+
+
+def _render_csv(paper: Dict[str, Any], path: str):
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+        for question in paper["questions"]:
+            writer.writerow({**question, "options": " | ".join(question.get("options") or [])})
+
+
+def _render_json(paper: Dict[str, Any], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(paper, f, ensure_ascii=False, default=str)
+
+
+_RENDERERS = {
+    "pdf": _render_pdf,
+    "docx": _render_docx,
+    "html": _render_html,
+    "csv": _render_csv,
+    "json": _render_json,
+}
+
+
+def _render_to(fmt: str, paper: Dict[str, Any], path: str) -> str:
+    """Render into a temp file and rename, so readers never see partial files"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        _RENDERERS[fmt](paper, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+# ============== ASYNC API ==============
+
+_executor: Optional[ProcessPoolExecutor] = None
+_render_flight = get_singleflight("render")
+_last_prune = 0.0
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=RENDER_WORKERS, initializer=_init_worker)
+    return _executor
+
+
+def prune_artifacts(max_age_seconds: float = ARTIFACT_TTL_SECONDS) -> int:
+    """Delete cached artifacts older than the test expiry; returns files removed"""
+    removed = 0
+    cutoff = time.time() - max_age_seconds
+    if not os.path.isdir(ARTIFACT_DIR):
+        return 0
+    for entry in os.scandir(ARTIFACT_DIR):
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.remove(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+async def render_artifact(fmt: str, paper: Dict[str, Any]) -> str:
+    """
+    Path to the rendered artifact for `paper` in `fmt`, rendering it if needed.
+    Cached by content hash; concurrent identical renders are coalesced.
+    """
+    global _last_prune
+    if fmt not in _RENDERERS:
+        raise ValueError(f"Unsupported output format: {fmt}")
+
+    key = artifact_key(fmt, paper)
+    path = os.path.join(ARTIFACT_DIR, f"{key}.{fmt}")
+    if os.path.exists(path):
+        return path
+
+    os.makedirs(ARTIFACT_DIR, exist_ok=True)
+    if time.monotonic() - _last_prune > ARTIFACT_TTL_SECONDS / 24:
+        _last_prune = time.monotonic()
+        await asyncio.to_thread(prune_artifacts)
+
+    async def render() -> str:
+        start = time.perf_counter()
+        if fmt in POOLED_FORMATS:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(_get_executor(), _render_to, fmt, paper, path)
+        else:
+            await asyncio.to_thread(_render_to, fmt, paper, path)
+        logger.info(f"Rendered {fmt} artifact {key[:12]} in {(time.perf_counter() - start) * 1000:.0f}ms")
+        return path
+
+    return await _render_flight.do(key, render)
+
+
+def shutdown():
+    """Stop the render worker processes (call from the app lifespan)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -5,22 +5,34 @@ NCERT RAG Chat API Endpoint
 Handles Q&A queries with NCERT context retrieval
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict, Any
 import logging
+import os
+import re
 import time
 from datetime import datetime
 
 # Internal imports
 from app_dependencies import get_rag_system
 from rag_system import RAGSystem
+from deadlines import ClientDisconnected, DeadlineExceeded, detached, iterate_with_deadline, run_with_deadline
+from singleflight import get_singleflight
+from sse import SSE_HEADERS, sse_event
+from health_monitor import get_health_monitor
 
 # Setup logging
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Budget for retrieval + generation; work is cancelled when it runs out
+CHAT_TIMEOUT_SECONDS = float(os.getenv("CHAT_TIMEOUT_SECONDS", 30))
+
+# Identical questions asked at the same time share one retrieval + LLM run
+chat_flight = get_singleflight("chat")
+
 # ============== REQUEST/RESPONSE MODELS ==============
 
 class ChatRequest(BaseModel):
@@ -187,6 +199,27 @@ def enhance_query_for_ncert(
     
     return question
 
+def normalize_question(question: str) -> str:
+    """
+    Normalize a question for request coalescing
+    
+    Lowercases, collapses whitespace and drops trailing punctuation so that
+    trivially different spellings of the same question share a result.
+    """
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip("?.! ")
+
+def coalescing_key(request: "ChatRequest") -> tuple:
+    """Key under which concurrent identical chat requests are coalesced"""
+    return (
+        normalize_question(request.question),
+        (request.subject or "").lower(),
+        request.class_num,
+        (request.chapter or "").lower(),
+        request.language,
+        request.top_k,
+    )
+
 def calculate_confidence(sources: List[Dict]) -> float:
     """
     Calculate overall confidence based on source similarities
@@ -212,6 +245,32 @@ def calculate_confidence(sources: List[Dict]) -> float:
     
     return min(weighted_sum / total_weight, 1.0) if total_weight > 0 else 0.0
 
+def process_sources(sources: List[Dict]) -> List[SourceResponse]:
+    """
+    Convert raw RAG sources to response models with position-based relevance
+    
+    Args:
+        sources: Sources as returned by the RAG system
+    
+    Returns:
+        List of SourceResponse
+    """
+    processed = []
+    for i, source in enumerate(sources):
+        # Calculate relevance score (normalized position-based)
+        relevance = 1.0 - (i * 0.1)  # Top results are more relevant
+        
+        processed.append(
+            SourceResponse(
+                id=source.get("id"),
+                content=source.get("content", ""),
+                metadata=source.get("metadata", {}),
+                similarity=source.get("similarity", 0.0),
+                relevance_score=max(min(relevance, 1.0), 0.0)
+            )
+        )
+    return processed
+
 # ============== API ENDPOINT ==============
 
 @router.post(
@@ -233,13 +292,18 @@ def calculate_confidence(sources: List[Dict]) -> float:
 )
 async def chat_query(
     request: ChatRequest,
+    http_request: Request,
     rag: RAGSystem = Depends(get_rag_system)
 ) -> JSONResponse:
     """
     Query NCERT content using RAG
     
+    Retrieval and generation run under a CHAT_TIMEOUT_SECONDS deadline and are
+    cancelled (DB statements and the LLM call) on timeout or client disconnect.
+    
     Args:
         request: ChatRequest with question and filters
+        http_request: Raw request, polled for client disconnect
         rag: RAGSystem instance (dependency injected)
     
     Returns:
@@ -265,29 +329,24 @@ async def chat_query(
         
         logger.debug(f"Enhanced query: {enhanced_query}")
         
-        # Step 2: Get RAG response (with timeout protection)
-        rag.top_k = request.top_k  # Update RAG config
-        
-        result = await rag.query(enhanced_query)
+        # Step 2: Get RAG response (with deadline + disconnect cancellation).
+        # Concurrent identical questions wait on the first in-flight run; the
+        # shared run is cancelled only when every waiting request has gone.
+        result = await run_with_deadline(
+            chat_flight.do(
+                coalescing_key(request),
+                lambda: detached(rag.query(enhanced_query, limit=request.top_k))
+            ),
+            CHAT_TIMEOUT_SECONDS,
+            http_request
+        )
         
         # Step 3: Process sources
         processed_sources = []
         warnings = []
         
         if request.include_sources:
-            for i, source in enumerate(result.get("sources", [])):
-                # Calculate relevance score (normalized position-based)
-                relevance = 1.0 - (i * 0.1)  # Top results are more relevant
-                
-                processed_sources.append(
-                    SourceResponse(
-                        id=source.get("id"),
-                        content=source.get("content", ""),
-                        metadata=source.get("metadata", {}),
-                        similarity=source.get("similarity", 0.0),
-                        relevance_score=min(relevance, 1.0)
-                    )
-                )
+            processed_sources = process_sources(result.get("sources", []))
         
         # Step 4: Calculate confidence
         confidence = calculate_confidence(result.get("sources", []))
@@ -315,6 +374,26 @@ async def chat_query(
         
         return response
         
+    except ClientDisconnected:
+        # Nobody is waiting for the answer; in-flight work was already cancelled
+        logger.info(f"Client disconnected - ID: {request_id}, work cancelled")
+        return JSONResponse(
+            status_code=499,
+            content={"error": "CLIENT_DISCONNECTED", "request_id": request_id}
+        )
+        
+    except DeadlineExceeded as e:
+        logger.warning(f"Deadline exceeded - ID: {request_id}, Error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail={
+                "error": "DEADLINE_EXCEEDED",
+                "message": f"Query did not complete within {CHAT_TIMEOUT_SECONDS:.0f}s",
+                "request_id": request_id,
+                "hint": "Try a narrower question or fewer chunks (top_k)"
+            }
+        )
+        
     except ValueError as e:
         # Validation error
         logger.warning(f"Validation error - ID: {request_id}, Error: {str(e)}")
@@ -352,6 +431,83 @@ async def chat_query(
             }
         )
 
+@router.post(
+    "/chat/stream",
+    summary="Query NCERT Content (streaming)",
+    description="""
+    Streaming variant of `/chat` using Server-Sent Events.
+    
+    Events, in order:
+    1. `sources` - retrieved NCERT sources (sent as soon as retrieval finishes)
+    2. `token` - answer text, one event per generated piece
+    3. `done` - confidence, timings, chunk ids and warnings
+    
+    On failure a single `error` event is sent instead of the remaining events.
+    """
+)
+async def chat_stream(
+    request: ChatRequest,
+    rag: RAGSystem = Depends(get_rag_system)
+) -> StreamingResponse:
+    """
+    Stream an NCERT answer as SSE
+    
+    Time to first byte is retrieval time; the answer follows token by token.
+    The stream runs under the same CHAT_TIMEOUT_SECONDS deadline as /chat,
+    and a client disconnect cancels the in-flight LLM request.
+    """
+    request_id = f"chat_{int(datetime.utcnow().timestamp())}_{hash(request.question) % 10000}"
+    logger.info(f"Chat stream request received - ID: {request_id}, Question: {request.question[:50]}...")
+    
+    enhanced_query = enhance_query_for_ncert(
+        request.question,
+        request.subject,
+        request.class_num,
+        request.chapter
+    )
+    
+    async def events():
+        confidence = 0.0
+        try:
+            async for event, data in iterate_with_deadline(
+                rag.query_stream(enhanced_query, limit=request.top_k),
+                CHAT_TIMEOUT_SECONDS
+            ):
+                if event == "sources":
+                    confidence = calculate_confidence(data["sources"])
+                    sources = process_sources(data["sources"]) if request.include_sources else []
+                    data = {
+                        "sources": [source.dict() for source in sources],
+                        "chunks_retrieved": data["chunks_retrieved"],
+                        "request_id": request_id
+                    }
+                elif event == "done":
+                    data.update(
+                        confidence=confidence,
+                        request_id=request_id,
+                        warnings=["Low confidence answer - consider rephrasing question"] if confidence < 0.3 else []
+                    )
+                    logger.info(f"Chat stream completed - ID: {request_id}, Time: {data['timings']['total_ms']}ms")
+                
+                yield sse_event(event, data)
+                
+        except DeadlineExceeded as e:
+            logger.warning(f"Deadline exceeded - ID: {request_id}, Error: {str(e)}")
+            yield sse_event("error", {
+                "error": "DEADLINE_EXCEEDED",
+                "message": f"Query did not complete within {CHAT_TIMEOUT_SECONDS:.0f}s",
+                "request_id": request_id
+            })
+        except Exception as e:
+            logger.error(f"Unexpected stream error - ID: {request_id}, Error: {str(e)}", exc_info=True)
+            yield sse_event("error", {
+                "error": "INTERNAL_SERVER_ERROR",
+                "message": "An unexpected error occurred",
+                "request_id": request_id
+            })
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # ============== HEALTH CHECK ENDPOINT ==============
 
 @router.get(
@@ -359,35 +515,32 @@ async def chat_query(
     summary="Chat Endpoint Health Check",
     description="Check if chat endpoint is operational"
 )
-async def chat_health_check(
-    rag: RAGSystem = Depends(get_rag_system)
-) -> Dict[str, Any]:
+async def chat_health_check() -> Dict[str, Any]:
     """
     Health check for chat endpoint
     
+    Reads the background health monitor's cached snapshot instead of running
+    a test query, so probing the endpoint costs no retrieval or LLM calls.
+    
     Returns:
         Dictionary with health status and component checks
     """
-    health_status = {
-        "status": "healthy",
+    snapshot = get_health_monitor().snapshot()
+    checks = snapshot["checks"]
+    
+    def component(name: str) -> str:
+        result = checks.get(name)
+        if result is None:
+            return "unknown"
+        return "operational" if result["status"] == "healthy" else "degraded"
+    
+    return {
+        "status": snapshot["status"],
         "timestamp": datetime.utcnow().isoformat(),
+        "checked_at": snapshot["checked_at"],
         "components": {
-            "rag_system": "operational",
-            "vector_database": "operational",
-            "llm_service": "operational"
+            "rag_system": "operational" if snapshot["status"] == "healthy" else "degraded",
+            "vector_database": component("database"),
+            "llm_service": component("openai")
         }
     }
-    
-    try:
-        # Quick test query to verify system works
-        test_result = await rag.query("What is science?")
-        health_status["test_query"] = {
-            "success": True,
-            "chunks_retrieved": test_result.get("chunks_retrieved", 0)
-        }
-    except Exception as e:
-        health_status["status"] = "degraded"
-        health_status["components"]["rag_system"] = "degraded"
-        health_status["error"] = str(e)
-    
-    return health_status
\ No newline at end of file
@@ -5,10 +5,10 @@ Test Generation API Endpoint
 Generates NCERT-aligned tests using RAG + LLM
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, BackgroundTasks
 from fastapi.responses import JSONResponse, StreamingResponse, FileResponse
-from pydantic import BaseModel, Field, validator, conint, confloat
-from typing import List, Optional, Dict, Any, Literal, Union
+from pydantic import BaseModel, Field, validator, conint, confloat, conlist
+from typing import List, Optional, Dict, Any, Literal, Union, Callable, Awaitable, Sequence, Tuple
 import json
 import uuid
 import logging
@@ -21,6 +21,24 @@ import os
 # Internal imports
 from app_dependencies import get_rag_system
 from rag_system import RAGSystem
+from question_generator import CONTEXT_CHAR_LIMIT, QuestionGenerationError, QuestionGenerator, QuestionSpec
+from db_client import get_database_client
+from jobs import TERMINAL_STATUSES, get_job_pool
+from sse import SSE_HEADERS, sse_event
+from test_store import get_test_store
+from paper_formatter import format_paper_text, iter_paper_text
+import renderers
+import jobs
+import paper_variants
+import grading
+from question_similarity import SimilarityIndex, find_duplicates
+import provenance
+import context_allocator
+from corpus_scope import class_number
+from context_cache import context_cache, normalize_chapters, normalize_text, scope_version
+from idempotency import COMPLETED, get_idempotency_store, payload_hash
+from singleflight import get_singleflight
+import question_bank
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -55,6 +73,10 @@ class Language(str, Enum):
     ENGLISH = "english"
     HINDI = "hindi"
 
+class ContextMode(str, Enum):
+    CHUNKS = "chunks"    # raw NCERT chunks per bucket, no LLM pass
+    SUMMARY = "summary"  # RAG answer used as context (one extra LLM call)
+
 class OutputFormat(str, Enum):
     PDF = "pdf"
     DOCX = "docx"
@@ -207,6 +229,11 @@ class TestGenerationRequest(BaseModel):
         description="Number of chunks to retrieve via RAG"
     )
     
+    contextMode: ContextMode = Field(
+        default=ContextMode.CHUNKS,
+        description="'chunks': raw NCERT chunks per bucket; 'summary': LLM-summarised RAG answer"
+    )
+    
     # Test Configuration
     qCount: Optional[conint(ge=1, le=100)] = Field(
         default=10,
@@ -275,6 +302,16 @@ class TestGenerationRequest(BaseModel):
         description="Shuffle MCQ options"
     )
     
+    variants: conint(ge=1, le=10) = Field(
+        default=1,
+        description="Number of paper sets (A, B, C...) derived from one generation pass"
+    )
+    
+    variantSeed: Optional[int] = Field(
+        default=None,
+        description="Seed for deriving variants (defaults to one derived from the request ID)"
+    )
+    
     timeLimit: Optional[conint(ge=5, le=180)] = Field(
         default=None,
         description="Time limit in minutes"
@@ -319,6 +356,37 @@ class TestGenerationRequest(BaseModel):
                 values['qCount'] = total_questions
         return v
 
+class RegenerateRequest(BaseModel):
+    """Questions of a stored test to replace (nothing selected = every bucket)"""
+    
+    questionIds: Optional[List[str]] = Field(
+        default=None,
+        description="Question IDs to replace, e.g. [\"Q3\", \"Q7\"]"
+    )
+    
+    buckets: Optional[List[conint(ge=1)]] = Field(
+        default=None,
+        description="Buckets to regenerate entirely, numbered from 1 in request order"
+    )
+
+class BulkGenerationRequest(BaseModel):
+    """Many papers in one call (e.g. every section of a school)"""
+    
+    bulkId: Optional[str] = Field(
+        default=None,
+        description="Client ID for the bulk run (also the job ID)"
+    )
+    
+    userId: Optional[str] = Field(
+        default=None,
+        description="Admin submitting the run"
+    )
+    
+    requests: conlist(TestGenerationRequest, min_items=1, max_items=500) = Field(
+        ...,
+        description="Papers to generate; papers sharing a syllabus scope share retrieval"
+    )
+
 # ============== RESPONSE MODELS ==============
 
 class QuestionModel(BaseModel):
@@ -354,6 +422,10 @@ class QuestionModel(BaseModel):
         default=None,
         description="NCERT source text snippet"
     )
+    sourceChunkIds: Optional[List[str]] = Field(
+        default=None,
+        description="IDs of the NCERT chunks the question was derived from"
+    )
 
 class TestGenerationResponse(BaseModel):
     """Response model for test generation"""
@@ -409,25 +481,164 @@ class TestGenerationResponse(BaseModel):
         default=None,
         description="Expiry timestamp for generated files"
     )
+    variants: Optional[List[Dict[str, Any]]] = Field(
+        default=None,
+        description="Paper sets (when variants > 1): set, testId, URLs and answer key"
+    )
 
 # ============== BUSINESS LOGIC ==============
 
+def _pack_chunks(chunks: List[Dict], char_limit: int = CONTEXT_CHAR_LIMIT) -> str:
+    """Chunks as '[chunk <id>] (<chapter>)' blocks, best first, up to char_limit"""
+    blocks, used = [], 0
+    for chunk in chunks:
+        block = f"[chunk {chunk['id']}] ({chunk.get('chapter') or 'NCERT'})\n{chunk['content'].strip()}"
+        if blocks and used + len(block) > char_limit:
+            break
+        blocks.append(block)
+        used += len(block) + 2
+    return "\n\n".join(blocks)
+
+def _chunk_sources(chunks: List[Dict]) -> List[Dict]:
+    """Retrieved chunks in the source-document shape rag.query() returns"""
+    return [
+        {
+            "id": str(chunk["id"]),
+            "content": chunk["content"],
+            "metadata": {
+                "class_grade": chunk.get("class_grade"),
+                "subject": chunk.get("subject"),
+                "chapter": chunk.get("chapter"),
+            },
+            "similarity": float(chunk.get("similarity", 0.0)),
+        }
+        for chunk in chunks
+    ]
+
+# Question buckets generated in parallel per test, and attempts per bucket
+BUCKET_CONCURRENCY = int(os.getenv("TEST_GEN_BUCKET_CONCURRENCY", 4))
+BUCKET_MAX_ATTEMPTS = int(os.getenv("TEST_GEN_BUCKET_MAX_ATTEMPTS", 3))
+
+# Serve questions from the precomputed bank before generating live
+USE_QUESTION_BANK = os.getenv("TEST_GEN_USE_QUESTION_BANK", "true").lower() == "true"
+
+# Near-duplicate check against the paper itself and the teacher's recent papers
+DUPLICATE_CHECK = os.getenv("TEST_GEN_DUPLICATE_CHECK", "true").lower() == "true"
+DUPLICATE_RECENT_PAPERS = int(os.getenv("TEST_GEN_DUPLICATE_RECENT_PAPERS", 10))
+DUPLICATE_MAX_ROUNDS = int(os.getenv("TEST_GEN_DUPLICATE_MAX_ROUNDS", 2))
+
+def _bucket_owner(buckets: List[TestBucket]) -> List[int]:
+    """Bucket index of each paper position (questions are in bucket order)"""
+    return [idx for idx, bucket in enumerate(buckets) for _ in range(bucket.count)]
+
 class TestGenerationService:
     """Service layer for test generation logic"""
     
     def __init__(self, rag_system: RAGSystem):
         self.rag = rag_system
-        self.test_storage = {}  # In production, use Redis/Database
+        self.generator = QuestionGenerator(getattr(rag_system, "current_model", None))
+        self.bank_served = 0
+        # Per-bucket context (chunks mode); buckets not listed use the paper context
+        self.bucket_contexts: Dict[int, str] = {}
+        self.context_cached = False
+        self.duplicates_replaced = 0
+        self.duplicates_remaining: List[str] = []
+        self.provenance_linked = 0
         
     async def generate_ncert_context(
         self, 
         request: TestGenerationRequest
     ) -> tuple[str, List[Dict]]:
-        """Generate NCERT context using RAG"""
+        """
+        Generate NCERT context using RAG
+        
+        Context is cached per normalized syllabus scope and retrieval
+        parameters (context_cache.py); a repeat paper for the same scope skips
+        retrieval until chunks in that scope change.
+        """
+        
+        if request.ragContext:
+            return request.ragContext, []
         
         if not request.useRAG or not request.useNCERT:
             return "", []
         
+        key, chapters = self._context_cache_key(request)
+        version = await self._scope_version(request, chapters)
+        if version is not None:
+            cached = context_cache.get(key, version)
+            if cached is not None:
+                context, sources, bucket_contexts = cached
+                self.bucket_contexts = dict(bucket_contexts)
+                self.context_cached = True
+                logger.info(f"Reusing cached NCERT context ({len(sources)} sources)")
+                return context, sources
+        
+        if request.contextMode == ContextMode.CHUNKS:
+            context, sources = await self.retrieve_chunk_context(request)
+        else:
+            context, sources = await self._summary_context(request)
+        
+        # Version was read before retrieving: if the scope changed meanwhile,
+        # the entry is already stale and will be refreshed on next use
+        if version is not None and context:
+            context_cache.put(key, version, (context, sources, dict(self.bucket_contexts)))
+        
+        return context, sources
+    
+    def _context_cache_key(self, request: TestGenerationRequest) -> Tuple[Tuple, Optional[Tuple[str, ...]]]:
+        """
+        (cache key, chapters the context depends on). Chapters is None when
+        any part of the paper draws on the whole subject.
+        """
+        if request.contextMode == ContextMode.CHUNKS:
+            # Bucket weights are part of the plan: they decide how chunks are split
+            plan = tuple(
+                (*self._retrieval_scope(request, bucket), bucket.count * max(bucket.marks, 1))
+                for bucket in self._resolve_buckets(request)
+            )
+            chapter_sets = [chapters for _, chapters, _ in plan]
+        else:
+            plan = (normalize_text(self._summary_query(request)),)
+            chapter_sets = [normalize_chapters(request.chapters)]
+        
+        chapters = None
+        if all(chapter_sets):
+            chapters = tuple(sorted({chapter for chapter_set in chapter_sets for chapter in chapter_set}))
+        
+        key = (
+            str(request.ncertClass or request.classNum),
+            request.ncertSubject or request.subject,
+            request.contextMode.value,
+            request.ragTopK,
+            request.ragThreshold,
+            plan,
+        )
+        return key, chapters
+    
+    async def _scope_version(
+        self,
+        request: TestGenerationRequest,
+        chapters: Optional[Tuple[str, ...]]
+    ) -> Optional[Tuple[int, str]]:
+        """Corpus version of the scope, or None (don't cache) if it can't be read"""
+        db = get_database_client()
+        if not await db.connect():
+            return None
+        try:
+            async with db.acquire() as conn:
+                return await scope_version(
+                    conn,
+                    str(request.ncertClass or request.classNum),
+                    request.ncertSubject or request.subject,
+                    chapters
+                )
+        except Exception as e:
+            logger.warning(f"Context cache bypassed, scope version unavailable: {e}")
+            return None
+    
+    def _summary_query(self, request: TestGenerationRequest) -> str:
+        """RAG query for the 'summary' context mode"""
         # Build comprehensive query
         query_parts = []
         
@@ -457,7 +668,7 @@ class TestGenerationService:
         # Build final query
         base_query = f"Generate test questions for: {' | '.join(query_parts)}"
         
-        detailed_query = f"""
+        return f"""
         {base_query}
         
         Requirements:
@@ -470,6 +681,10 @@ class TestGenerationService:
         
         Provide comprehensive content suitable for generating a complete test paper.
         """
+    
+    async def _summary_context(self, request: TestGenerationRequest) -> tuple[str, List[Dict]]:
+        """Context from the RAG system's LLM answer (one extra LLM call)"""
+        detailed_query = self._summary_query(request)
         
         # Get RAG context
         logger.info(f"Fetching NCERT context for test generation")
@@ -482,144 +697,685 @@ class TestGenerationService:
         
         return context, sources
     
-    async def generate_questions(
-        self, 
-        request: TestGenerationRequest, 
-        ncert_context: str
-    ) -> List[QuestionModel]:
-        """Generate structured questions using LLM"""
+    def _retrieval_scope(self, request: TestGenerationRequest, bucket: TestBucket) -> Tuple[str, Tuple[str, ...]]:
+        """(keyword query, chapters) a bucket's context is retrieved for"""
+        chapters = normalize_chapters(bucket.chapters or bucket.ncertChapters or request.chapters or request.ncertChapters)
+        if request.ragQuery:
+            query = request.ragQuery
+        elif bucket.topics:
+            query = ", ".join(bucket.topics)
+        else:
+            query = request.topic or ", ".join(chapters) or (request.ncertSubject or request.subject)
+        # Keyword search is case-insensitive, so the query key can be too
+        return normalize_text(query).lower(), chapters
+    
+    async def _retrieve_scope(
+        self,
+        request: TestGenerationRequest,
+        query: str,
+        chapters: Tuple[str, ...]
+    ) -> List[Dict]:
+        """
+        Top ragTopK chunks for one scope, straight from the index. Chapters
+        are searched concurrently, ragTopK split between them. Chunks below
+        ragThreshold are kept only if nothing clears it.
+        """
+        filters = {
+            "class_grade": class_number(request.ncertClass or request.classNum),
+            "subject": request.ncertSubject or request.subject,
+        }
+        if chapters:
+            per_chapter = max(1, -(-request.ragTopK // len(chapters)))
+            results = await asyncio.gather(*(
+                self.rag.retrieve_chunks(query, limit=per_chapter, filters={**filters, "chapter": chapter})
+                for chapter in chapters
+            ))
+        else:
+            results = [await self.rag.retrieve_chunks(query, limit=request.ragTopK, filters=filters)]
         
-        # TODO: Integrate with actual LLM service
-        # This is a placeholder implementation
+        chunks, seen = [], set()
+        for chunk in (chunk for result in results for chunk in result):
+            if chunk["id"] not in seen:
+                seen.add(chunk["id"])
+                chunks.append(chunk)
         
-        questions = []
+        relevant = [chunk for chunk in chunks if chunk.get("similarity", 0.0) >= request.ragThreshold]
+        chunks = relevant or chunks
+        chunks.sort(key=lambda chunk: chunk.get("similarity", 0.0), reverse=True)
+        return chunks[:request.ragTopK]
+    
+    async def retrieve_chunk_context(self, request: TestGenerationRequest) -> tuple[str, List[Dict]]:
+        """
+        Raw-chunk context: retrieve NCERT chunks per bucket scope and pack them
+        (with their ids) as each bucket's context - no intermediate LLM call.
+        Buckets sharing a scope share one retrieval; the retrieved chunks are
+        then split between buckets (context_allocator.py) so each bucket's
+        prompt carries its own, smaller set of passages.
+        """
+        buckets = self._resolve_buckets(request)
+        scopes = [self._retrieval_scope(request, bucket) for bucket in buckets]
+        unique_scopes = list(dict.fromkeys(scopes))
+        
+        retrieved = await asyncio.gather(*(
+            self._retrieve_scope(request, query, chapters) for query, chapters in unique_scopes
+        ))
+        by_scope = dict(zip(unique_scopes, retrieved))
+        
+        # Disjoint chunk subsets per bucket, sized by count x marks
+        allocated = context_allocator.allocate(
+            [by_scope[scope] for scope in scopes],
+            [bucket.count * max(bucket.marks, 1) for bucket in buckets]
+        )
+        self.bucket_contexts = {idx: _pack_chunks(chunks) for idx, chunks in enumerate(allocated)}
+        
+        all_chunks, seen = [], set()
+        for chunk in (chunk for chunks in retrieved for chunk in chunks):
+            if chunk["id"] not in seen:
+                seen.add(chunk["id"])
+                all_chunks.append(chunk)
         
-        # Determine question distribution
+        logger.info(f"Retrieved {len(all_chunks)} NCERT chunks for {len(unique_scopes)} scopes (no LLM context pass)")
+        return _pack_chunks(all_chunks), _chunk_sources(all_chunks)
+    
+    @staticmethod
+    def _resolve_buckets(request: TestGenerationRequest) -> List[TestBucket]:
+        """Question buckets for the request (a single MCQ bucket by default)"""
         if request.buckets:
-            buckets = request.buckets
-        else:
-            # Create default bucket
-            buckets = [TestBucket(
-                type=QuestionType.MCQ,
-                difficulty=request.difficulty,
-                count=request.qCount or 10,
-                marks=1
-            )]
-        
-        # Generate questions for each bucket
-        question_counter = 1
-        for bucket_idx, bucket in enumerate(buckets):
-            for q_idx in range(bucket.count):
-                question_id = f"Q{question_counter}"
-                
-                # Generate question based on type
-                if bucket.type == QuestionType.MCQ:
-                    question_text = f"Sample MCQ question {question_counter} about {request.subject}"
-                    options = ["Option A", "Option B", "Option C", "Option D"]
-                    correct_answer = "Option A"
-                elif bucket.type == QuestionType.SHORT:
-                    question_text = f"Sample short answer question {question_counter} about {request.subject}"
-                    options = None
-                    correct_answer = "Sample short answer"
-                else:
-                    question_text = f"Sample {bucket.type.value} question {question_counter}"
-                    options = None
-                    correct_answer = "Sample answer"
-                
-                questions.append(QuestionModel(
-                    id=question_id,
-                    type=bucket.type,
-                    question=question_text,
-                    options=options,
-                    correctAnswer=correct_answer,
-                    explanation="This is a sample explanation.",
-                    marks=bucket.marks,
-                    difficulty=bucket.difficulty,
-                    cognitiveLevel=bucket.cognitive or CognitiveLevel.UNDERSTAND,
-                    chapter=request.chapters[0] if request.chapters else None,
-                    pageReference="Page 45",
-                    ncertSource="Based on NCERT Chapter 3, Example 2"
-                ))
-                
-                question_counter += 1
+            return request.buckets
+        
+        return [TestBucket(
+            type=QuestionType.MCQ,
+            difficulty=request.difficulty,
+            count=request.qCount or 10,
+            marks=1
+        )]
+    
+    def _placeholder_bucket(
+        self,
+        request: TestGenerationRequest,
+        bucket: TestBucket,
+        first_number: int
+    ) -> List[QuestionModel]:
+        """Placeholder questions, used when no LLM model is configured"""
+        
+        questions = []
+        
+        for q_idx in range(bucket.count):
+            question_number = first_number + q_idx
+            question_id = f"Q{question_number}"
+            
+            # Generate question based on type
+            if bucket.type == QuestionType.MCQ:
+                question_text = f"Sample MCQ question {question_number} about {request.subject}"
+                options = ["Option A", "Option B", "Option C", "Option D"]
+                correct_answer = "Option A"
+            elif bucket.type == QuestionType.SHORT:
+                question_text = f"Sample short answer question {question_number} about {request.subject}"
+                options = None
+                correct_answer = "Sample short answer"
+            else:
+                question_text = f"Sample {bucket.type.value} question {question_number}"
+                options = None
+                correct_answer = "Sample answer"
+            
+            questions.append(QuestionModel(
+                id=question_id,
+                type=bucket.type,
+                question=question_text,
+                options=options,
+                correctAnswer=correct_answer,
+                explanation="This is a sample explanation.",
+                marks=bucket.marks,
+                difficulty=bucket.difficulty,
+                cognitiveLevel=bucket.cognitive or CognitiveLevel.UNDERSTAND,
+                chapter=request.chapters[0] if request.chapters else None
+            ))
         
         return questions
     
-    def format_test_content(
-        self, 
-        questions: List[QuestionModel], 
-        request: TestGenerationRequest
-    ) -> str:
-        """Format questions into test paper text"""
-        
-        # Header
-        test_content = f"""
-        {'='*60}
-        TEST PAPER
-        {'='*60}
-        
-        Subject: {request.subject}
-        Class: {request.classNum}
-        Board: {request.board}
-        {'Topic: ' + request.topic if request.topic else ''}
-        {'Chapters: ' + ', '.join(request.chapters) if request.chapters else ''}
-        
-        Time: {request.timeLimit} minutes (if specified)
-        Maximum Marks: {sum(q.marks for q in questions)}
-        
-        General Instructions:
-        1. All questions are compulsory.
-        2. Read each question carefully.
-        3. Marks are indicated against each question.
-        4. Write answers neatly and legibly.
+    async def _bank_questions(
+        self,
+        spec: QuestionSpec,
+        count: int,
+        chapters: Optional[List[str]]
+    ) -> List[Dict[str, Any]]:
+        """Up to `count` questions for this cell from the question bank"""
+        if not USE_QUESTION_BANK:
+            return []
+        
+        db = get_database_client()
+        if not await db.connect():
+            return []
+        
+        try:
+            async with db.acquire() as conn:
+                return await question_bank.fetch_cell(conn, spec, count, chapters)
+        except Exception as e:
+            logger.warning(f"Question bank lookup failed, generating live: {e}")
+            return []
+    
+    async def _generate_bucket(
+        self,
+        request: TestGenerationRequest,
+        bucket: TestBucket,
+        first_number: int,
+        ncert_context: str,
+        avoid: Sequence[str] = ()
+    ) -> List[QuestionModel]:
         """
+        Generate the questions for one bucket
         
-        if request.includeInstructions:
-            test_content += """
-            
-            Section-wise Instructions:
-            - Section A: Multiple Choice Questions (1 mark each)
-            - Section B: Short Answer Questions (2 marks each)
-            - Section C: Long Answer Questions (5 marks each)
-            """
-        
-        # Questions
-        test_content += "\n\n" + "="*60 + "\nQUESTIONS\n" + "="*60 + "\n"
-        
-        for i, question in enumerate(questions, 1):
-            test_content += f"\nQ{i}. [{question.type.upper()}] ({question.marks} mark{'s' if question.marks > 1 else ''})\n"
-            test_content += f"    {question.question}\n"
+        Buckets are independent: question numbers are fixed up front from
+        `first_number`, so buckets can be generated (and retried) in any order.
+        Questions come from the question bank first; only the shortfall is
+        generated live (N per LLM call, validated while streaming, only
+        invalid ones re-requested). Question texts in `avoid` are skipped.
+        """
+        chapters = bucket.chapters or bucket.ncertChapters or request.chapters or request.ncertChapters
+        spec = QuestionSpec(
+            subject=request.ncertSubject or request.subject,
+            class_num=request.ncertClass or request.classNum,
+            type=bucket.type.value,
+            difficulty=bucket.difficulty.value,
+            cognitive=(bucket.cognitive or CognitiveLevel.UNDERSTAND).value,
+            chapter=", ".join(chapters) if chapters else None,
+            topic=", ".join(bucket.topics) if bucket.topics else request.topic,
+            language=request.language.value
+        )
+        
+        # Topic-focused buckets are too specific for the bank's chapter cells
+        banked = [] if spec.topic else await self._bank_questions(spec, bucket.count + len(avoid), chapters)
+        if avoid:
+            avoided = {normalize_text(question).lower() for question in avoid}
+            banked = [row for row in banked if normalize_text(row["question"]).lower() not in avoided]
+        banked = banked[:bucket.count]
+        question_bank.bank_stats.record(bucket.count, len(banked))
+        self.bank_served += len(banked)
+        
+        items = [
+            {
+                "question": row["question"],
+                "options": row["options"],
+                "correctAnswer": row["correct_answer"],
+                "explanation": row["explanation"],
+                "chapter": row["chapter"] or None,
+                "pageReference": row["page_reference"],
+                "ncertSource": row["ncert_source"],
+            }
+            for row in banked
+        ]
+        
+        remaining = bucket.count - len(items)
+        if remaining > 0:
+            if not self.generator.available:
+                placeholders = self._placeholder_bucket(request, bucket, first_number + len(items))
+                return self._bucket_models(bucket, first_number, items) + placeholders[:remaining]
             
-            if question.options:
-                for opt_idx, option in enumerate(question.options):
-                    test_content += f"    ({chr(65+opt_idx)}) {option}\n"
+            generated = await self.generator.generate(spec, remaining, ncert_context, avoid)
+            items.extend(
+                {
+                    "question": question.question,
+                    "options": question.options,
+                    "correctAnswer": question.correctAnswer,
+                    "explanation": question.explanation,
+                    "chapter": chapters[0] if chapters else None,
+                    "pageReference": question.pageReference,
+                    "ncertSource": question.ncertSource,
+                    "sourceChunkIds": question.sourceChunkIds,
+                }
+                for question in generated
+            )
+        
+        return self._bucket_models(bucket, first_number, items)
+    
+    def _bucket_models(
+        self,
+        bucket: TestBucket,
+        first_number: int,
+        items: List[Dict[str, Any]]
+    ) -> List[QuestionModel]:
+        """Number bucket items from `first_number` and wrap them as QuestionModels"""
+        return [
+            QuestionModel(
+                id=f"Q{first_number + i}",
+                type=bucket.type,
+                question=item["question"],
+                options=item["options"],
+                correctAnswer=item["correctAnswer"],
+                explanation=item["explanation"],
+                marks=bucket.marks,
+                difficulty=bucket.difficulty,
+                cognitiveLevel=bucket.cognitive or CognitiveLevel.UNDERSTAND,
+                chapter=item["chapter"],
+                pageReference=item["pageReference"],
+                ncertSource=item["ncertSource"],
+                sourceChunkIds=item.get("sourceChunkIds")
+            )
+            for i, item in enumerate(items)
+        ]
+    
+    async def generate_questions(
+        self, 
+        request: TestGenerationRequest, 
+        ncert_context: str,
+        on_bucket_done: Optional[Callable[[int, int], Awaitable[None]]] = None
+    ) -> List[QuestionModel]:
+        """
+        Generate structured questions using LLM
+        
+        Buckets are generated concurrently (at most BUCKET_CONCURRENCY at a
+        time). Buckets that fail are retried on their own, up to
+        BUCKET_MAX_ATTEMPTS; successful buckets are never regenerated. The
+        merged list is always in bucket order, whatever order buckets finish in.
+        `on_bucket_done(done, total)` is awaited as each bucket completes.
+        """
+        buckets = self._resolve_buckets(request)
+        
+        # Fixed numbering per bucket: Q1..Qn follows bucket order
+        first_numbers = []
+        next_number = 1
+        for bucket in buckets:
+            first_numbers.append(next_number)
+            next_number += bucket.count
+        
+        semaphore = asyncio.Semaphore(BUCKET_CONCURRENCY)
+        completed = 0
+        
+        async def run_bucket(idx: int) -> List[QuestionModel]:
+            nonlocal completed
+            async with semaphore:
+                questions = await self._generate_bucket(
+                    request, buckets[idx], first_numbers[idx], self.bucket_contexts.get(idx, ncert_context)
+                )
+            completed += 1
+            if on_bucket_done:
+                await on_bucket_done(completed, len(buckets))
+            return questions
+        
+        results: Dict[int, List[QuestionModel]] = {}
+        pending = list(range(len(buckets)))
+        errors: Dict[int, BaseException] = {}
+        
+        for attempt in range(1, BUCKET_MAX_ATTEMPTS + 1):
+            outcomes = await asyncio.gather(
+                *(run_bucket(idx) for idx in pending),
+                return_exceptions=True
+            )
             
-            if request.includeAnswerKey:
-                test_content += f"    [Ans: {question.correctAnswer}]\n"
-                if question.explanation:
-                    test_content += f"    [Explanation: {question.explanation}]\n"
+            errors = {}
+            for idx, outcome in zip(pending, outcomes):
+                if isinstance(outcome, BaseException):
+                    errors[idx] = outcome
+                else:
+                    results[idx] = outcome
             
-            test_content += f"    [Difficulty: {question.difficulty.value.title()} | "
-            test_content += f"Cognitive: {question.cognitiveLevel.value.title()}]\n"
+            if not errors:
+                break
             
-            if question.chapter:
-                test_content += f"    [Chapter: {question.chapter} | Page: {question.pageReference}]\n"
+            pending = sorted(errors)
+            logger.warning(
+                f"Bucket generation failed (attempt {attempt}/{BUCKET_MAX_ATTEMPTS}) for buckets "
+                f"{[buckets[idx].type.value for idx in pending]}: "
+                f"{'; '.join(str(errors[idx]) for idx in pending)}"
+            )
+        
+        if errors:
+            failed = ", ".join(f"{buckets[idx].type.value} (#{idx + 1})" for idx in sorted(errors))
+            raise QuestionGenerationError(f"Failed to generate buckets after {BUCKET_MAX_ATTEMPTS} attempts: {failed}")
+        
+        questions = []
+        for idx in range(len(buckets)):
+            questions.extend(results[idx])
+        
+        return questions
+    
+    async def regenerate_questions(
+        self,
+        request: TestGenerationRequest,
+        ncert_context: str,
+        questions: List[Dict[str, Any]],
+        selected: Dict[int, List[int]],
+        avoid_extra: Sequence[str] = ()
+    ) -> List[QuestionModel]:
+        """
+        Replace selected questions of an existing paper, keeping the rest
+        
+        `selected` maps bucket index -> paper positions to replace. Each
+        bucket is asked for only as many questions as were selected from it
+        (one question = one small LLM call, or a bank hit); replacements take
+        over the old ids and positions. No new question repeats one already
+        on the paper, including those being replaced, or one in `avoid_extra`.
+        The generator prompt lists only the first of these, so they go in as
+        the replaced questions, then `avoid_extra` in the caller's order,
+        then the rest of the paper.
+        """
+        buckets = self._resolve_buckets(request)
+        replaced = sorted(position for positions in selected.values() for position in positions)
+        kept = sorted(set(range(len(questions))) - set(replaced))
+        avoid = (
+            [questions[position]["question"] for position in replaced]
+            + list(avoid_extra)
+            + [questions[position]["question"] for position in kept]
+        )
+        semaphore = asyncio.Semaphore(BUCKET_CONCURRENCY)
         
-        # Footer
-        test_content += f"""
+        async def run_bucket(idx: int, positions: List[int]) -> List[QuestionModel]:
+            bucket = buckets[idx].copy(update={"count": len(positions)})
+            context = self.bucket_contexts.get(idx, ncert_context)
+            async with semaphore:
+                return await self._generate_bucket(request, bucket, positions[0] + 1, context, avoid)
         
-        {'='*60}
-        END OF TEST
-        {'='*60}
+        replacements = await asyncio.gather(*(
+            run_bucket(idx, positions) for idx, positions in selected.items()
+        ))
         
-        Generated by: NCERT Test Generator
-        Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+        result = [QuestionModel.parse_obj(question) for question in questions]
+        for positions, new_questions in zip(selected.values(), replacements):
+            for position, question in zip(positions, new_questions):
+                result[position] = question.copy(update={"id": questions[position]["id"]})
+        return result
+    
+    async def remove_near_duplicates(
+        self,
+        request: TestGenerationRequest,
+        ncert_context: str,
+        questions: List[QuestionModel],
+        recent: SimilarityIndex
+    ) -> List[QuestionModel]:
         """
+        Replace questions that nearly repeat an earlier question on the paper
+        or one on the teacher's recent papers (question_similarity.py)
+        
+        All flagged questions are regenerated together per round - one
+        regenerate_questions() pass, buckets in parallel - for up to
+        DUPLICATE_MAX_ROUNDS rounds. Whatever is still flagged after that is
+        kept and listed in `duplicates_remaining`. The questions each flagged
+        one matched, then the recent questions closest to the flagged ones,
+        head the list the generator is told not to repeat.
+        """
+        if not DUPLICATE_CHECK or not self.generator.available:
+            return questions
+        
+        owner = _bucket_owner(self._resolve_buckets(request))
+        for round_number in range(DUPLICATE_MAX_ROUNDS + 1):
+            duplicates = find_duplicates([q.question for q in questions], recent)
+            flagged = [position for position, duplicate in enumerate(duplicates) if duplicate]
+            if not flagged or round_number == DUPLICATE_MAX_ROUNDS:
+                break
+            
+            logger.info(
+                f"Replacing {len(flagged)} near-duplicate questions (round {round_number + 1}): "
+                f"{[questions[position].id for position in flagged]}"
+            )
+            selected: Dict[int, List[int]] = {}
+            for position in flagged:
+                selected.setdefault(owner[position], []).append(position)
+            flagged_texts = [questions[position].question for position in flagged]
+            avoid = [duplicates[position]["match"] for position in flagged] + recent.closest(flagged_texts)
+            questions = await self.regenerate_questions(
+                request, ncert_context, [json.loads(q.json()) for q in questions], selected, avoid
+            )
+            self.duplicates_replaced += len(flagged)
+        
+        self.duplicates_remaining = [questions[position].id for position in flagged]
+        return questions
+    
+    async def resolve_provenance(
+        self,
+        request: TestGenerationRequest,
+        questions: List[QuestionModel]
+    ) -> List[QuestionModel]:
+        """Link questions to their cited NCERT chunks with one query for the whole paper (provenance.py)"""
+        if not any(q.sourceChunkIds for q in questions):
+            return questions
+        
+        db = get_database_client()
+        if not await db.connect():
+            return questions
         
-        return test_content
+        question_data = [json.loads(q.json()) for q in questions]
+        try:
+            async with db.acquire() as conn:
+                self.provenance_linked = await provenance.resolve(
+                    conn, question_data, str(request.ncertClass or request.classNum), request.ncertSubject or request.subject
+                )
+        except Exception as e:
+            logger.warning(f"Provenance lookup failed, keeping model-cited sources: {e}")
+            return questions
+        return [QuestionModel.parse_obj(q) for q in question_data]
+    
+    def format_test_content(
+        self, 
+        questions: List[QuestionModel], 
+        request: TestGenerationRequest
+    ) -> str:
+        """Format questions into test paper text (see paper_formatter.py)"""
+        return format_paper_text(_paper(json.loads(request.json()), [json.loads(q.json()) for q in questions]))
 
 # ============== API ENDPOINTS ==============
 
+async def run_test_generation(
+    request: TestGenerationRequest,
+    rag: RAGSystem,
+    request_id: str,
+    background_tasks: Optional[BackgroundTasks] = None,
+    progress: Optional[Callable[..., Awaitable[None]]] = None,
+    shared_context: Optional[Tuple[str, List[Dict], Dict[int, str]]] = None
+) -> TestGenerationResponse:
+    """
+    Full generation pipeline: context -> questions -> formatting -> files
+    
+    Shared by the synchronous endpoint and the job worker. `progress(stage,
+    percent, **details)` is awaited at each stage when given.
+    `shared_context` (context, sources, per-bucket contexts) replaces step 1;
+    bulk generation retrieves it once per syllabus scope.
+    """
+    start_time = time.time()
+    
+    async def report(stage: str, percent: int, **details):
+        if progress:
+            await progress(stage, percent, **details)
+    
+    # Initialize service
+    service = TestGenerationService(rag)
+    
+    # Step 1: Get NCERT context
+    await report("retrieving_context", 5)
+    if shared_context is not None:
+        ncert_context, sources, bucket_contexts = shared_context
+        service.bucket_contexts = dict(bucket_contexts)
+        service.context_cached = True
+    else:
+        ncert_context, sources = await service.generate_ncert_context(request)
+    
+    # Step 2: Generate questions
+    async def bucket_done(done: int, total: int):
+        await report("generating_questions", 15 + 70 * done // total, completedBuckets=done, totalBuckets=total)
+    
+    await report("generating_questions", 15)
+    recent = await _recent_questions(request.userId, request_id)
+    request_data = json.loads(request.json())
+    variant_sets = []
+    if request.variants > 1:
+        # One pooled pass, a little larger than the paper; sets are cut from it
+        buckets = service._resolve_buckets(request)
+        pooled = [bucket.copy(update={"count": paper_variants.pool_size(bucket.count, request.variants)}) for bucket in buckets]
+        pool_request = request.copy(update={"buckets": pooled, "qCount": sum(bucket.count for bucket in pooled)})
+        pool = await service.generate_questions(pool_request, ncert_context, on_bucket_done=bucket_done)
+        pool = await service.remove_near_duplicates(pool_request, ncert_context, pool, recent)
+        pool = await service.resolve_provenance(request, pool)
+        seed = request.variantSeed if request.variantSeed is not None else paper_variants.default_seed(request_id)
+        variant_sets = paper_variants.derive_variants(
+            [json.loads(q.json()) for q in pool],
+            [bucket.count for bucket in pooled],
+            [bucket.count for bucket in buckets],
+            request.variants,
+            seed,
+            request.shuffleQuestions,
+            request.shuffleOptions
+        )
+        question_data = variant_sets[0]
+        questions = [QuestionModel.parse_obj(q) for q in question_data]
+    else:
+        questions = await service.generate_questions(request, ncert_context, on_bucket_done=bucket_done)
+        questions = await service.remove_near_duplicates(request, ncert_context, questions, recent)
+        questions = await service.resolve_provenance(request, questions)
+        question_data = [json.loads(q.json()) for q in questions]
+    
+    # Step 3: Format test content
+    await report("formatting", 90)
+    paper = _paper(request_data, question_data)
+    test_content = format_paper_text(paper)
+    
+    # Step 4: Generate output files (async in background)
+    file_urls = await _generate_output_files(request_id, request.outputFormat.value, paper, background_tasks)
+    
+    # Step 5: Prepare metadata
+    metadata = {
+        "subject": request.subject,
+        "class": request.classNum,
+        "board": request.board,
+        "difficulty": request.difficulty.value,
+        "totalQuestions": len(questions),
+        "totalMarks": sum(q.marks for q in questions),
+        "questionTypes": list(set(q.type.value for q in questions)),
+        "ragUsed": request.useRAG,
+        "ncertBased": request.useNCERT,
+        "ragSourcesCount": len(sources),
+        "contextMode": request.contextMode.value,
+        "contextCached": service.context_cached,
+        "questionsFromBank": service.bank_served,
+        "duplicatesReplaced": service.duplicates_replaced,
+        "questionsWithProvenance": service.provenance_linked,
+        "language": request.language.value,
+        "generatedAt": datetime.utcnow().isoformat(),
+        "timeLimit": request.timeLimit,
+        "shuffled": request.shuffleQuestions
+    }
+    if variant_sets:
+        metadata.update({
+            "variants": len(variant_sets),
+            "variantSeed": seed,
+            "variantPoolSize": len(pool),
+            "variantSet": paper_variants.set_label(0)
+        })
+    
+    # Step 6: Prepare warnings
+    warnings = []
+    if len(sources) < 3 and request.useRAG:
+        warnings.append("Limited NCERT sources found - consider broadening topic")
+    if request.ncertWeight < 0.5:
+        warnings.append("Low NCERT weight - test may not be fully NCERT-aligned")
+    if service.duplicates_remaining:
+        warnings.append(
+            f"Questions {', '.join(service.duplicates_remaining)} closely resemble earlier questions "
+            f"and could not be replaced - consider regenerating them"
+        )
+    
+    # Step 7: Calculate processing time
+    processing_time = int((time.time() - start_time) * 1000)
+    
+    # Step 8: Prepare response
+    response = TestGenerationResponse(
+        success=True,
+        testId=request_id,
+        testContent=test_content,
+        questions=questions if request.outputFormat == OutputFormat.JSON else None,
+        pdfUrl=file_urls.get("pdf"),
+        docxUrl=file_urls.get("docx"),
+        csvUrl=file_urls.get("csv"),
+        jsonUrl=file_urls.get("json"),
+        metadata=metadata,
+        ragContext=ncert_context if request.useRAG else None,
+        sources=sources if request.useRAG else None,
+        processingTimeMs=processing_time,
+        requestId=request_id,
+        warnings=warnings,
+        expiresAt=(datetime.utcnow() + timedelta(hours=24)).isoformat()
+    )
+    
+    # Step 9: Persist so views/downloads never regenerate
+    if variant_sets:
+        await _save_variants(request, request_id, request_data, response, variant_sets, background_tasks)
+    
+    try:
+        await get_test_store().save(
+            request_id,
+            request.userId,
+            request_data,
+            json.loads(response.json(exclude={"questions"})),
+            question_data
+        )
+    except Exception as e:
+        logger.error(f"Failed to store test {request_id}: {e}")
+        response.warnings.append("Test could not be saved - download it now, it cannot be fetched again later")
+    
+    return response
+
+async def _recent_questions(user_id: str, test_id: str) -> SimilarityIndex:
+    """Similarity index of the user's recent papers (empty if the store is unavailable)"""
+    if not DUPLICATE_CHECK:
+        return SimilarityIndex()
+    try:
+        texts = await get_test_store().recent_questions(user_id, DUPLICATE_RECENT_PAPERS, exclude_id=test_id)
+    except Exception as e:
+        logger.warning(f"Recent papers unavailable for duplicate check: {e}")
+        texts = []
+    return SimilarityIndex(texts)
+
+def _variant_test_id(test_id: str, index: int) -> str:
+    """Set A is the test itself; set B is stored as '<test_id>-B', and so on"""
+    return test_id if index == 0 else f"{test_id}-{paper_variants.set_label(index)}"
+
+async def _save_variants(
+    request: TestGenerationRequest,
+    test_id: str,
+    request_data: Dict[str, Any],
+    response: TestGenerationResponse,
+    variant_sets: List[List[Dict[str, Any]]],
+    background_tasks: Optional[BackgroundTasks]
+):
+    """
+    Store sets B, C... as tests of their own (so get/download/paper/regenerate
+    work on each) and list every set on the main response
+    """
+    fmt = request.outputFormat.value
+    response.variants = []
+    for index, question_data in enumerate(variant_sets):
+        variant_id = _variant_test_id(test_id, index)
+        label = paper_variants.set_label(index)
+        response.variants.append({
+            "set": label,
+            "testId": variant_id,
+            "downloadUrl": f"/api/tests/{variant_id}/download?format={fmt}",
+            "paperUrl": f"/api/tests/{variant_id}/paper",
+            "answerKey": paper_variants.answer_key(question_data)
+        })
+        if index == 0:
+            continue
+        
+        paper = _paper(request_data, question_data)
+        file_urls = await _generate_output_files(variant_id, fmt, paper, background_tasks)
+        variant_response = response.copy(update={
+            "testId": variant_id,
+            "testContent": format_paper_text(paper),
+            "questions": None,
+            "metadata": {**response.metadata, "variantSet": label},
+            "variants": None,
+            **{f"{key}Url": url for key, url in file_urls.items() if f"{key}Url" in TestGenerationResponse.__fields__}
+        })
+        try:
+            await get_test_store().save(
+                variant_id,
+                request.userId,
+                request_data,
+                json.loads(variant_response.json(exclude={"questions"})),
+                question_data
+            )
+        except Exception as e:
+            logger.error(f"Failed to store variant {variant_id}: {e}")
+            response.warnings.append(f"Set {label} could not be saved - download it now, it cannot be fetched again later")
+
 @router.post(
     "/generate-test",
     response_model=TestGenerationResponse,
@@ -638,90 +1394,50 @@ class TestGenerationService:
     **Authentication:** Required (via API key or JWT)
     **Rate Limit:** 5 requests/hour per user
     **Processing Time:** 10-30 seconds depending on complexity
+    
+    For large papers prefer `POST /generate-test/jobs`, which returns at once
+    and runs the generation on a background worker.
     """
 )
 async def generate_test(
     request: TestGenerationRequest,
     background_tasks: BackgroundTasks,
+    http_response: Response,
     rag: RAGSystem = Depends(get_rag_system)
 ) -> JSONResponse:
-    """Generate test using RAG + NCERT context"""
+    """
+    Generate test using RAG + NCERT context
+    
+    With a client requestId the call is idempotent: a retry with the same
+    payload returns the stored paper (or waits for the run in progress)
+    instead of generating again; a different payload is rejected with 409.
+    """
     
-    # Start timing
-    start_time = time.time()
     request_id = request.requestId or f"test_{uuid.uuid4().hex[:8]}"
     
     try:
         logger.info(f"Test generation request - ID: {request_id}, User: {request.userId}")
         
-        # Initialize service
-        service = TestGenerationService(rag)
-        
-        # Step 1: Get NCERT context
-        ncert_context, sources = await service.generate_ncert_context(request)
-        
-        # Step 2: Generate questions
-        questions = await service.generate_questions(request, ncert_context)
-        
-        # Step 3: Format test content
-        test_content = service.format_test_content(questions, request)
-        
-        # Step 4: Generate output files (async in background)
-        file_urls = await _generate_output_files(
-            request_id, test_content, questions, request, background_tasks
-        )
-        
-        # Step 5: Prepare metadata
-        metadata = {
-            "subject": request.subject,
-            "class": request.classNum,
-            "board": request.board,
-            "difficulty": request.difficulty.value,
-            "totalQuestions": len(questions),
-            "totalMarks": sum(q.marks for q in questions),
-            "questionTypes": list(set(q.type.value for q in questions)),
-            "ragUsed": request.useRAG,
-            "ncertBased": request.useNCERT,
-            "ragSourcesCount": len(sources),
-            "language": request.language.value,
-            "generatedAt": datetime.utcnow().isoformat(),
-            "timeLimit": request.timeLimit,
-            "shuffled": request.shuffleQuestions
-        }
-        
-        # Step 6: Prepare warnings
-        warnings = []
-        if len(sources) < 3 and request.useRAG:
-            warnings.append("Limited NCERT sources found - consider broadening topic")
-        if request.ncertWeight < 0.5:
-            warnings.append("Low NCERT weight - test may not be fully NCERT-aligned")
-        
-        # Step 7: Calculate processing time
-        processing_time = int((time.time() - start_time) * 1000)
-        
-        # Step 8: Prepare response
-        response = TestGenerationResponse(
-            success=True,
-            testId=request_id,
-            testContent=test_content,
-            questions=questions if request.outputFormat == OutputFormat.JSON else None,
-            pdfUrl=file_urls.get("pdf"),
-            docxUrl=file_urls.get("docx"),
-            csvUrl=file_urls.get("csv"),
-            jsonUrl=file_urls.get("json"),
-            metadata=metadata,
-            ragContext=ncert_context if request.useRAG else None,
-            sources=sources if request.useRAG else None,
-            processingTimeMs=processing_time,
-            requestId=request_id,
-            warnings=warnings,
-            expiresAt=(datetime.utcnow() + timedelta(hours=24)).isoformat()
-        )
+        if request.requestId:
+            digest = _request_hash(request)
+            response, replayed = await generate_flight.do(
+                (request_id, digest),
+                lambda: _idempotent_generate(request, rag, request_id, digest, background_tasks)
+            )
+            if replayed:
+                http_response.headers["Idempotent-Replayed"] = "true"
+                logger.info(f"Test generation replayed - ID: {request_id}")
+                return response
+        else:
+            response = await run_test_generation(request, rag, request_id, background_tasks)
         
-        logger.info(f"Test generation completed - ID: {request_id}, Time: {processing_time}ms")
+        logger.info(f"Test generation completed - ID: {request_id}, Time: {response.processingTimeMs}ms")
         
         return response
         
+    except HTTPException:
+        raise
+        
     except ValueError as e:
         logger.warning(f"Validation error - ID: {request_id}, Error: {str(e)}")
         raise HTTPException(
@@ -733,6 +1449,18 @@ async def generate_test(
             }
         )
         
+    except QuestionGenerationError as e:
+        logger.error(f"Question generation failed - ID: {request_id}, Error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail={
+                "error": "QUESTION_GENERATION_FAILED",
+                "message": str(e),
+                "request_id": request_id,
+                "hint": "The question generator is unavailable; please retry shortly"
+            }
+        )
+        
     except Exception as e:
         logger.error(f"Test generation failed - ID: {request_id}, Error: {str(e)}", exc_info=True)
         raise HTTPException(
@@ -745,73 +1473,561 @@ async def generate_test(
             }
         )
 
-async def _generate_output_files(
-    test_id: str,
-    test_content: str,
-    questions: List[QuestionModel],
+# ============== IDEMPOTENCY ==============
+
+# How long a retry waits for the original run of its requestId to finish
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("TEST_GEN_IDEMPOTENCY_WAIT_SECONDS", 120))
+IDEMPOTENCY_POLL_SECONDS = float(os.getenv("TEST_GEN_IDEMPOTENCY_POLL_SECONDS", 1.0))
+
+# Concurrent retries within this process share one run
+generate_flight = get_singleflight("generate-test")
+
+def _request_hash(request: TestGenerationRequest) -> str:
+    """Payload fingerprint for idempotency (everything except the requestId itself)"""
+    return payload_hash(json.loads(request.json(exclude={"requestId"})))
+
+def _stored_response(record: Dict[str, Any]) -> TestGenerationResponse:
+    """Rebuild the original /generate-test response from the test store"""
+    include_questions = record["request"].get("outputFormat") == OutputFormat.JSON.value
+    return TestGenerationResponse.parse_obj({
+        **record["response"],
+        "questions": record["questions"] if include_questions else None
+    })
+
+def _idempotency_error(request_id: str, error: str, message: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail={"error": error, "message": message, "request_id": request_id}
+    )
+
+def _payload_mismatch(request_id: str) -> HTTPException:
+    return _idempotency_error(
+        request_id, "IDEMPOTENCY_KEY_REUSED",
+        f"requestId {request_id} was already used with a different request payload"
+    )
+
+async def _replay_or_wait(request_id: str, digest: str) -> Optional[TestGenerationResponse]:
+    """
+    Result of the earlier run of `request_id`, waiting while it is in progress.
+    None when there is nothing to reuse (the run failed, or its test is gone),
+    in which case the caller should claim the key and run.
+    """
+    store = get_idempotency_store()
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        claim = await store.get(request_id)
+        if claim is None:
+            return None
+        if claim["payload_hash"] != digest:
+            raise _payload_mismatch(request_id)
+        
+        if claim["status"] == COMPLETED:
+            record = await get_test_store().get(request_id)
+            if record is not None:
+                return _stored_response(record)
+            await store.release(request_id)
+            return None
+        
+        if time.monotonic() > deadline:
+            raise _idempotency_error(
+                request_id, "REQUEST_IN_PROGRESS",
+                f"Request {request_id} is still being generated; retry later"
+            )
+        await asyncio.sleep(IDEMPOTENCY_POLL_SECONDS)
+
+async def _idempotent_generate(
     request: TestGenerationRequest,
-    background_tasks: BackgroundTasks
-) -> Dict[str, str]:
-    """Generate output files in requested formats"""
+    rag: RAGSystem,
+    request_id: str,
+    digest: str,
+    background_tasks: Optional[BackgroundTasks]
+) -> Tuple[TestGenerationResponse, bool]:
+    """(response, replayed): run under a claim on request_id, or reuse the earlier run"""
+    store = get_idempotency_store()
+    
+    for _ in range(3):
+        try:
+            claim = await store.claim(request_id, digest, "sync")
+        except ConnectionError as e:
+            logger.warning(f"Idempotency store unavailable, generating without it - ID: {request_id}: {e}")
+            return await run_test_generation(request, rag, request_id, background_tasks), False
+        
+        if claim is None:
+            try:
+                response = await run_test_generation(request, rag, request_id, background_tasks)
+            except BaseException:
+                await store.release(request_id)
+                raise
+            await store.complete(request_id)
+            return response, False
+        
+        if claim["payload_hash"] != digest:
+            raise _payload_mismatch(request_id)
+        
+        response = await _replay_or_wait(request_id, digest)
+        if response is not None:
+            return response, True
+    
+    raise _idempotency_error(
+        request_id, "REQUEST_IN_PROGRESS",
+        f"Request {request_id} is being generated by another attempt; retry later"
+    )
+
+# ============== ASYNC JOB MODE ==============
+
+GENERATE_TEST_JOB = "generate_test"
+
+# How often the SSE endpoint re-reads job progress
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("TEST_GEN_JOB_EVENTS_POLL_SECONDS", 0.5))
+
+async def _generate_test_job(payload: Dict[str, Any], progress) -> Dict[str, Any]:
+    """Job worker handler: run the pipeline and return the response as the job result"""
+    request = TestGenerationRequest.parse_obj(payload["request"])
+    request_id = payload["requestId"]
+    idempotent = payload.get("idempotent", False)
+    try:
+        response = await run_test_generation(request, get_rag_system(), request_id, progress=progress)
+    except (ValueError, QuestionGenerationError) as e:
+        if idempotent:
+            await get_idempotency_store().release(request_id)
+        raise jobs.JobError(str(e)) from e
+    except Exception:
+        if idempotent:
+            await get_idempotency_store().release(request_id)
+        raise
+    if idempotent:
+        await get_idempotency_store().complete(request_id)
+    return json.loads(response.json())
+
+get_job_pool().register(GENERATE_TEST_JOB, _generate_test_job)
+
+def _job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Public representation of a generation job"""
+    view = {
+        "jobId": job["id"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "attempts": job["attempts"],
+        "createdAt": job["created_at"].isoformat() if job["created_at"] else None,
+        "startedAt": job["started_at"].isoformat() if job["started_at"] else None,
+        "finishedAt": job["finished_at"].isoformat() if job["finished_at"] else None,
+    }
+    if job["status"] == jobs.SUCCEEDED:
+        view["result"] = job["result"]
+    if job["error"]:
+        view["error"] = job["error"]
+    return view
+
+async def _load_job(job_id: str) -> Dict[str, Any]:
+    db = get_database_client()
+    if not await db.connect():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": "JOB_STORE_UNAVAILABLE", "message": "Job store is unavailable"}
+        )
+    async with db.acquire() as conn:
+        job = await jobs.get_job(conn, job_id)
+    if job is None or job["kind"] not in (GENERATE_TEST_JOB, GENERATE_BULK_JOB):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "JOB_NOT_FOUND", "message": f"Job {job_id} not found"}
+        )
+    return job
+
+@router.post(
+    "/generate-test/jobs",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Queue Test Generation",
+    description="""
+    Queue a test paper for generation on a background worker.
+    
+    Returns 202 immediately with a job id. Poll `GET /generate-test/jobs/{jobId}`
+    or stream `GET /generate-test/jobs/{jobId}/events` (SSE) for progress; the
+    finished job carries the same payload `/generate-test` would have returned.
+    """
+)
+async def create_test_job(request: TestGenerationRequest) -> JSONResponse:
+    """Enqueue a generation job"""
+    request_id = request.requestId or f"test_{uuid.uuid4().hex[:8]}"
+    pool = get_job_pool()
+    
+    db = get_database_client()
+    if not pool.started or not await db.connect():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "error": "JOB_QUEUE_UNAVAILABLE",
+                "message": "Background generation is unavailable; use /generate-test",
+                "request_id": request_id
+            }
+        )
+    
+    # A retry of a client requestId attaches to the job it already started
+    idempotent, claim = False, None
+    if request.requestId:
+        digest = _request_hash(request)
+        try:
+            claim = await get_idempotency_store().claim(request_id, digest, "job")
+            idempotent = claim is None
+        except ConnectionError as e:
+            logger.warning(f"Idempotency store unavailable - ID: {request_id}: {e}")
+            claim = None
+        
+        if claim is not None:
+            if claim["payload_hash"] != digest:
+                raise _payload_mismatch(request_id)
+            if claim["mode"] != "job":
+                raise _idempotency_error(
+                    request_id, "REQUEST_HANDLED_SYNCHRONOUSLY",
+                    f"Request {request_id} was submitted to /generate-test; fetch it from /api/tests/{request_id}"
+                )
+            job = await _load_job(request_id)
+            if job["status"] == jobs.FAILED:
+                # The failed attempt's key was never released (its worker
+                # died) - run the request again under the same id
+                idempotent = True
+            else:
+                logger.info(f"Attached retry to existing job - Job: {request_id}, Status: {job['status']}")
+                return JSONResponse(
+                    status_code=status.HTTP_202_ACCEPTED,
+                    content={
+                        "success": True,
+                        "jobId": request_id,
+                        "status": job["status"],
+                        "statusUrl": f"/api/generate-test/jobs/{request_id}",
+                        "eventsUrl": f"/api/generate-test/jobs/{request_id}/events",
+                        "requestId": request_id
+                    },
+                    headers={"Location": f"/api/generate-test/jobs/{request_id}", "Idempotent-Replayed": "true"}
+                )
+    
+    payload = {"requestId": request_id, "request": json.loads(request.json()), "idempotent": idempotent}
+    async with db.acquire() as conn:
+        job_id = await jobs.enqueue(conn, GENERATE_TEST_JOB, payload, job_id=request_id, user_id=request.userId)
+        if job_id is None and request.requestId:
+            # A requestId whose earlier job failed is retried in place
+            job_id = await jobs.retry_failed(conn, request_id, GENERATE_TEST_JOB, payload, user_id=request.userId)
+    
+    if job_id is None:
+        if idempotent and claim is None:
+            await get_idempotency_store().release(request_id)
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "error": "JOB_EXISTS",
+                "message": f"A job with id {request_id} already exists",
+                "request_id": request_id
+            }
+        )
+    
+    pool.notify()
+    logger.info(f"Test generation queued - Job: {job_id}, User: {request.userId}")
+    
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "success": True,
+            "jobId": job_id,
+            "status": jobs.QUEUED,
+            "statusUrl": f"/api/generate-test/jobs/{job_id}",
+            "eventsUrl": f"/api/generate-test/jobs/{job_id}/events",
+            "requestId": request_id
+        },
+        headers={"Location": f"/api/generate-test/jobs/{job_id}"}
+    )
+
+@router.get(
+    "/generate-test/jobs/{job_id}",
+    summary="Get Test Generation Job",
+    description="Status and progress of a queued job; includes the result once it has succeeded"
+)
+async def get_test_job(job_id: str):
+    """Poll a generation job"""
+    return _job_view(await _load_job(job_id))
+
+@router.get(
+    "/generate-test/jobs/{job_id}/events",
+    summary="Stream Test Generation Job (SSE)",
+    description="""
+    Server-Sent Events for a queued job:
+    1. `progress` - status, stage and percent, sent whenever they change
+    2. `done` - the finished job including its result, or
+       `error` - the failed job and its error message
+    """
+)
+async def stream_test_job(job_id: str, http_request: Request) -> StreamingResponse:
+    """Stream job progress until it finishes or the client disconnects"""
+    job = await _load_job(job_id)
+    
+    async def events():
+        current = job
+        last_seen = None
+        db = get_database_client()
+        while True:
+            view = _job_view(current)
+            if current["status"] in TERMINAL_STATUSES:
+                yield sse_event("done" if current["status"] == jobs.SUCCEEDED else "error", view)
+                return
+            
+            state = (current["status"], json.dumps(current["progress"], sort_keys=True))
+            if state != last_seen:
+                last_seen = state
+                yield sse_event("progress", view)
+            
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+            if await http_request.is_disconnected():
+                return
+            async with db.acquire() as conn:
+                current = await jobs.get_job(conn, job_id)
     
-    file_urls = {}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# ============== BULK GENERATION ==============
+
+GENERATE_BULK_JOB = "generate_test_bulk"
+
+# Papers generated at once within a bulk run (LLM calls are further bounded by the LLM client)
+BULK_PAPER_CONCURRENCY = int(os.getenv("TEST_GEN_BULK_PAPER_CONCURRENCY", 4))
+
+def _bulk_groups(requests: List[TestGenerationRequest], rag: RAGSystem) -> Dict[Any, List[int]]:
+    """
+    Request indices grouped by retrieval scope (the context cache key).
+    Requests that bring their own context or skip RAG form groups of one.
+    """
+    service = TestGenerationService(rag)
+    groups: Dict[Any, List[int]] = {}
+    for index, request in enumerate(requests):
+        if request.ragContext or not request.useRAG or not request.useNCERT:
+            key = ("own", index)
+        else:
+            key, _ = service._context_cache_key(request)
+        groups.setdefault(key, []).append(index)
+    return groups
+
+async def run_bulk_generation(
+    bulk: BulkGenerationRequest,
+    rag: RAGSystem,
+    bulk_id: str,
+    progress: Optional[Callable[..., Awaitable[None]]] = None
+) -> Dict[str, Any]:
+    """
+    Generate every paper of a bulk request and return the manifest
     
-    # In production, this would:
-    # 1. Generate files using appropriate libraries (reportlab for PDF, python-docx for DOCX)
-    # 2. Upload to cloud storage (S3, Supabase Storage)
-    # 3. Return signed URLs
+    Papers are grouped by syllabus scope; each group's context is retrieved
+    once and handed to all of its papers. Papers from all groups then share
+    BULK_PAPER_CONCURRENCY slots, so LLM work from one group fills the gaps
+    left by another. A failed paper is recorded in the manifest and does not
+    stop the rest.
+    """
+    start_time = time.time()
+    requests = bulk.requests
+    test_ids = [request.requestId or f"{bulk_id}-{index + 1:03d}" for index, request in enumerate(requests)]
+    groups = _bulk_groups(requests, rag)
+    manifest: List[Optional[Dict[str, Any]]] = [None] * len(requests)
+    semaphore = asyncio.Semaphore(BULK_PAPER_CONCURRENCY)
+    completed = 0
     
-    # Placeholder implementation
-    if request.outputFormat == OutputFormat.PDF:
-        file_urls["pdf"] = f"/api/tests/{test_id}/download?format=pdf"
-        background_tasks.add_task(_generate_pdf, test_id, test_content, request)
+    logger.info(f"Bulk generation {bulk_id}: {len(requests)} papers in {len(groups)} scope groups")
     
-    elif request.outputFormat == OutputFormat.DOCX:
-        file_urls["docx"] = f"/api/tests/{test_id}/download?format=docx"
-        background_tasks.add_task(_generate_docx, test_id, test_content, request)
+    async def run_paper(index: int, group: int, shared_context):
+        nonlocal completed
+        request, test_id = requests[index], test_ids[index]
+        entry = {
+            "index": index,
+            "testId": test_id,
+            "group": group,
+            "userId": request.userId,
+            "classNum": request.classNum,
+            "subject": request.subject,
+        }
+        try:
+            async with semaphore:
+                response = await run_test_generation(request, rag, test_id, shared_context=shared_context)
+            entry.update({
+                "status": jobs.SUCCEEDED,
+                "totalQuestions": response.metadata["totalQuestions"],
+                "questionsFromBank": response.metadata["questionsFromBank"],
+                "testUrl": f"/api/tests/{test_id}",
+                "downloadUrl": f"/api/tests/{test_id}/download?format={request.outputFormat.value}",
+                "variants": [variant["testId"] for variant in response.variants] if response.variants else None,
+                "warnings": response.warnings
+            })
+        except Exception as e:
+            logger.error(f"Bulk generation {bulk_id}: paper {test_id} failed: {e}")
+            entry.update({"status": jobs.FAILED, "error": str(e)})
+        
+        manifest[index] = entry
+        completed += 1
+        if progress:
+            await progress(
+                "generating_papers", 5 + 90 * completed // len(requests),
+                completedPapers=completed, totalPapers=len(requests)
+            )
     
-    elif request.outputFormat == OutputFormat.CSV:
-        file_urls["csv"] = f"/api/tests/{test_id}/download?format=csv"
-        background_tasks.add_task(_generate_csv, test_id, questions)
+    async def run_group(group: int, key, indices: List[int]):
+        shared_context = None
+        if key[0] != "own":
+            try:
+                async with semaphore:
+                    service = TestGenerationService(rag)
+                    context, sources = await service.generate_ncert_context(requests[indices[0]])
+                shared_context = (context, sources, dict(service.bucket_contexts))
+            except Exception as e:
+                logger.warning(f"Bulk generation {bulk_id}: shared context for group {group} failed, papers retrieve their own: {e}")
+        await asyncio.gather(*(run_paper(index, group, shared_context) for index in indices))
     
-    elif request.outputFormat == OutputFormat.JSON:
-        file_urls["json"] = f"/api/tests/{test_id}/download?format=json"
-        background_tasks.add_task(_generate_json, test_id, questions, request)
+    if progress:
+        await progress("retrieving_context", 0, totalPapers=len(requests), groups=len(groups))
+    await asyncio.gather(*(
+        run_group(group, key, indices) for group, (key, indices) in enumerate(groups.items(), 1)
+    ))
     
-    return file_urls
+    elapsed = time.time() - start_time
+    succeeded = sum(1 for entry in manifest if entry["status"] == jobs.SUCCEEDED)
+    return {
+        "bulkId": bulk_id,
+        "totalPapers": len(requests),
+        "succeeded": succeeded,
+        "failed": len(requests) - succeeded,
+        "scopeGroups": len(groups),
+        "elapsedSeconds": round(elapsed, 2),
+        "papersPerMinute": round(succeeded * 60 / elapsed, 2) if elapsed > 0 else 0.0,
+        "papers": manifest,
+    }
 
-# Placeholder file generation functions
-async def _generate_pdf(test_id: str, content: str, request: TestGenerationRequest):
-    """Generate PDF file"""
-    await asyncio.sleep(0.1)  # Simulate processing
-    logger.info(f"PDF generated for test {test_id}")
+async def _generate_bulk_job(payload: Dict[str, Any], progress) -> Dict[str, Any]:
+    """Job worker handler: run a bulk request and return its manifest"""
+    bulk = BulkGenerationRequest.parse_obj(payload["request"])
+    return await run_bulk_generation(bulk, get_rag_system(), payload["bulkId"], progress=progress)
+
+get_job_pool().register(GENERATE_BULK_JOB, _generate_bulk_job)
+
+@router.post(
+    "/generate-test/bulk",
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="Queue Bulk Test Generation",
+    description="""
+    Queue many papers (e.g. every section of classes 6-12) as one background job.
+    
+    Papers sharing a syllabus scope share one context retrieval. Track it like any
+    job (`GET /generate-test/jobs/{jobId}`, or `/events` for SSE); the result is a
+    manifest with each paper's test ID, status and URLs, plus papers per minute.
+    """
+)
+async def create_bulk_job(bulk: BulkGenerationRequest) -> JSONResponse:
+    """Enqueue a bulk generation job"""
+    bulk_id = bulk.bulkId or f"bulk_{uuid.uuid4().hex[:8]}"
+    pool = get_job_pool()
+    
+    db = get_database_client()
+    if not pool.started or not await db.connect():
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={
+                "error": "JOB_QUEUE_UNAVAILABLE",
+                "message": "Background generation is unavailable",
+                "request_id": bulk_id
+            }
+        )
+    
+    payload = {"bulkId": bulk_id, "request": json.loads(bulk.json())}
+    async with db.acquire() as conn:
+        job_id = await jobs.enqueue(conn, GENERATE_BULK_JOB, payload, job_id=bulk_id, user_id=bulk.userId)
+    
+    if job_id is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "error": "JOB_EXISTS",
+                "message": f"A job with id {bulk_id} already exists",
+                "request_id": bulk_id
+            }
+        )
+    
+    pool.notify()
+    logger.info(f"Bulk generation queued - Job: {job_id}, Papers: {len(bulk.requests)}")
+    
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={
+            "success": True,
+            "jobId": job_id,
+            "status": jobs.QUEUED,
+            "totalPapers": len(bulk.requests),
+            "statusUrl": f"/api/generate-test/jobs/{job_id}",
+            "eventsUrl": f"/api/generate-test/jobs/{job_id}/events",
+            "requestId": bulk_id
+        },
+        headers={"Location": f"/api/generate-test/jobs/{job_id}"}
+    )
 
-async def _generate_docx(test_id: str, content: str, request: TestGenerationRequest):
-    """Generate DOCX file"""
-    await asyncio.sleep(0.1)
-    logger.info(f"DOCX generated for test {test_id}")
+def _paper(request_data: Dict[str, Any], questions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Renderer input: only the fields that affect the output file (see renderers.py)"""
+    return {
+        "subject": request_data.get("subject"),
+        "classNum": request_data.get("classNum"),
+        "board": request_data.get("board"),
+        "topic": request_data.get("topic"),
+        "chapters": request_data.get("chapters"),
+        "timeLimit": request_data.get("timeLimit"),
+        "includeAnswerKey": request_data.get("includeAnswerKey", True),
+        "includeInstructions": request_data.get("includeInstructions", True),
+        "watermark": request_data.get("watermark", True),
+        "includePageNumbers": request_data.get("includePageNumbers", True),
+        "questions": questions,
+    }
 
-async def _generate_csv(test_id: str, questions: List[QuestionModel]):
-    """Generate CSV file"""
-    await asyncio.sleep(0.1)
-    logger.info(f"CSV generated for test {test_id}")
+async def _generate_output_files(
+    test_id: str,
+    fmt: str,
+    paper: Dict[str, Any],
+    background_tasks: Optional[BackgroundTasks] = None
+) -> Dict[str, str]:
+    """
+    Download URLs for the requested format, pre-rendering the artifact
+    (after the response when serving HTTP; inline inside a job worker)
+    """
+    if background_tasks is not None:
+        background_tasks.add_task(_prerender, test_id, fmt, paper)
+    else:
+        await _prerender(test_id, fmt, paper)
+    
+    return {fmt: f"/api/tests/{test_id}/download?format={fmt}"}
 
-async def _generate_json(test_id: str, questions: List[QuestionModel], request: TestGenerationRequest):
-    """Generate JSON file"""
-    await asyncio.sleep(0.1)
-    logger.info(f"JSON generated for test {test_id}")
+async def _prerender(test_id: str, fmt: str, paper: Dict[str, Any]):
+    """Warm the artifact cache; download_test renders on demand if this fails"""
+    try:
+        await renderers.render_artifact(fmt, paper)
+    except Exception as e:
+        logger.warning(f"Pre-rendering {fmt} for test {test_id} failed: {e}")
 
 # ============== ADDITIONAL ENDPOINTS ==============
 
+async def _stored_test(test_id: str) -> Dict[str, Any]:
+    """Stored test record, or 404 once it is unknown or past expiresAt"""
+    try:
+        record = await get_test_store().get(test_id)
+    except ConnectionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": "TEST_STORE_UNAVAILABLE", "message": str(e)}
+        )
+    if record is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail={"error": "TEST_NOT_FOUND", "message": f"Test {test_id} not found or expired"}
+        )
+    return record
+
 @router.get(
     "/tests/{test_id}",
     summary="Get Generated Test",
-    description="Retrieve previously generated test by ID"
+    description="Retrieve previously generated test by ID (until it expires)"
 )
 async def get_test(test_id: str):
     """Get generated test by ID"""
-    # In production, fetch from database
-    return {"message": f"Test {test_id} details would be fetched from database"}
+    record = await _stored_test(test_id)
+    return {**record["response"], "questions": record["questions"]}
 
 @router.get(
     "/tests/{test_id}/download",
@@ -822,18 +2038,273 @@ async def download_test(
     test_id: str, 
     format: OutputFormat = OutputFormat.PDF
 ):
-    """Download test file"""
-    # In production, serve from storage
-    return {"message": f"Download test {test_id} in {format} format"}
+    """Download test file (rendered once per content hash, then served from disk)"""
+    record = await _stored_test(test_id)
+    paper = _paper(record["request"], record["questions"])
+    
+    try:
+        path = await renderers.render_artifact(format.value, paper)
+    except Exception as e:
+        logger.error(f"Rendering {format.value} for test {test_id} failed: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail={"error": "RENDER_FAILED", "message": f"Could not render test as {format.value}"}
+        )
+    
+    return FileResponse(
+        path,
+        media_type=renderers.MEDIA_TYPES[format.value],
+        filename=f"{test_id}.{format.value}"
+    )
+
+@router.get(
+    "/tests/{test_id}/paper",
+    summary="Stream Test Paper Text",
+    description="The formatted paper as plain text, streamed section by section"
+)
+async def stream_test_paper(test_id: str) -> StreamingResponse:
+    """Stream the stored paper; the first bytes go out before the paper is fully formatted"""
+    record = await _stored_test(test_id)
+    return StreamingResponse(
+        iter_paper_text(_paper(record["request"], record["questions"])),
+        media_type="text/plain; charset=utf-8"
+    )
+
+@router.get(
+    "/users/{user_id}/tests",
+    summary="List User's Tests",
+    description="Unexpired tests generated by a user, newest first"
+)
+async def list_user_tests(user_id: str, limit: conint(ge=1, le=200) = 50):
+    """List a user's stored tests"""
+    try:
+        records = await get_test_store().list_for_user(user_id, limit)
+    except ConnectionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail={"error": "TEST_STORE_UNAVAILABLE", "message": str(e)}
+        )
+    return {
+        "userId": user_id,
+        "tests": [
+            {
+                "testId": record["id"],
+                "metadata": record["metadata"],
+                "createdAt": record["created_at"].isoformat(),
+                "expiresAt": record["expires_at"].isoformat()
+            }
+            for record in records
+        ]
+    }
+
+def _regeneration_selection(
+    test_id: str,
+    buckets: List[TestBucket],
+    questions: List[Dict[str, Any]],
+    selection: RegenerateRequest
+) -> Dict[int, List[int]]:
+    """Bucket index -> paper positions to replace, from question ids and bucket numbers"""
+    owner = _bucket_owner(buckets)
+    if len(owner) != len(questions):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={"error": "TEST_LAYOUT_CHANGED", "message": f"Test {test_id} no longer matches its buckets"}
+        )
+    
+    positions = set()
+    if selection.questionIds:
+        by_id = {question["id"]: position for position, question in enumerate(questions)}
+        unknown = [question_id for question_id in selection.questionIds if question_id not in by_id]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"error": "UNKNOWN_QUESTION", "message": f"Test {test_id} has no questions {unknown}"}
+            )
+        positions.update(by_id[question_id] for question_id in selection.questionIds)
+    
+    for number in selection.buckets or ():
+        if number > len(buckets):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={"error": "UNKNOWN_BUCKET", "message": f"Test {test_id} has {len(buckets)} buckets"}
+            )
+        positions.update(position for position, idx in enumerate(owner) if idx == number - 1)
+    
+    if not selection.questionIds and not selection.buckets:
+        positions = set(range(len(questions)))
+    
+    selected: Dict[int, List[int]] = {}
+    for position in sorted(positions):
+        selected.setdefault(owner[position], []).append(position)
+    return selected
 
 @router.post(
     "/tests/{test_id}/regenerate",
-    summary="Regenerate Test",
-    description="Regenerate test with same parameters"
+    response_model=TestGenerationResponse,
+    summary="Regenerate Test Questions",
+    description="Replace selected questions or buckets of a stored test, keeping the rest of the paper"
+)
+async def regenerate_test(
+    test_id: str,
+    background_tasks: BackgroundTasks,
+    selection: Optional[RegenerateRequest] = None,
+    rag: RAGSystem = Depends(get_rag_system)
+):
+    """
+    Regenerate part of a stored test
+    
+    Reuses the stored request and NCERT context (no retrieval) and every
+    question that was not selected; only the selected questions are
+    generated again. The test keeps its ID and is stored again in place.
+    """
+    start_time = time.time()
+    selection = selection or RegenerateRequest()
+    record = await _stored_test(test_id)
+    
+    try:
+        request = TestGenerationRequest.parse_obj(record["request"])
+        stored_context = record["response"].get("ragContext")
+        if stored_context and not request.ragContext:
+            request = request.copy(update={"ragContext": stored_context})
+        
+        service = TestGenerationService(rag)
+        selected = _regeneration_selection(test_id, service._resolve_buckets(request), record["questions"], selection)
+        replaced_ids = [record["questions"][position]["id"] for positions in selected.values() for position in positions]
+        logger.info(f"Regenerating {len(replaced_ids)} questions of test {test_id}")
+        
+        ncert_context, _ = await service.generate_ncert_context(request)
+        questions = await service.regenerate_questions(request, ncert_context, record["questions"], selected)
+        questions = await service.resolve_provenance(request, questions)
+        
+    except HTTPException:
+        raise
+        
+    except QuestionGenerationError as e:
+        logger.error(f"Question regeneration failed - Test: {test_id}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail={"error": "QUESTION_GENERATION_FAILED", "message": str(e), "request_id": test_id}
+        )
+    
+    question_data = [json.loads(q.json()) for q in questions]
+    paper = _paper(record["request"], question_data)
+    await _generate_output_files(test_id, request.outputFormat.value, paper, background_tasks)
+    
+    response = TestGenerationResponse.parse_obj({
+        **record["response"],
+        "testContent": format_paper_text(paper),
+        "questions": questions if request.outputFormat == OutputFormat.JSON else None,
+        "metadata": {
+            **record["response"].get("metadata", {}),
+            "questionsFromBank": service.bank_served,
+            "regeneratedQuestions": replaced_ids,
+            "regenerationLlmCalls": service.generator.calls,
+            "regeneratedAt": datetime.utcnow().isoformat()
+        },
+        "processingTimeMs": int((time.time() - start_time) * 1000),
+        "expiresAt": (datetime.utcnow() + timedelta(hours=24)).isoformat()
+    })
+    
+    try:
+        await get_test_store().save(
+            test_id,
+            record["user_id"],
+            record["request"],
+            json.loads(response.json(exclude={"questions"})),
+            question_data
+        )
+    except Exception as e:
+        logger.error(f"Failed to store regenerated test {test_id}: {e}")
+        response.warnings.append("Regenerated test could not be saved - download it now, the stored copy is unchanged")
+    
+    return response
+
+@router.post(
+    "/tests/{test_id}/grade",
+    summary="Grade Answer Sheets",
+    description="""
+    Auto-grade student responses to a stored test (MCQ, true/false, fill-in-the-blank).
+    
+    Send either CSV (`text/csv` body, or a multipart `file`) with a student id
+    column and one column per question id, or JSON
+    `{"responses": [{"studentId": "...", "answers": {"Q1": "B"}}]}`. Answers may be
+    option letters or option text. Negative marking follows the test's buckets.
+    Returns per-student scores and per-question statistics.
+    """
 )
-async def regenerate_test(test_id: str):
-    """Regenerate test with same parameters"""
-    return {"message": f"Test {test_id} regeneration endpoint"}
+async def grade_test(test_id: str, http_request: Request):
+    """Grade a response sheet against the stored answer key"""
+    record = await _stored_test(test_id)
+    content_type = http_request.headers.get("content-type", "")
+    
+    try:
+        if content_type.startswith("multipart/form-data"):
+            upload = (await http_request.form()).get("file")
+            if upload is None:
+                raise grading.GradingError("Multipart upload needs a 'file' field")
+            raw = await upload.read()
+            is_json = (upload.filename or "").lower().endswith(".json")
+        else:
+            raw = await http_request.body()
+            is_json = "json" in content_type
+        
+        text = raw.decode("utf-8-sig")
+        if is_json:
+            try:
+                data = json.loads(text)
+            except json.JSONDecodeError as e:
+                raise grading.GradingError(f"Invalid JSON: {e}")
+            sheet = grading.parse_json(data)
+        else:
+            sheet = await asyncio.to_thread(grading.parse_csv, text)
+        
+        # Negative marking is per bucket; questions are stored in bucket order
+        request = TestGenerationRequest.parse_obj(record["request"])
+        buckets = TestGenerationService._resolve_buckets(request)
+        owner = _bucket_owner(buckets)
+        if len(owner) != len(record["questions"]):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={"error": "TEST_LAYOUT_CHANGED", "message": f"Test {test_id} no longer matches its buckets"}
+            )
+        negative = [buckets[index].negativeMarking or 0.0 for index in owner]
+        
+        result = await asyncio.to_thread(grading.grade, record["questions"], negative, sheet)
+        
+    except (grading.GradingError, UnicodeDecodeError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail={"error": "INVALID_RESPONSE_SHEET", "message": str(e), "request_id": test_id}
+        )
+    
+    logger.info(f"Graded {result['summary']['students']} students for test {test_id}")
+    return {"testId": test_id, **result}
+
+@router.get(
+    "/test-gen/question-bank/stats",
+    summary="Question Bank Coverage & Hit Rate",
+    description="Questions stored per syllabus cell and how much of recent papers the bank served"
+)
+async def question_bank_stats():
+    """Question bank coverage (from the database) and hit rate (since process start)"""
+    cells = []
+    db = get_database_client()
+    if await db.connect():
+        try:
+            async with db.acquire() as conn:
+                cells = await question_bank.coverage(conn)
+        except Exception as e:
+            logger.warning(f"Question bank coverage query failed: {e}")
+    
+    return {
+        "coverage": {
+            "cells": len(cells),
+            "questions": sum(cell["questions"] for cell in cells),
+            "byCell": cells
+        },
+        "hitRate": question_bank.bank_stats.to_dict(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
 
 # ============== HEALTH CHECK ==============
 
@@ -850,6 +2321,10 @@ async def test_gen_health_check():
         "capabilities": {
             "rag_integration": True,
             "multiple_formats": True,
-            "ncert_alignment": True
-        }
+            "ncert_alignment": True,
+            "async_jobs": get_job_pool().started
+        },
+        "jobs": get_job_pool().stats(),
+        "testStore": get_test_store().stats(),
+        "contextCache": context_cache.stats()
     }
\ No newline at end of file
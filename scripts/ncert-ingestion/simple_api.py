@@ -1,8 +1,9 @@
 import os
 import sys
 from pathlib import Path
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional, List, Dict
 import asyncio
@@ -24,14 +25,44 @@ except ImportError as e:
     print(f"Files in directory: {os.listdir(current_dir)}")
     raise
 
+import corpus_stats
+from deadlines import ClientDisconnected, DeadlineExceeded, iterate_with_deadline, run_with_deadline
+from sse import SSE_HEADERS, sse_event
+from llm_client import get_llm_client
+from health_monitor import HealthMonitor, estimated_rows_check, system_resources_check
+
 # Global RAG system instance
 rag_system_instance = None
+stats_reconcile_task = None
+health_monitor = HealthMonitor()
+
+# How often the incrementally maintained corpus stats are recomputed
+STATS_RECONCILE_SECONDS = float(os.getenv("CORPUS_STATS_RECONCILE_SECONDS", 3600))
+
+# Per-query budget; DB and LLM work is cancelled on timeout or client disconnect
+QUERY_TIMEOUT_SECONDS = float(os.getenv("QUERY_TIMEOUT_SECONDS", 30))
+
+async def check_gemini() -> Dict:
+    """Gemini is configured (checked in the background with the other dependencies)."""
+    if not os.getenv("GEMINI_API_KEY", "").strip():
+        return {"status": "unhealthy", "error": "GEMINI_API_KEY not set"}
+    if rag_system_instance.current_model is None:
+        return {"status": "degraded", "error": "No Gemini model available, using fallback answers"}
+    circuit = get_llm_client().breaker.state
+    return {
+        "status": "healthy" if circuit == "closed" else "degraded",
+        "model": rag_system_instance.current_model,
+        "circuit": circuit
+    }
+
+async def check_no_database() -> Dict:
+    return {"status": "unhealthy", "error": "Database pool not initialized"}
 
 # Lifespan manager for startup/shutdown (replaces on_event decorators)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global rag_system_instance
+    global rag_system_instance, stats_reconcile_task
     print("🚀 Starting up NCERT RAG API...")
     
     try:
@@ -43,9 +74,25 @@ async def lifespan(app: FastAPI):
         traceback.print_exc()
         raise
     
+    if rag_system_instance.pool:
+        async with rag_system_instance.pool.acquire() as conn:
+            await corpus_stats.ensure_schema(conn)
+        stats_reconcile_task = asyncio.create_task(
+            corpus_stats.reconcile_periodically(rag_system_instance.pool, STATS_RECONCILE_SECONDS)
+        )
+        health_monitor.add_check("database", estimated_rows_check(rag_system_instance.pool, "ncert_chunks"))
+    else:
+        health_monitor.add_check("database", check_no_database)
+    health_monitor.add_check("gemini", check_gemini)
+    health_monitor.add_check("system", system_resources_check(), critical=False)
+    health_monitor.start()
+    
     yield  # App runs here
     
     # Shutdown
+    await health_monitor.stop()
+    if stats_reconcile_task:
+        stats_reconcile_task.cancel()
     if rag_system_instance:
         await rag_system_instance.close()
         print("✅ RAG System shutdown complete")
@@ -91,9 +138,12 @@ class HealthResponse(BaseModel):
 
 class StatsResponse(BaseModel):
     total_chunks: int
+    unique_chapters: int
+    unique_subjects: int
     by_class: List[Dict]
     by_subject: List[Dict]
     top_chapters: List[Dict]
+    freshness: Dict
 
 class IngestRequest(BaseModel):
     text: str
@@ -110,7 +160,10 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "POST /query": "Ask questions",
+            "POST /query/stream": "Ask questions (streamed answer, SSE)",
             "GET /health": "System health check",
+            "GET /health/live": "Liveness probe",
+            "GET /health/ready": "Readiness probe",
             "GET /stats": "Database statistics",
             "POST /ingest": "Ingest new content"
         }
@@ -118,76 +171,63 @@ async def root():
 
 @app.get("/health")
 async def health_check() -> HealthResponse:
-    """Health check endpoint."""
+    """Health check endpoint (served from the background health monitor's cache)."""
     if not rag_system_instance:
         raise HTTPException(status_code=503, detail="RAG system not initialized")
     
-    try:
-        # Check database connection
-        db_connected = False
-        total_chunks = 0
-        
-        if rag_system_instance.pool:
-            async with rag_system_instance.pool.acquire() as conn:
-                try:
-                    total_chunks = await conn.fetchval("SELECT COUNT(*) FROM ncert_chunks")
-                    db_connected = True
-                except:
-                    db_connected = False
-        
-        # Check Gemini
-        gemini_configured = rag_system_instance.gemini_api_key is not None
-        
-        return HealthResponse(
-            status="healthy" if db_connected and gemini_configured else "degraded",
-            database_connected=db_connected,
-            gemini_configured=gemini_configured,
-            total_chunks=total_chunks,
-            model_info={
-                "embedding_model": rag_system_instance.embedding_model,
-                "llm_model": rag_system_instance.llm_model
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    snapshot = health_monitor.snapshot()
+    checks = snapshot["checks"]
+    database = checks.get("database", {})
+    gemini = checks.get("gemini", {})
+    
+    return HealthResponse(
+        status=snapshot["status"],
+        database_connected=database.get("status") == "healthy",
+        gemini_configured=gemini.get("status") in ("healthy", "degraded"),
+        total_chunks=database.get("estimated_rows", 0),
+        model_info={
+            "llm_model": rag_system_instance.current_model,
+            "llm_circuit": gemini.get("circuit"),
+            "checked_at": snapshot.get("checked_at")
+        }
+    )
+
+@app.get("/health/live")
+async def liveness():
+    """Liveness probe - no I/O."""
+    return health_monitor.liveness()
+
+@app.get("/health/ready")
+async def readiness():
+    """Readiness probe - 503 until dependencies are healthy and checks are fresh."""
+    ready, body = health_monitor.readiness()
+    if not ready:
+        return JSONResponse(status_code=503, content=body)
+    return body
 
 @app.get("/stats")
 async def get_stats() -> StatsResponse:
-    """Get database statistics."""
+    """Get database statistics (read from corpus_stats, no scans of ncert_chunks)."""
     if not rag_system_instance or not rag_system_instance.pool:
         raise HTTPException(status_code=503, detail="Database not connected")
     
     try:
-        async with rag_system_instance.pool.acquire() as conn:
-            # Total chunks
-            total_chunks = await conn.fetchval("SELECT COUNT(*) FROM ncert_chunks")
-            
-            # By class
-            class_stats = await conn.fetch(
-                "SELECT class_grade, COUNT(*) as count FROM ncert_chunks GROUP BY class_grade ORDER BY class_grade"
-            )
-            
-            # By subject
-            subject_stats = await conn.fetch(
-                "SELECT subject, COUNT(*) as count FROM ncert_chunks GROUP BY subject ORDER BY subject"
-            )
-            
-            # Top chapters
-            chapter_stats = await conn.fetch(
-                "SELECT chapter, COUNT(*) as count FROM ncert_chunks GROUP BY chapter ORDER BY count DESC LIMIT 10"
-            )
-            
-            return StatsResponse(
-                total_chunks=total_chunks,
-                by_class=[dict(row) for row in class_stats],
-                by_subject=[dict(row) for row in subject_stats],
-                top_chapters=[dict(row) for row in chapter_stats]
-            )
+        stats = await corpus_stats.read_stats(rag_system_instance.pool, top_chapters=10)
+        
+        return StatsResponse(
+            total_chunks=stats["total_chunks"],
+            unique_chapters=stats["unique_chapters"],
+            unique_subjects=stats["unique_subjects"],
+            by_class=stats["by_class"],
+            by_subject=stats["by_subject"],
+            top_chapters=stats["top_chapters"],
+            freshness=stats["freshness"]
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/query", response_model=QueryResponse)
-async def query_endpoint(request: QueryRequest) -> QueryResponse:
+async def query_endpoint(request: QueryRequest, http_request: Request) -> QueryResponse:
     """Query endpoint - ask questions to the NCERT RAG system."""
     if not rag_system_instance:
         raise HTTPException(status_code=503, detail="RAG system not initialized")
@@ -207,26 +247,67 @@ async def query_endpoint(request: QueryRequest) -> QueryResponse:
         
         print(f"📥 Received query: '{request.query}' with filters: {filters}")
         
-        # Execute RAG query
-        result = await rag_system_instance.rag_query(
-            query=request.query,
-            **filters
+        # Execute RAG query (cancelled on timeout or client disconnect)
+        result = await run_with_deadline(
+            rag_system_instance.query(request.query, limit=request.top_k, filters=filters),
+            QUERY_TIMEOUT_SECONDS,
+            http_request
         )
         
         processing_time = time.time() - start_time
         
         return QueryResponse(
-            response=result['response'],
+            response=result['answer'],
             sources=result['sources'],
-            chunks=result['chunks'],
+            chunks=result['sources'],
             processing_time=round(processing_time, 2)
         )
         
+    except ClientDisconnected:
+        print("⚠️ Client disconnected, query cancelled")
+        return JSONResponse(status_code=499, content={"detail": "Client disconnected"})
+    except DeadlineExceeded as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         print(f"❌ Error in query endpoint: {e}")
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query/stream")
+async def query_stream_endpoint(request: QueryRequest):
+    """
+    Streaming query endpoint (Server-Sent Events).
+    Sends `sources` first, then `token` events as the answer is generated,
+    then `done` with timings and chunk ids (or a single `error` event).
+    """
+    if not rag_system_instance:
+        raise HTTPException(status_code=503, detail="RAG system not initialized")
+    
+    filters = {
+        key: value for key, value in (
+            ('class_grade', request.class_grade),
+            ('subject', request.subject),
+            ('chapter', request.chapter),
+        ) if value
+    }
+    print(f"📥 Received streaming query: '{request.query}' with filters: {filters}")
+    
+    async def events():
+        try:
+            async for event, data in iterate_with_deadline(
+                rag_system_instance.query_stream(request.query, limit=request.top_k, filters=filters),
+                QUERY_TIMEOUT_SECONDS
+            ):
+                yield sse_event(event, data)
+        except DeadlineExceeded as e:
+            yield sse_event("error", {"detail": str(e)})
+        except Exception as e:
+            print(f"❌ Error in streaming query: {e}")
+            traceback.print_exc()
+            yield sse_event("error", {"detail": str(e)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.post("/ingest")
 async def ingest_content(request: IngestRequest):
     """Ingest new NCERT content."""
@@ -248,7 +329,7 @@ async def ingest_content(request: IngestRequest):
         # Generate embedding
         embedding = await rag_system_instance.generate_embedding(request.text)
         
-        # Store in database
+        # Store in database (corpus_stats is updated in the same transaction)
         success = await rag_system_instance.store_embeddings([embedding], [metadata])
         
         if success:
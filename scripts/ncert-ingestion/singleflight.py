@@ -0,0 +1,85 @@
+"""
+Singleflight - Coalesce identical in-flight async computations.
+
+Concurrent callers with the same key share one execution: the first caller
+starts it, later callers wait on the same task and receive the same result
+(or exception). Waiters are reference counted; if every waiter goes away
+(timeout, disconnect) the shared task is cancelled.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Named group of coalesced calls with execution/coalesced counters."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.executions = 0
+        self.coalesced = 0
+        self._calls: Dict[Hashable, _Call] = {}
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def _forget(self, key: Hashable, call: _Call):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Run `fn()` unless an identical call is in flight; share its result."""
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(asyncio.ensure_future(fn()))
+            call.task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            self._calls[key] = call
+            self.executions += 1
+        else:
+            self.coalesced += 1
+            logger.debug(f"[{self.name}] coalesced request onto in-flight call")
+
+        call.waiters += 1
+        try:
+            # shield: one waiter being cancelled must not cancel the shared task
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._forget(key, call)
+                call.task.cancel()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "executions": self.executions,
+            "coalesced": self.coalesced,
+            "in_flight": self.in_flight,
+        }
+
+
+_groups: Dict[str, SingleFlight] = {}
+
+
+def get_singleflight(name: str) -> SingleFlight:
+    """Process-wide group for `name` (e.g. "chat")."""
+    group: Optional[SingleFlight] = _groups.get(name)
+    if group is None:
+        group = _groups[name] = SingleFlight(name)
+    return group
+
+
+def all_stats() -> Dict[str, Dict[str, int]]:
+    """Counters for every group, for the metrics endpoint."""
+    return {name: group.stats() for name, group in _groups.items()}
@@ -0,0 +1,20 @@
+"""
+Server-Sent Events - Formatting helpers for streaming endpoints.
+"""
+
+import json
+from typing import Any, Dict
+
+# Sent with every event stream. Content-Encoding keeps GZipMiddleware from
+# buffering the stream; X-Accel-Buffering does the same for nginx.
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "Content-Encoding": "identity",
+    "X-Accel-Buffering": "no",
+}
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one SSE message (`event:` + single-line JSON `data:`)."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str, ensure_ascii=False)}\n\n"
@@ -8,7 +8,8 @@ from typing import List, Dict, Optional, Any
 import logging
 from datetime import datetime
 import numpy as np
-import ast  # Added for string to list conversion
+
+from vector_codec import parse_vector_text
 
 # Setup logging
 logging.basicConfig(
@@ -100,18 +101,11 @@ def convert_embedding(embedding_data):
     # If it's a string (most common case from Supabase)
     if isinstance(embedding_data, str):
         try:
-            # Try to parse as a Python list string
-            embedding_list = ast.literal_eval(embedding_data)
-            return np.array(embedding_list, dtype='float64')
-        except:
-            # If parsing fails, try JSON
-            try:
-                import json as json_module
-                embedding_list = json_module.loads(embedding_data)
-                return np.array(embedding_list, dtype='float64')
-            except:
-                logger.warning(f"Failed to parse embedding string: {embedding_data[:50]}...")
-                return None
+            # pgvector text '[x,y,...]' parsed directly into a float array
+            return parse_vector_text(embedding_data).astype('float64')
+        except ValueError:
+            logger.warning(f"Failed to parse embedding string: {embedding_data[:50]}...")
+            return None
     
     # If it's already a numpy array
     if isinstance(embedding_data, np.ndarray):
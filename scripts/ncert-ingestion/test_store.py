@@ -0,0 +1,226 @@
+"""
+Test Store - Durable storage for generated test papers.
+
+Every generated paper is saved to the generated_tests table under its test
+id, with the user id indexed for listings and an expiry matching the
+response's `expiresAt`. Reads go through an in-process LRU first, so
+repeated views and downloads of a paper cost a dict lookup rather than a
+database round trip (or a regeneration). Expired rows are invisible to
+reads and are purged opportunistically on write.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from db_client import get_database_client
+
+logger = logging.getLogger(__name__)
+
+TEST_STORE_CACHE_SIZE = int(os.getenv("TEST_STORE_CACHE_SIZE", 256))
+TEST_STORE_PURGE_SECONDS = float(os.getenv("TEST_STORE_PURGE_SECONDS", 600))
+
+SCHEMA_SQL = """
+    CREATE TABLE IF NOT EXISTS generated_tests (
+        id TEXT PRIMARY KEY,
+        user_id TEXT,
+        request JSONB NOT NULL,
+        response JSONB NOT NULL,
+        questions JSONB NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        expires_at TIMESTAMPTZ NOT NULL
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_generated_tests_user
+        ON generated_tests (user_id, created_at DESC);
+
+    CREATE INDEX IF NOT EXISTS idx_generated_tests_expires
+        ON generated_tests (expires_at);
+"""
+
+UPSERT_SQL = """
+    INSERT INTO generated_tests (id, user_id, request, response, questions, expires_at)
+    VALUES ($1, $2, $3, $4, $5, $6)
+    ON CONFLICT (id) DO UPDATE
+    SET user_id = EXCLUDED.user_id, request = EXCLUDED.request,
+        response = EXCLUDED.response, questions = EXCLUDED.questions,
+        created_at = NOW(), expires_at = EXCLUDED.expires_at
+    RETURNING created_at
+"""
+
+GET_SQL = """
+    SELECT id, user_id, request, response, questions, created_at, expires_at
+    FROM generated_tests
+    WHERE id = $1 AND expires_at > NOW()
+"""
+
+LIST_FOR_USER_SQL = """
+    SELECT id, response->'metadata' AS metadata, created_at, expires_at
+    FROM generated_tests
+    WHERE user_id = $1 AND expires_at > NOW()
+    ORDER BY created_at DESC
+    LIMIT $2
+"""
+
+RECENT_QUESTIONS_SQL = """
+    SELECT q->>'question' AS question
+    FROM (
+        SELECT questions FROM generated_tests
+        WHERE user_id = $1 AND expires_at > NOW() AND id <> $3
+        ORDER BY created_at DESC
+        LIMIT $2
+    ) recent, jsonb_array_elements(recent.questions) AS q
+"""
+
+PURGE_SQL = "DELETE FROM generated_tests WHERE expires_at <= NOW()"
+
+
+def parse_expiry(expires_at: Optional[str]) -> datetime:
+    """`expiresAt` (naive UTC ISO string, as the API emits it) -> aware datetime"""
+    if not expires_at:
+        raise ValueError("stored tests need an expiresAt")
+    parsed = datetime.fromisoformat(expires_at)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def _record(row) -> Dict[str, Any]:
+    record = dict(row)
+    for key in ("request", "response", "questions", "metadata"):
+        if isinstance(record.get(key), str):
+            record[key] = json.loads(record[key])
+    return record
+
+
+class _LRUCache:
+    """Bounded id -> record map; entries past their expiry count as misses."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        record = self._entries.get(key)
+        if record is None:
+            return None
+        if record["expires_at"] <= datetime.now(timezone.utc):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return record
+
+    def put(self, key: str, record: Dict[str, Any]):
+        self._entries[key] = record
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TestStore:
+    """Generated tests in Postgres, fronted by an in-process LRU."""
+
+    def __init__(self, cache_size: int = TEST_STORE_CACHE_SIZE):
+        self.cache = _LRUCache(cache_size)
+        self.hits = 0
+        self.misses = 0
+        self._schema_ready = False
+        self._last_purge = 0.0
+
+    async def _connect(self):
+        db = get_database_client()
+        if not await db.connect():
+            raise ConnectionError("Test store database is unavailable")
+        if not self._schema_ready:
+            async with db.acquire() as conn:
+                await conn.execute(SCHEMA_SQL)
+            self._schema_ready = True
+        return db
+
+    async def save(
+        self,
+        test_id: str,
+        user_id: Optional[str],
+        request: Dict[str, Any],
+        response: Dict[str, Any],
+        questions: List[Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """Store (or replace) a test; it expires at response['expiresAt']."""
+        expires_at = parse_expiry(response.get("expiresAt"))
+        db = await self._connect()
+        async with db.acquire() as conn:
+            created_at = await conn.fetchval(
+                UPSERT_SQL, test_id, user_id, json.dumps(request, default=str),
+                json.dumps(response, default=str), json.dumps(questions, default=str), expires_at
+            )
+            if time.monotonic() - self._last_purge > TEST_STORE_PURGE_SECONDS:
+                self._last_purge = time.monotonic()
+                purged = await conn.execute(PURGE_SQL)
+                logger.debug(f"Purged expired tests: {purged}")
+
+        record = {
+            "id": test_id,
+            "user_id": user_id,
+            "request": request,
+            "response": response,
+            "questions": questions,
+            "created_at": created_at,
+            "expires_at": expires_at,
+        }
+        self.cache.put(test_id, record)
+        return record
+
+    async def get(self, test_id: str) -> Optional[Dict[str, Any]]:
+        """The stored test, or None if it never existed or has expired."""
+        record = self.cache.get(test_id)
+        if record is not None:
+            self.hits += 1
+            return record
+
+        self.misses += 1
+        db = await self._connect()
+        async with db.acquire() as conn:
+            row = await conn.fetchrow(GET_SQL, test_id)
+        if row is None:
+            return None
+        record = _record(row)
+        self.cache.put(test_id, record)
+        return record
+
+    async def list_for_user(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Unexpired tests for a user, newest first (summary fields only)."""
+        db = await self._connect()
+        async with db.acquire() as conn:
+            rows = await conn.fetch(LIST_FOR_USER_SQL, user_id, limit)
+        return [_record(row) for row in rows]
+
+    async def recent_questions(self, user_id: str, papers: int = 10, exclude_id: str = "") -> List[str]:
+        """Question texts of a user's `papers` most recent unexpired tests (one query)."""
+        db = await self._connect()
+        async with db.acquire() as conn:
+            rows = await conn.fetch(RECENT_QUESTIONS_SQL, user_id, papers, exclude_id)
+        return [row["question"] for row in rows if row["question"]]
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "cached": len(self.cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_test_store: Optional[TestStore] = None
+
+
+def get_test_store() -> TestStore:
+    global _test_store
+    if _test_store is None:
+        _test_store = TestStore()
+    return _test_store
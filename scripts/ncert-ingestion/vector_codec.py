@@ -0,0 +1,124 @@
+"""
+pgvector Codec - Maps the `vector` type directly to float32 NumPy arrays.
+Binary wire format for asyncpg, fast text parsing for psycopg2/REST results.
+"""
+
+import struct
+import logging
+from typing import Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# pgvector binary layout: uint16 dim, uint16 unused, dim x float32 (big-endian)
+_HEADER = struct.Struct('>HH')
+_WIRE_DTYPE = np.dtype('>f4')
+
+
+# ============== BINARY (asyncpg) ==============
+
+def encode_vector_binary(value: Any) -> bytes:
+    """Encode a 1-D array/sequence of floats into pgvector binary format."""
+    arr = np.asarray(value, dtype=_WIRE_DTYPE)
+    if arr.ndim != 1:
+        raise ValueError(f"vector must be 1-dimensional, got shape {arr.shape}")
+    return _HEADER.pack(arr.shape[0], 0) + arr.tobytes()
+
+
+def decode_vector_binary(data: bytes) -> np.ndarray:
+    """Decode pgvector binary data into a native float32 array."""
+    dim, _ = _HEADER.unpack_from(data)
+    return np.frombuffer(data, dtype=_WIRE_DTYPE, count=dim, offset=_HEADER.size).astype(np.float32)
+
+
+async def register_vector_asyncpg(conn) -> bool:
+    """Register the binary vector codec on an asyncpg connection."""
+    schema = await conn.fetchval("""
+        SELECT n.nspname
+        FROM pg_type t
+        JOIN pg_namespace n ON n.oid = t.typnamespace
+        WHERE t.typname = 'vector'
+        LIMIT 1
+    """)
+    if schema is None:
+        logger.warning("pgvector 'vector' type not found - codec not registered")
+        return False
+
+    await conn.set_type_codec(
+        'vector',
+        schema=schema,
+        encoder=encode_vector_binary,
+        decoder=decode_vector_binary,
+        format='binary'
+    )
+    return True
+
+
+# ============== TEXT (psycopg2 / Supabase REST) ==============
+
+def format_vector_text(value: Any) -> str:
+    """Format a vector as pgvector text ('[x,y,...]')."""
+    if isinstance(value, str):
+        return value
+    arr = np.asarray(value, dtype=np.float32)
+    return "[" + ",".join(map(repr, arr.tolist())) + "]"
+
+
+def parse_vector_text(value: Optional[str]) -> Optional[np.ndarray]:
+    """Parse pgvector text into a float32 array without literal_eval/JSON."""
+    if value is None:
+        return None
+    body = value.strip()[1:-1]
+    if not body:
+        return np.empty(0, dtype=np.float32)
+    return np.array(body.split(','), dtype=np.float32)
+
+
+class Vector:
+    """
+    A value to send to psycopg2 as a pgvector literal:
+        cursor.execute("... WHERE embedding <=> %s ...", (Vector(embedding),))
+    Plain NumPy arrays are left to psycopg2's own adaptation.
+    """
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+
+def _adapt_vector(vector: Vector):
+    return psycopg2.extensions.AsIs(f"'{format_vector_text(vector.value)}'::vector")
+
+
+# psycopg2 adapters are process-wide, so the adapter is registered for the
+# Vector wrapper only - never for np.ndarray, which other queries may pass.
+try:
+    import psycopg2.extensions
+except ImportError:  # asyncpg-only deployments
+    psycopg2 = None
+else:
+    psycopg2.extensions.register_adapter(Vector, _adapt_vector)
+
+
+def register_vector_psycopg2(conn) -> bool:
+    """
+    Register the vector typecaster on one psycopg2 connection.
+
+    psycopg2 only speaks the text protocol, so results are parsed straight into
+    float32 arrays. To send a vector, wrap it in Vector.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT oid FROM pg_type WHERE typname = 'vector' LIMIT 1")
+        row = cursor.fetchone()
+
+    if row is None:
+        logger.warning("pgvector 'vector' type not found - psycopg2 codec not registered")
+        return False
+
+    def cast_vector(value, cursor):
+        return parse_vector_text(value)
+
+    vector_type = psycopg2.extensions.new_type((row[0],), 'VECTOR', cast_vector)
+    psycopg2.extensions.register_type(vector_type, conn)
+    return True
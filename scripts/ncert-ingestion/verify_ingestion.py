@@ -1,8 +1,9 @@
 import asyncio
-import asyncpg
 import os
 from pathlib import Path
 
+from db_client import DatabaseClient
+
 env_path = Path(__file__).parent / '.env'
 if env_path.exists():
     with open(env_path, 'r') as f:
@@ -12,14 +13,10 @@ if env_path.exists():
                 os.environ[key.strip()] = value.strip().strip('"').strip("'")
 
 async def verify():
-    conn = await asyncpg.connect(
-        host='db.dcmnzvjftmdbywrjkust.supabase.co',
-        port=5432,
-        user='postgres',
-        password=os.getenv('DATABASE_PASSWORD'),
-        database='postgres',
-        ssl='require'
-    )
+    conn = DatabaseClient()
+    if not await conn.connect():
+        print("❌ Database connection failed")
+        return
     
     print("✅ VERIFYING INGESTION RESULTS")
     print("="*60)